@@ -0,0 +1,243 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from furby_log import get_logger
+from furby_metrics import get_metrics
+
+log = get_logger("audio")
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio")
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg")
+
+# What play() does when something is already playing
+POLICY_QUEUE = "queue"          # wait for the current clip(s) to finish, then play in order
+POLICY_OVERLAP = "overlap"      # play alongside; if every channel is busy, take the oldest
+POLICY_INTERRUPT = "interrupt"  # stop everything and play now
+POLICIES = (POLICY_QUEUE, POLICY_OVERLAP, POLICY_INTERRUPT)
+
+class AudioEngine:
+    """Decodes clips once and plays them through a fixed pool of mixer channels.
+
+    Clips are decoded into pygame Sounds up front by start(), or on first use. If
+    `max_bytes` is set, the least recently played clips are dropped to stay under it.
+    A single worker thread owns the channels, so tool calls only drop a request on a
+    queue and return. Time from play() to the mixer starting the clip is recorded in
+    `latencies_ms`; play() can also be told, through `on_start`, when its clip started.
+    pygame isn't imported and the mixer isn't opened until start(). play() never does that
+    on the caller's thread: before start() it kicks off a background warm-up and the clip
+    plays once the mixer is open. If the mixer can't be opened, play() fails fast with
+    RuntimeError until start() succeeds.
+    """
+
+    def __init__(self, sounds=None, audio_dir=AUDIO_DIR, channels=4, max_bytes=None,
+                 default_policy=POLICY_QUEUE):
+        if default_policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        # name -> path; anything in audio_dir is picked up under its file name
+        self.paths = {}
+        if audio_dir and os.path.isdir(audio_dir):
+            for filename in sorted(os.listdir(audio_dir)):
+                stem, ext = os.path.splitext(filename)
+                if ext.lower() in AUDIO_EXTENSIONS:
+                    self.paths[stem] = os.path.join(audio_dir, filename)
+        for name, path in (sounds or {}).items():
+            # Relative paths are relative to the project, like the SOUNDS table in the server
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(AUDIO_DIR), path)
+            self.paths[name] = path
+        self.num_channels = channels
+        self.max_bytes = max_bytes
+        self.default_policy = default_policy
+        self.latencies_ms = deque(maxlen=1000)
+        self._cache = OrderedDict()   # name -> (Sound, size in bytes), least recent first
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()
+        self._loading = {}            # name -> lock held while that clip is being decoded
+        self._requests = queue.Queue()
+        self._backlog = deque()       # queued-policy clips waiting for the channels to free up
+        self._started = [0.0] * channels
+        self._channels = []
+        self._worker = None
+        self._warming = None
+        self._warm_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.error = None             # why the mixer couldn't be opened, if it couldn't
+        metrics = get_metrics()
+        self._time_to_play = (metrics.histogram("audio_time_to_play_seconds",
+                                                "Time from play() to the clip starting")
+                              if metrics is not None else None)
+
+    def start(self, preload=True):
+        """Initialise the mixer and start the playback worker. With `preload`, decode the
+        whole library now instead of each clip the first time it plays."""
+        with self._start_lock:
+            if self._worker is None:
+                # The banner goes to stdout, where it would corrupt a stdio MCP stream
+                os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+                try:
+                    import pygame
+                    if not pygame.mixer.get_init():
+                        pygame.mixer.init()
+                except Exception as e:
+                    self.error = e
+                    self._fail_requests()
+                    raise
+                self.error = None
+                if pygame.mixer.get_num_channels() < self.num_channels:
+                    pygame.mixer.set_num_channels(self.num_channels)
+                self._channels = [pygame.mixer.Channel(i) for i in range(self.num_channels)]
+                self._worker = threading.Thread(target=self._run, name="audio-engine",
+                                                daemon=True)
+                self._worker.start()
+        if preload:
+            for name in self.paths:
+                try:
+                    self._load(name)
+                except Exception as e:
+                    log.error("Failed to load sound '%s': %s", name, e)
+
+    def warm_up(self):
+        """start(preload=False) on a background thread, once. Returns immediately."""
+        # Not _start_lock: that's held for the whole mixer init
+        with self._warm_lock:
+            if self._worker is None and (self._warming is None or not self._warming.is_alive()):
+                self._warming = threading.Thread(target=self._warm_up, name="audio-warm-up",
+                                                 daemon=True)
+                self._warming.start()
+
+    def _warm_up(self):
+        try:
+            self.start(preload=False)
+        except Exception as e:
+            log.error("❌ Couldn't open the audio mixer: %s", e)
+
+    def _fail_requests(self):
+        """Tell everyone waiting for the mixer that their clip won't play."""
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None and request[3] is not None:
+                request[3](None)
+
+    def stop(self):
+        if self._worker is not None:
+            self._requests.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def play(self, name, policy=None, on_start=None):
+        """Queue a clip for playback and return immediately. `on_start` is called on the
+        engine's worker with the time.monotonic() the clip started, or None if it failed."""
+        if name not in self.paths:
+            raise KeyError(f"Unknown sound: {name}")
+        policy = policy or self.default_policy
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        if self.error is not None:
+            raise RuntimeError(f"Audio unavailable: {self.error}")
+        requested = time.perf_counter()
+        self._requests.put((name, policy, requested, on_start))
+        if self._worker is None:
+            # The worker picks the request up once the mixer is open
+            self.warm_up()
+            if self.error is not None:
+                # The mixer failed after the check above, maybe after its failed requests
+                # were already flushed
+                self._fail_requests()
+
+    def _load(self, name):
+        with self._cache_lock:
+            entry = self._cache.get(name)
+            if entry is not None:
+                self._cache.move_to_end(name)
+                return entry[0]
+            # One lock per clip, so two threads wanting the same clip decode it once
+            loading = self._loading.setdefault(name, threading.Lock())
+        with loading:
+            with self._cache_lock:
+                entry = self._cache.get(name)
+                if entry is not None:
+                    self._cache.move_to_end(name)
+                    return entry[0]
+            import pygame
+            sound = pygame.mixer.Sound(self.paths[name])
+            frequency, size, channels = pygame.mixer.get_init()
+            nbytes = int(sound.get_length() * frequency * channels * abs(size) // 8)
+            with self._cache_lock:
+                self._cache[name] = (sound, nbytes)
+                self._cache_bytes += nbytes
+                self._loading.pop(name, None)
+                while self.max_bytes is not None and self._cache_bytes > self.max_bytes \
+                        and len(self._cache) > 1:
+                    _, (_, evicted) = self._cache.popitem(last=False)
+                    self._cache_bytes -= evicted
+        return sound
+
+    def cached_bytes(self):
+        return self._cache_bytes
+
+    def _run(self):
+        while True:
+            try:
+                # Poll while clips are waiting for a channel, otherwise sleep until asked
+                request = self._requests.get(timeout=0.01 if self._backlog else None)
+            except queue.Empty:
+                request = ()
+            if request is None:
+                break
+            if request:
+                name, policy, requested, on_start = request
+                if policy == POLICY_QUEUE and (self._backlog or self._busy()):
+                    # Time spent waiting for the previous clip isn't playback latency
+                    self._backlog.append((name, None, on_start))
+                else:
+                    self._start(name, requested, policy, on_start)
+            if self._backlog and not self._busy():
+                name, requested, on_start = self._backlog.popleft()
+                self._start(name, requested, POLICY_QUEUE, on_start)
+        for channel in self._channels:
+            channel.stop()
+
+    def _busy(self):
+        return any(c.get_busy() for c in self._channels)
+
+    def _start(self, name, requested, policy, on_start=None):
+        try:
+            sound = self._load(name)
+        except Exception as e:
+            log.error("Failed to play sound: %s", e)
+            if on_start is not None:
+                on_start(None)
+            return
+        if policy == POLICY_INTERRUPT:
+            self._backlog.clear()
+            for channel in self._channels:
+                channel.stop()
+        i = next((i for i, c in enumerate(self._channels) if not c.get_busy()), None)
+        if i is None:
+            # Every channel busy: take over the one that started playing first
+            i = min(range(len(self._channels)), key=self._started.__getitem__)
+        self._channels[i].play(sound)
+        self._started[i] = time.perf_counter()
+        if on_start is not None:
+            on_start(time.monotonic())
+        if requested is not None:
+            self.latencies_ms.append((self._started[i] - requested) * 1000)
+            if self._time_to_play is not None:
+                self._time_to_play.observe(self._started[i] - requested)
+
+    def latency_stats(self):
+        """p50/p95/max of the time from play() to the mixer starting the clip, in ms."""
+        samples = sorted(self.latencies_ms)
+        if not samples:
+            return {"count": 0}
+
+        def pick(q):
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))], 3)
+
+        return {"count": len(samples), "p50": pick(0.5), "p95": pick(0.95),
+                "max": round(samples[-1], 3)}
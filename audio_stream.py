@@ -0,0 +1,283 @@
+import asyncio
+import importlib.util
+import mmap
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from furby_log import get_logger
+
+log = get_logger("audio")
+
+# Transcoded clips are kept here, keyed by the source's mtime so an edited clip is redone
+CACHE_DIR = os.environ.get(
+    "GIGGLEBOT_AUDIO_CACHE", os.path.join(os.path.expanduser("~"), ".gigglebot_audio")
+)
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav", ".ogg": "audio/ogg",
+                 ".opus": "audio/ogg"}
+
+class TranscodeError(RuntimeError):
+    """A transcoder that should work here failed on a clip."""
+
+# Run in a child process on SDL's dummy audio driver: pygame can only decode through the
+# mixer, which needs a sound card otherwise, and this process's mixer belongs to the engine
+_WAV_DECODER = """
+import sys, wave, pygame
+pygame.mixer.init()
+frequency, size, channels = pygame.mixer.get_init()
+raw = pygame.mixer.Sound(sys.argv[1]).get_raw()
+with wave.open(sys.argv[2], "wb") as out:
+    out.setnchannels(channels)
+    out.setsampwidth(abs(size) // 8)
+    out.setframerate(frequency)
+    out.writeframes(raw)
+"""
+
+def _to_wav(src, dst):
+    """16-bit PCM at pygame's default mixer rate, decoded by pygame like the engine does."""
+    env = dict(os.environ, SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    subprocess.run([sys.executable, "-c", _WAV_DECODER, src, dst], check=True, env=env,
+                   stdin=subprocess.DEVNULL, capture_output=True)
+
+def _to_opus(src, dst):
+    """24 kbit/s Opus in Ogg. Needs ffmpeg on the PATH."""
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-i", src, "-c:a", "libopus",
+                    "-b:a", "24k", "-f", "ogg", dst], check=True, stdin=subprocess.DEVNULL)
+
+# format -> (file extension, transcoder, whether it can run here)
+TRANSCODERS = {
+    "wav": (".wav", _to_wav, lambda: importlib.util.find_spec("pygame") is not None),
+    "opus": (".opus", _to_opus, lambda: shutil.which("ffmpeg") is not None),
+}
+
+class Clip:
+    """One clip in one format, memory-mapped. `view` is the whole file; slicing it (and
+    chunks()) doesn't copy."""
+
+    __slots__ = ("name", "format", "content_type", "etag", "view")
+
+    def __init__(self, name, format, content_type, etag, view):
+        self.name = name
+        self.format = format
+        self.content_type = content_type
+        self.etag = etag
+        self.view = view
+
+    @property
+    def size(self):
+        return len(self.view)
+
+    def chunks(self, start=0, end=None, chunk_size=CHUNK_SIZE):
+        """Slices of bytes [start, end) at most `chunk_size` long."""
+        end = self.size if end is None else end
+        for offset in range(start, end, chunk_size):
+            yield self.view[offset:min(offset + chunk_size, end)]
+
+class AudioLibrary:
+    """Serves the engine's clips as is or transcoded, from memory maps.
+
+    Each file is mapped once and shared by every request, so concurrent clients all read
+    the same page cache and nothing is loaded per request. Transcodes run once per clip
+    and format, the first time they're asked for, and are kept in `cache_dir`.
+    """
+
+    def __init__(self, paths, cache_dir=CACHE_DIR):
+        self.paths = paths
+        self.cache_dir = cache_dir
+        self._maps = {}            # (path, mtime_ns, size) -> memoryview of the mapped file
+        self._lock = threading.Lock()
+        self._transcoding = {}     # cache path -> lock held while it's written
+
+    def formats(self):
+        """Formats that can be served here; 'source' is the file as it is in audio/."""
+        return ["source"] + [f for f, (_, _, available) in TRANSCODERS.items() if available()]
+
+    def info(self, name):
+        """Content type and size of clip `name` in each format. A transcode's size is None
+        until it has been made."""
+        formats = {}
+        for format in self.formats():
+            path = self.cached_path(name, format)
+            ext = (os.path.splitext(self.paths[name])[1].lower() if format == "source"
+                   else TRANSCODERS[format][0])
+            formats[format] = {"content_type": CONTENT_TYPES.get(ext, "application/octet-stream"),
+                               "size": os.path.getsize(path) if path is not None else None}
+        return {"name": name, "formats": formats}
+
+    def path(self, name, format="source"):
+        """The file for clip `name` in `format`, transcoding it first if that isn't cached
+        yet. Raises KeyError for an unknown clip, ValueError for an unavailable format and
+        TranscodeError if transcoding fails."""
+        src = self.paths[name]
+        return src if format == "source" else self._transcoded(name, src, format)
+
+    def cached_path(self, name, format="source"):
+        """path() if it can return straight away, without transcoding; otherwise None."""
+        src = self.paths[name]
+        if format == "source":
+            return src
+        path = self._cache_path(name, src, TRANSCODERS[format][0] if format in TRANSCODERS
+                                else "")
+        return path if os.path.exists(path) else None
+
+    def transcoded(self, name, format="source"):
+        """Whether path() can return straight away, without transcoding."""
+        return self.cached_path(name, format) is not None
+
+    def open(self, name, format="source"):
+        """The clip `name` in `format`, mapped; raises like path()."""
+        path = self.path(name, format)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            view = self._maps.get(key)
+            if view is None:
+                view = self._map(path)
+                # An edited source gets a new key; the old mapping closes once unused
+                for old in [k for k in self._maps if k[0] == path]:
+                    del self._maps[old]
+                self._maps[key] = view
+        ext = os.path.splitext(path)[1].lower()
+        return Clip(name, format, CONTENT_TYPES.get(ext, "application/octet-stream"),
+                    f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', view)
+
+    @staticmethod
+    def _map(path):
+        with open(path, "rb") as f:
+            if not os.fstat(f.fileno()).st_size:
+                return memoryview(b"")
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _cache_path(self, name, src, ext):
+        return os.path.join(self.cache_dir, f"{name}.{os.stat(src).st_mtime_ns:x}{ext}")
+
+    def _transcoded(self, name, src, format):
+        if format not in TRANSCODERS or not TRANSCODERS[format][2]():
+            raise ValueError(f"format must be one of {self.formats()}")
+        ext, transcode, _ = TRANSCODERS[format]
+        path = self._cache_path(name, src, ext)
+        if os.path.exists(path):
+            return path
+        with self._lock:
+            lock = self._transcoding.setdefault(path, threading.Lock())
+        with lock:
+            if not os.path.exists(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(suffix=ext, dir=self.cache_dir)
+                os.close(fd)
+                try:
+                    transcode(src, tmp)
+                    os.replace(tmp, path)
+                except (OSError, subprocess.SubprocessError) as e:
+                    os.unlink(tmp)
+                    # For a failed subprocess, the last line it wrote says what went wrong
+                    detail = (getattr(e, "stderr", None) or b"").decode("utf-8", "replace")
+                    log.error("❌ Transcoding %s to %s failed: %s", name, format,
+                              detail.strip().rpartition("\n")[2] or e)
+                    raise TranscodeError(f"Couldn't transcode {name} to {format}.") from e
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+                log.info("🎛️ Transcoded %s to %s (%d bytes)", name, format,
+                         os.path.getsize(path))
+        return path
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+def parse_range(header, size):
+    """(start, end) for a single-range Range header, end exclusive. None means send the
+    whole file (no header, or several ranges). Raises ValueError if it can't be satisfied."""
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last or not int(last) or not size:
+            raise ValueError(header)
+        return max(0, size - int(last)), size
+    start = int(first)
+    end = min(size, int(last) + 1) if last else size
+    if start >= size or end <= start:
+        raise ValueError(header)
+    return start, end
+
+def audio_routes(library, path="/audio"):
+    """Starlette routes: GET/HEAD {path} lists the clips, {path}/{name}?format=wav streams
+    one, honouring Range (single ranges) and If-None-Match."""
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    class MappedResponse(Response):
+        """Hands slices of the mapping straight to the server, one send per chunk."""
+
+        def __init__(self, clip, start, end, status_code, headers):
+            super().__init__(status_code=status_code, headers=headers,
+                             media_type=clip.content_type)
+            self.chunks = list(clip.chunks(start, end)) or [b""]
+
+        async def __call__(self, scope, receive, send):
+            await send({"type": "http.response.start", "status": self.status_code,
+                        "headers": self.raw_headers})
+            last = len(self.chunks) - 1
+            for i, chunk in enumerate(self.chunks):
+                await send({"type": "http.response.body", "body": chunk, "more_body": i < last})
+
+    async def list_clips(request):
+        return JSONResponse({"formats": library.formats(), "clips": [
+            dict(library.info(name), url=f"{path}/{name}") for name in sorted(library.paths)]})
+
+    async def get_clip(request):
+        name = request.path_params["name"]
+        if name not in library.paths:
+            return JSONResponse({"error": f"Unknown clip: {name}"}, status_code=404)
+        format = request.query_params.get("format", "source")
+        try:
+            if library.transcoded(name, format):
+                clip = library.open(name, format)
+            else:
+                # A first transcode takes a while, so keep it off the event loop
+                clip = await asyncio.to_thread(library.open, name, format)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        except TranscodeError as e:
+            return JSONResponse({"error": str(e)}, status_code=503)
+        headers = {"Accept-Ranges": "bytes", "ETag": clip.etag,
+                   "Cache-Control": "public, max-age=3600"}
+        if request.headers.get("if-none-match") == clip.etag:
+            return Response(status_code=304, headers=headers)
+        try:
+            span = parse_range(request.headers.get("range"), clip.size)
+            # A Range for an older version of the clip gets the whole new one
+            if request.headers.get("if-range", clip.etag) != clip.etag:
+                span = None
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{clip.size}"
+            return Response(status_code=416, headers=headers)
+        start, end = span or (0, clip.size)
+        headers["Content-Length"] = str(end - start)
+        if span:
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{clip.size}"
+        status = 206 if span else 200
+        if request.method == "HEAD":
+            return Response(status_code=status, headers=headers, media_type=clip.content_type)
+        return MappedResponse(clip, start, end, status, headers)
+
+    return [Route(path, list_clips, methods=["GET", "HEAD"]),
+            Route(path + "/{name}", get_clip, methods=["GET", "HEAD"])]
+
+def serve_audio(library, port, host="127.0.0.1"):
+    """Serve audio_routes() on their own port from a daemon thread, for servers running
+    over stdio. Returns the uvicorn server."""
+    import uvicorn
+    from starlette.applications import Starlette
+    server = uvicorn.Server(uvicorn.Config(Starlette(routes=audio_routes(library)), host=host,
+                                           port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="audio-http", daemon=True).start()
+    log.info("🔊 Audio on http://%s:%s/audio", host, port)
+    return server
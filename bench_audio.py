@@ -0,0 +1,43 @@
+import asyncio
+import os
+import time
+
+# Measures time-to-first-sample for the GiggleBot audio engine: from a say_* tool call to
+# the mixer starting the clip. Runs headless unless SDL_AUDIODRIVER is already set.
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from fastmcp import Client
+import mcp_server_using_fastmcp as server
+
+CALLS = 200
+
+async def main():
+    engine = server.engine
+    engine.start()
+    print(f"🔊 {len(engine.paths)} clips decoded, {engine.cached_bytes() / 1e6:.1f} MB cached")
+
+    # Engine alone, interrupting so every call starts a clip immediately
+    engine.latencies_ms.clear()
+    for _ in range(CALLS):
+        engine.play("say_hello", "interrupt")
+        time.sleep(0.002)
+    time.sleep(0.05)
+    print(f"engine.play      {engine.latency_stats()}")
+
+    # Through MCP tool calls (in-memory transport)
+    engine.latencies_ms.clear()
+    tool_ms = []
+    async with Client(server.app) as client:
+        for _ in range(CALLS):
+            start = time.perf_counter()
+            await client.call_tool("play_clip", {"name": "say_rating_10", "policy": "interrupt"})
+            tool_ms.append((time.perf_counter() - start) * 1000)
+    time.sleep(0.05)
+    tool_ms.sort()
+    print(f"play_clip tool   {engine.latency_stats()}")
+    print(f"tool round trip  p50={tool_ms[len(tool_ms) // 2]:.3f} ms "
+          f"p95={tool_ms[int(len(tool_ms) * 0.95)]:.3f} ms")
+    engine.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Remote clip downloads (audio_stream.py) under many concurrent clients. The server runs in
+# a subprocess in one of two modes:
+#   mmap:  audio_routes(), each file mapped once and streamed in CHUNK_SIZE slices
+#   read:  the naive handler, which reads the whole file into a bytes object per request
+# --clients keep GETs for random clips in flight (a share of them Range requests, like a
+# player seeking), in the source format and as WAV. Reported: requests/s, MB/s, latency,
+# and the server's peak anonymous memory (RssAnon, sampled from /proc, so Linux only),
+# which leaves out the page cache behind the mappings.
+#
+#   python bench_audio_stream.py
+#   python bench_audio_stream.py --clients 64 --seconds 10 --json stream.json
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("FURBY_LOG_LEVEL", "WARNING")
+
+def serve(mode, port, cache_dir):
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Route
+    from audio_engine import AudioEngine
+    from audio_stream import CONTENT_TYPES, AudioLibrary, audio_routes, parse_range
+
+    library = AudioLibrary(AudioEngine().paths, cache_dir)
+    for name in library.paths:
+        library.path(name, "wav")
+    if mode == "mmap":
+        routes = audio_routes(library)
+    else:
+        async def read_whole(request):
+            path = library.path(request.path_params["name"],
+                                request.query_params.get("format", "source"))
+            with open(path, "rb") as f:
+                data = f.read()
+            span = parse_range(request.headers.get("range"), len(data))
+            if span:
+                return Response(data[span[0]:span[1]], status_code=206,
+                                media_type=CONTENT_TYPES[os.path.splitext(path)[1]])
+            return Response(data, media_type=CONTENT_TYPES[os.path.splitext(path)[1]])
+        routes = [Route("/audio/{name}", read_whole)]
+    uvicorn.run(Starlette(routes=routes), host="127.0.0.1", port=port, log_level="warning")
+
+def rss_anon_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1])
+    return 0
+
+async def fetch(reader, writer, target, extra, rate=None):
+    """One GET on a keep-alive connection; a bare-bones client, so the server is the
+    bottleneck rather than the client. With `rate` (bytes/s) the body is read like a
+    player on a slow link would."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: bench\r\n{extra}\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+    if rate is None:
+        return len(await reader.readexactly(length))
+    for offset in range(0, length, 4096):
+        await reader.readexactly(min(4096, length - offset))
+        await asyncio.sleep(4096 / rate)
+    return length
+
+async def load(port, names, args):
+    latencies, sizes = [], []
+    deadline = time.perf_counter() + args.seconds
+
+    async def client(rng, rate):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=4096)
+        while time.perf_counter() < deadline:
+            name, fmt = rng.choice(names), rng.choice(("source", "wav"))
+            extra = ""
+            if rng.random() < args.ranges:
+                start = rng.randrange(0, 40000)
+                extra = f"Range: bytes={start}-{start + 16383}\r\n"
+            started = time.perf_counter()
+            sizes.append(await fetch(reader, writer, f"/audio/{name}?format={fmt}", extra, rate))
+            latencies.append((time.perf_counter() - started) * 1000)
+        writer.close()
+
+    rate = args.slow_kbps * 1000 if args.slow_kbps else None
+    await asyncio.gather(*(client(random.Random(i), rate) for i in range(args.clients)))
+    latencies.sort()
+    return {"requests_per_s": round(len(latencies) / args.seconds),
+            "mb_per_s": round(sum(sizes) / args.seconds / 1e6, 1),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2)}
+
+async def bench_mode(mode, port, names, args, cache_dir):
+    server = subprocess.Popen([sys.executable, __file__, "--serve", mode, "--port", str(port),
+                               "--cache-dir", cache_dir])
+    try:
+        for _ in range(100):
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                await fetch(reader, writer, f"/audio/{names[0]}", "")
+                writer.close()
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        idle_kb = rss_anon_kb(server.pid)
+        peak_kb = idle_kb
+        task = asyncio.create_task(load(port, names, args))
+        while not task.done():
+            peak_kb = max(peak_kb, rss_anon_kb(server.pid))
+            await asyncio.sleep(0.01)
+        result = task.result()
+        result["rss_anon_growth_mb"] = round((peak_kb - idle_kb) / 1024, 1)
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+async def main(args):
+    from audio_engine import AudioEngine
+    names = sorted(AudioEngine().paths)
+    cache_dir = tempfile.mkdtemp()
+    results = {}
+    for i, mode in enumerate(("read", "mmap")):
+        results[mode] = await bench_mode(mode, args.port + i, names, args, cache_dir)
+        print(f"{mode:5} {results[mode]}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked mmap audio streaming benchmark")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=5.0, help="load time per mode")
+    parser.add_argument("--ranges", type=float, default=0.25, help="share of Range requests")
+    parser.add_argument("--slow-kbps", type=float, help="read bodies at this rate, in kB/s")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--serve", choices=("mmap", "read"), help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    from furby_log import setup_logging
+    setup_logging()
+    if args.serve:
+        serve(args.serve, args.port, args.cache_dir)
+        sys.exit()
+    results = asyncio.run(main(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
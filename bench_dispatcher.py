@@ -0,0 +1,57 @@
+import asyncio
+import time
+from furby_dispatch import ResponseDispatcher
+
+# Micro-benchmark: per-notification cost with many requests in flight.
+# Compares the old global list scan against ResponseDispatcher.
+
+NOTIFICATIONS = 20000
+IN_FLIGHT = (1, 10, 100, 500, 1000)
+# A spread of prefixes, as if several kinds of request were waiting at once
+PREFIXES = [bytes([0x22]), bytes([0x21]), bytes([0x24]), bytes([0x30])]
+
+def legacy_dispatch(pending, data):
+    # The original notification_handler, minus the print
+    for fut, prefix in pending[:]:
+        if prefix is None or data.startswith(prefix):
+            if not fut.done():
+                fut.set_result(data)
+            pending.remove((fut, prefix))
+
+async def bench_legacy(loop, in_flight):
+    pending = [(loop.create_future(), PREFIXES[i % len(PREFIXES)]) for i in range(in_flight)]
+    unmatched = bytes([0x55, 0x01])
+    start = time.perf_counter_ns()
+    for _ in range(NOTIFICATIONS):
+        legacy_dispatch(pending, unmatched)
+    return (time.perf_counter_ns() - start) / NOTIFICATIONS
+
+async def bench_dispatcher(in_flight):
+    dispatcher = ResponseDispatcher()
+    for i in range(in_flight):
+        dispatcher.expect(PREFIXES[i % len(PREFIXES)])
+    unmatched = bytes([0x55, 0x01])
+    start = time.perf_counter_ns()
+    for _ in range(NOTIFICATIONS):
+        dispatcher.dispatch(unmatched)
+    unmatched_ns = (time.perf_counter_ns() - start) / NOTIFICATIONS
+
+    # Matched replies: keep the queue topped up so every notification resolves a waiter
+    reply = bytes([0x22, 0x01])
+    start = time.perf_counter_ns()
+    for _ in range(NOTIFICATIONS):
+        dispatcher.expect(PREFIXES[0])
+        dispatcher.dispatch(reply)
+    matched_ns = (time.perf_counter_ns() - start) / NOTIFICATIONS
+    return unmatched_ns, matched_ns
+
+async def main():
+    loop = asyncio.get_running_loop()
+    print(f"{'in flight':>10} {'legacy ns':>12} {'unmatched ns':>14} {'expect+match ns':>16}")
+    for in_flight in IN_FLIGHT:
+        legacy_ns = await bench_legacy(loop, in_flight)
+        unmatched_ns, matched_ns = await bench_dispatcher(in_flight)
+        print(f"{in_flight:>10} {legacy_ns:>12.0f} {unmatched_ns:>14.0f} {matched_ns:>16.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+# Latency/throughput suite against the simulated Furby (furby_sim.py), so it runs anywhere.
+# Save a run with --json and compare a later one against it with --compare.
+os.environ["FURBY_DEVICE_CACHE"] = os.path.join(tempfile.mkdtemp(), "furby_devices.json")
+os.environ["FURBY_DURATIONS"] = os.path.join(tempfile.mkdtemp(), "durations.json")
+os.environ.setdefault("FURBY_LOG_LEVEL", "WARNING")
+
+import furby_sim
+from furby_codec import get_command_table
+from furby_log import setup_logging
+from furby_scheduler import PRIORITY_NORMAL, PRIORITY_URGENT
+from furby_tracker import action_key, get_duration_table
+from pyFurby import KEEP_ALIVE_CMD, KEEP_ALIVE_RESP_PREFIX, pyFurby
+
+def percentiles(samples_ms):
+    samples = sorted(samples_ms)
+    if not samples:
+        return {"n": 0}
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))], 3)
+
+    return {"n": len(samples), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "max": round(samples[-1], 3)}
+
+async def bench_connect(sim, rounds):
+    """Cold (scan + full service discovery) and warm (device cache) connect times."""
+    cold, warm = [], []
+    for _ in range(rounds):
+        furby = pyFurby()
+        furby.device_cache.forget(sim.address)
+        await furby.connect()
+        cold.append(furby.connect_time * 1000)
+        await furby.disconnect()
+        await furby.connect()
+        warm.append(furby.connect_time * 1000)
+        await furby.disconnect()
+    return {"connect_cold_ms": percentiles(cold), "connect_warm_ms": percentiles(warm)}
+
+async def bench_round_trip(furby, rounds):
+    """Write a keep-alive and wait for its reply."""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await furby.scheduler.send(KEEP_ALIVE_CMD, PRIORITY_URGENT, None, KEEP_ALIVE_RESP_PREFIX)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"round_trip_ms": percentiles(samples)}
+
+async def bench_throughput(furby, count):
+    """Queue `count` actions at once and measure how fast they drain."""
+    frames = [f for f, ok in zip(get_command_table().frames, get_command_table().valid) if ok]
+    latencies = []
+
+    async def one(frame):
+        start = time.perf_counter()
+        await furby.scheduler.send(frame, PRIORITY_NORMAL)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(frames[i % len(frames)]) for i in range(count)))
+    elapsed = time.perf_counter() - start
+    return {"commands_per_s": round(count / elapsed, 1), "command_ms": percentiles(latencies)}
+
+async def bench_keep_alive(sim, idle):
+    """Leave a connection idle and count what the keep-alive costs on the link."""
+    furby = pyFurby(sim.address)
+    await furby.connect()
+    writes, keep_alives = sim.writes, sim.keep_alives
+    await asyncio.sleep(idle)
+    sent = sim.keep_alives - keep_alives
+    other = sim.writes - writes - sent
+    await furby.disconnect()
+    return {"keep_alives_per_min": round(sent * 60 / idle, 1),
+            "idle_other_writes": other}
+
+async def bench_perform(sim, rounds, timed):
+    """Play a few actions of known length back to back with perform() and measure the dead
+    air between them. With `timed` their durations are in the table first; otherwise each
+    is assumed to take DEFAULT_DURATION."""
+    table = get_command_table()
+    ids = [i for i, ok in enumerate(table.valid) if ok][:4]
+    for i, action_id in enumerate(ids):
+        nums = tuple(table.frames[action_id][2:])
+        sim.durations[nums] = 0.3 + 0.2 * i
+        # Forget what earlier runs taught the table about them
+        get_duration_table().durations.pop(action_key(nums), None)
+        if timed:
+            get_duration_table().observe(nums, sim.durations[nums])
+    sim.busy_until = 0.0
+    furby = pyFurby(sim.address)
+    await furby.connect()
+    interrupted = sim.interrupted
+    gaps = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await furby.perform_all(ids)
+        played = sum(sim.durations[tuple(table.frames[i][2:])] for i in ids)
+        gaps.append((time.perf_counter() - start - played) * 1000 / len(ids))
+    await furby.disconnect()
+    sim.durations.clear()
+    suffix = "" if timed else "_untimed"
+    return {f"perform_dead_air_ms{suffix}": percentiles(gaps),
+            f"perform_cut_off{suffix}": sim.interrupted - interrupted}
+
+async def bench_mcp(rounds):
+    """End-to-end tool calls through the Furby MCP server (in-memory transport)."""
+    from fastmcp import Client
+    import mcp_server_furby_actions as server
+    action_id = next(i for i, ok in enumerate(get_command_table().valid) if ok)
+    results = {}
+    async with Client(server.app) as client:
+        await client.call_tool("connect_furby", {"count": 1})
+        for tool, args in (("furby_status", {}), ("send_action", {"action_id": action_id})):
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await client.call_tool(tool, args)
+                samples.append((time.perf_counter() - start) * 1000)
+            results[f"mcp_{tool}_ms"] = percentiles(samples)
+        await client.call_tool("disconnect_furby")
+    return results
+
+async def main(args):
+    sim = furby_sim.SimulatedFurby(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                                   loss=args.loss, seed=args.seed)
+    furby_sim.install(sim)
+    results = {"link": {"latency_ms": args.latency, "jitter_ms": args.jitter,
+                        "loss": args.loss, "seed": args.seed}}
+    results.update(await bench_connect(sim, args.connects))
+    for pipeline in (False, True):
+        furby = pyFurby(sim.address, pipeline=pipeline)
+        await furby.connect()
+        if not pipeline:
+            results.update(await bench_round_trip(furby, args.rounds))
+        throughput = await bench_throughput(furby, args.commands)
+        await furby.disconnect()
+        suffix = "_pipelined" if pipeline else ""
+        results.update({k + suffix: v for k, v in throughput.items()})
+    results.update(await bench_keep_alive(sim, args.idle))
+    for timed in (False, True):
+        results.update(await bench_perform(sim, args.performs, timed))
+    results.update(await bench_mcp(args.rounds))
+    return results
+
+def report(results, baseline=None):
+    for name, value in results.items():
+        if name == "link":
+            print(f"🔧 link: {value}")
+            continue
+        line = f"{name:28} {value}"
+        old = (baseline or {}).get(name)
+        if isinstance(value, dict) and isinstance(old, dict):
+            deltas = [f"{q} {value[q] - old[q]:+.3f}" for q in ("p50", "p95", "p99")
+                      if q in value and q in old]
+            line += f"   vs baseline: {', '.join(deltas)}"
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            line += f"   vs baseline: {value - old:+.1f}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=8.0, help="one-way link latency, ms")
+    parser.add_argument("--jitter", type=float, default=2.0, help="+/- jitter, ms")
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss probability")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--connects", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--commands", type=int, default=500)
+    parser.add_argument("--performs", type=int, default=5, help="rounds of back-to-back actions")
+    parser.add_argument("--idle", type=float, default=8.0, help="seconds idle for the keep-alive run")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="show deltas against an earlier --json file")
+    args = parser.parse_args()
+    setup_logging()
+    results = asyncio.run(main(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,50 @@
+import asyncio
+import io
+import time
+
+# Floods notification_handler with DEBUG logging on and a slow output stream (1 ms per
+# write, like a busy journal or pipe), and compares it with printing straight to that stream.
+# Reports how long the event loop spends per notification and its longest stall.
+from furby_log import hexdump, setup_logging, stop_logging
+from pyFurby import pyFurby
+
+NOTIFICATIONS = 2000
+WRITE_DELAY = 0.001
+
+class SlowStream(io.StringIO):
+    def write(self, s):
+        time.sleep(WRITE_DELAY)
+        return super().write(s)
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (f"p50={samples[len(samples) // 2] * 1000:.1f} µs "
+            f"p99={samples[int(len(samples) * 0.99)] * 1000:.1f} µs max={samples[-1]:.3f} ms")
+
+async def flood(handler):
+    frame = bytearray(b"\x21\x10\x00\x00\x00\x00\x00\x00")
+    samples = []
+    for i in range(NOTIFICATIONS):
+        start = time.perf_counter()
+        handler("rx", frame)
+        samples.append((time.perf_counter() - start) * 1000)
+        if i % 50 == 0:
+            await asyncio.sleep(0)
+    return samples
+
+async def main():
+    stream = SlowStream()
+
+    def print_handler(sender, data):
+        print(f"📩 Notification from {sender}: {data.hex()}", file=stream)
+
+    print(f"print()         {percentiles(await flood(print_handler))}")
+
+    setup_logging(stream=SlowStream(), levels={"notify": "DEBUG"})
+    furby = pyFurby("bench")
+    print(f"queued logging  {percentiles(await flood(furby.notification_handler))}")
+    print(f"hexdump wrapper {percentiles(await flood(lambda s, d: hexdump(d)))}")
+    stop_logging()
+
+if __name__ == "__main__":
+    asyncio.run(main())
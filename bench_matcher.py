@@ -0,0 +1,58 @@
+import time
+from furby_matcher import get_matcher, load_matcher
+
+# Measures how long the text-to-action matcher takes per sentence, alone and in batches,
+# plus the cold (cached matrix) load time.
+SENTENCES = [
+    "Hello there, friend!",
+    "I am so hungry, let's eat something.",
+    "That joke was hilarious, ha ha!",
+    "Good night, sleep tight.",
+    "Oh no, that's really sad.",
+    "I love you so much.",
+    "Wow, we are unstoppable!",
+    "Let's dance and sing a song.",
+]
+ROUNDS = 200
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (f"p50={samples[len(samples) // 2]:.3f} ms "
+            f"p95={samples[int(len(samples) * 0.95)]:.3f} ms max={samples[-1]:.3f} ms")
+
+def main():
+    get_matcher()  # make sure the cache file exists
+    start = time.perf_counter()
+    matcher = load_matcher()
+    print(f"📦 {len(matcher)} phrases x {matcher.matrix.shape[0]} features, "
+          f"loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    single = []
+    for _ in range(ROUNDS):
+        for sentence in SENTENCES:
+            start = time.perf_counter()
+            matcher.match([sentence], k=5)
+            single.append((time.perf_counter() - start) * 1000)
+    print(f"one sentence     {percentiles(single)}")
+
+    for size in (8, 32, 128):
+        batch = (SENTENCES * (size // len(SENTENCES) + 1))[:size]
+        per_sentence = []
+        for _ in range(ROUNDS // 4):
+            start = time.perf_counter()
+            matcher.match(batch, k=5)
+            per_sentence.append((time.perf_counter() - start) * 1000 / size)
+        print(f"batch of {size:<4}    per sentence {percentiles(per_sentence)}")
+
+    reply = " ".join(SENTENCES)
+    suggest = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        matcher.suggest(reply)
+        suggest.append((time.perf_counter() - start) * 1000)
+    print(f"suggest ({len(SENTENCES)} clauses) {percentiles(suggest)}")
+    for step in matcher.suggest(reply):
+        print(f"  {step['text']!r:45} -> {step['Action']} ({step['score']})")
+
+if __name__ == "__main__":
+    main()
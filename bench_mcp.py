@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import time
+from contextlib import asynccontextmanager
+import anyio
+from fastmcp import Client
+from fastmcp.client.transports import PythonStdioTransport
+
+# Load generator for the MCP servers. One client session is shared by every request, the tool
+# list is fetched once, and calls are pipelined: either N workers calling back to back
+# (--concurrency) or requests started on a fixed schedule (--rate, with --concurrency capping
+# how many are in flight). Runs over stdio and streamable-http and reports requests/s and
+# latency percentiles per transport and per tool.
+#
+#   python bench_mcp.py --workload furby --concurrency 16 --requests 500
+#   python bench_mcp.py --workload gigglebot --rate 50 --duration 10 --transport http
+#   python bench_mcp.py --workload calls.jsonl --record again.jsonl
+
+# Weighted tool mixes. `setup` runs once per session before the timed calls.
+WORKLOADS = {
+    "furby": {
+        "server": "mcp_server_furby_actions.py",
+        "setup": [("connect_furby", {"count": 1})],
+        "mix": [
+            ("furby_status", {}, 3),
+            ("send_named_command", {"command": "laugh"}, 4),
+            ("query_furby_actions", {"text": "giggle", "limit": 5}, 2),
+            ("list_furby_actions", {}, 1),
+        ],
+    },
+    "gigglebot": {
+        "server": "mcp_server_using_fastmcp.py",
+        "setup": [],
+        "mix": [
+            ("say_rating_10", {}, 1),
+            ("say_rating_7", {}, 2),
+            ("say_rating_3", {}, 2),
+            ("say_rating_1", {}, 1),
+            ("query_furby_actions", {"text": "giggle", "limit": 5}, 2),
+        ],
+    },
+}
+
+# How long to wait for a spawned server to start answering
+SERVER_START_TIMEOUT = 30.0
+# A scheduled call that goes out later than this (no free slot, or a busy loop) counts as late
+LATE_AFTER = 0.01
+
+def percentiles(samples_ms):
+    samples = sorted(samples_ms)
+    if not samples:
+        return {"n": 0}
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))], 3)
+
+    return {"n": len(samples), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "max": round(samples[-1], 3)}
+
+def synthetic_calls(mix, seed=0):
+    """Endless stream of (tool, arguments) drawn from a weighted mix."""
+    rng = random.Random(seed)
+    tools = [(tool, args) for tool, args, _ in mix]
+    weights = [weight for _, _, weight in mix]
+    while True:
+        yield rng.choices(tools, weights)[0]
+
+def load_recording(path):
+    """Read a recorded workload: one {"tool", "arguments", "t"} object per line, where `t` is
+    the send time in seconds from the start of the run (optional)."""
+    calls = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                calls.append((entry["tool"], entry.get("arguments") or {}, entry.get("t")))
+    return calls
+
+class _Client(Client):
+    """fastmcp 2.5 gives the server one second to answer `initialize`, which a server
+    started over stdio doesn't make (importing fastmcp alone takes about that long)."""
+
+    @asynccontextmanager
+    async def _context_manager(self):
+        async with self.transport.connect_session(**self._session_kwargs) as session:
+            self._session = session
+            try:
+                with anyio.fail_after(SERVER_START_TIMEOUT):
+                    self._initialize_result = await session.initialize()
+                yield
+            finally:
+                self._session = None
+                self._initialize_result = None
+
+class LoadClient:
+    """One MCP session shared by every request, with the tool list cached at connect.
+
+    call() may be awaited from many tasks at once; requests are pipelined on the session and
+    matched back to their callers by request id."""
+
+    def __init__(self, transport):
+        self.client = _Client(transport)
+        self.tools = {}
+
+    async def __aenter__(self):
+        await self.client.__aenter__()
+        self.tools = {tool.name: tool for tool in await self.client.list_tools()}
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.__aexit__(*exc)
+
+    async def call(self, tool, arguments=None):
+        """Call a tool; returns (ok, seconds). Unknown tools fail without a round trip."""
+        if tool not in self.tools:
+            return False, 0.0
+        start = time.perf_counter()
+        try:
+            result = await self.client.call_tool_mcp(tool, arguments or {})
+            ok = not result.isError
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start
+
+class Run:
+    """Latencies and errors collected during one timed run."""
+
+    def __init__(self, record=None):
+        self.latencies = {}
+        self.errors = {}
+        self.late = 0
+        self.record = record
+        self.started = time.perf_counter()
+
+    def add(self, tool, arguments, ok, latency, sent_at):
+        self.latencies.setdefault(tool, []).append(latency * 1000)
+        if not ok:
+            self.errors[tool] = self.errors.get(tool, 0) + 1
+        if self.record is not None:
+            self.record.append({"tool": tool, "arguments": arguments,
+                                "t": round(sent_at - self.started, 6)})
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        everything = [ms for samples in self.latencies.values() for ms in samples]
+        return {
+            "requests": len(everything),
+            "errors": sum(self.errors.values()),
+            "seconds": round(elapsed, 3),
+            "requests_per_s": round(len(everything) / elapsed, 1) if elapsed else None,
+            "late_starts": self.late,
+            "latency_ms": percentiles(everything),
+            "tools": {tool: dict(percentiles(samples), errors=self.errors.get(tool, 0))
+                      for tool, samples in sorted(self.latencies.items())},
+        }
+
+async def closed_loop(client, calls, concurrency, run):
+    """`concurrency` workers, each sending its next call as soon as the last one returns."""
+    calls = iter(calls)
+
+    async def worker():
+        for tool, arguments, _ in calls:
+            sent_at = time.perf_counter()
+            ok, latency = await client.call(tool, arguments)
+            run.add(tool, arguments, ok, latency, sent_at)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def open_loop(client, calls, concurrency, run):
+    """Start each call at its scheduled time whether or not earlier ones have finished.
+    Latency is measured from the scheduled time, so a backed-up server can't hide its
+    queueing by slowing the generator down. At most `concurrency` calls are in flight."""
+    slots = asyncio.Semaphore(concurrency)
+    pending = set()
+
+    async def one(tool, arguments, due):
+        try:
+            ok, _ = await client.call(tool, arguments)
+            run.add(tool, arguments, ok, time.perf_counter() - due, due)
+        finally:
+            slots.release()
+
+    for tool, arguments, offset in calls:
+        due = run.started + offset
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await slots.acquire()
+        if time.perf_counter() - due > LATE_AFTER:
+            run.late += 1
+        task = asyncio.create_task(one(tool, arguments, due))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    await asyncio.gather(*pending)
+
+def plan(args, workload):
+    """The calls to make as (tool, arguments, send offset or None), and whether they have a
+    schedule (open loop) or just an order (closed loop)."""
+    if workload is None:
+        recorded = load_recording(args.workload)
+        if args.rate:
+            return [(tool, arguments, i / args.rate)
+                    for i, (tool, arguments, _) in enumerate(recorded)], True
+        if all(t is not None for _, _, t in recorded):
+            return [(tool, arguments, t / args.speed) for tool, arguments, t in recorded], True
+        return recorded, False
+    calls = synthetic_calls(workload["mix"], args.seed)
+    if args.rate:
+        count = int(args.rate * args.duration)
+        return [(tool, arguments, i / args.rate)
+                for i, (tool, arguments) in enumerate(itertools.islice(calls, count))], True
+    return [(tool, arguments, None)
+            for tool, arguments in itertools.islice(calls, args.requests)], False
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def start_http_server(script, env):
+    """Run a server script with `fastmcp run` on streamable-http; returns (process, url)."""
+    fastmcp = shutil.which("fastmcp")
+    if fastmcp is None:
+        raise RuntimeError("fastmcp CLI not found; start the server yourself and pass --url")
+    port = free_port()
+    process = subprocess.Popen([fastmcp, "run", script, "--transport", "streamable-http",
+                                "--port", str(port)], env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/mcp"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{script} exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, url
+        except OSError:
+            await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{script} didn't start listening on port {port}")
+
+async def bench_transport(name, args, workload, setup, script, env, record):
+    process = None
+    if name == "stdio":
+        transport = PythonStdioTransport(script, env=env)
+    elif args.url:
+        transport = args.url
+    else:
+        process, transport = await start_http_server(script, env)
+    try:
+        connect_start = time.perf_counter()
+        async with LoadClient(transport) as client:
+            connect_ms = (time.perf_counter() - connect_start) * 1000
+            for tool, arguments in setup:
+                await client.call(tool, arguments)
+            calls, scheduled = plan(args, workload)
+            run = Run(record)
+            if scheduled:
+                await open_loop(client, calls, args.concurrency, run)
+            else:
+                await closed_loop(client, calls, args.concurrency, run)
+            result = {"connect_ms": round(connect_ms, 3), "tools_cached": len(client.tools)}
+            result.update(run.report())
+            return result
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+async def main(args):
+    workload = WORKLOADS.get(args.workload)
+    if workload is None and not os.path.isfile(args.workload):
+        raise SystemExit(f"Unknown workload {args.workload!r}: use one of "
+                         f"{', '.join(WORKLOADS)} or a recorded .jsonl file")
+    script = args.server or (workload or WORKLOADS["furby"])["server"]
+    # Recordings get the setup calls of whichever known server they're replayed against
+    setup = next((w["setup"] for w in WORKLOADS.values()
+                  if os.path.basename(script) == w["server"]), [])
+    env = dict(os.environ)
+    # Simulated Furbies and no sound card needed, unless the caller says otherwise
+    env.setdefault("FURBY_SIMULATOR", "1")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env.setdefault("FURBY_LOG_LEVEL", "WARNING")
+    # pygame's import banner goes to stdout and would corrupt the stdio transport
+    env.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    results = {"workload": args.workload, "server": script, "concurrency": args.concurrency,
+               "rate": args.rate}
+    for i, name in enumerate(args.transport.split(",")):
+        # Only the first transport's calls are recorded
+        record = [] if args.record and i == 0 else None
+        results[name] = await bench_transport(name, args, workload, setup, script, env, record)
+        if record is not None:
+            with open(args.record, "w", encoding="utf-8") as f:
+                for entry in sorted(record, key=lambda e: e["t"]):
+                    f.write(json.dumps(entry) + "\n")
+    return results
+
+def report(results):
+    for name, value in results.items():
+        if not isinstance(value, dict):
+            print(f"🔧 {name}: {value}")
+            continue
+        print(f"\n🚦 {name}: {value['requests']} requests, {value['errors']} errors, "
+              f"{value['requests_per_s']} req/s, connect {value['connect_ms']} ms"
+              + (f", {value['late_starts']} late starts" if value["late_starts"] else ""))
+        print(f"  {'all':26} {value['latency_ms']}")
+        for tool, stats in value["tools"].items():
+            print(f"  {tool:26} {stats}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the MCP servers")
+    parser.add_argument("--workload", default="furby",
+                        help=f"{' or '.join(WORKLOADS)}, or a recorded .jsonl file")
+    parser.add_argument("--server", help="server script (default: the workload's server)")
+    parser.add_argument("--transport", default="stdio,http", help="stdio, http or both")
+    parser.add_argument("--url", help="use an already running HTTP server instead of starting one")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="workers (closed loop) or max in-flight calls (with --rate)")
+    parser.add_argument("--requests", type=int, default=500, help="calls per transport")
+    parser.add_argument("--rate", type=float, help="target requests/s (open loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run with --rate")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay a recording faster")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", help="write the calls made to this .jsonl file")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    results = asyncio.run(main(args))
+    report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
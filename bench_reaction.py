@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+# Joke-rating reactions end to end, against simulated Furbies with the dummy sound card.
+#   pipeline:  one react_to_joke call on the GiggleBot server, which starts the clip and the
+#              Furby actions together. Skew is the clip's start minus the first Furby write,
+#              as reported by the tool.
+#   baseline:  the old flow of say_rating_X on the GiggleBot server, then send_action on the
+#              Furby server. Skew is approximated as the gap between the two calls returning
+#              (each returns right after its clip or write started).
+# Tool latency is the wall time of the whole reaction as a client sees it.
+#
+#   python bench_reaction.py
+#   python bench_reaction.py --rounds 200 --furbies 3 --json reaction.json
+workdir = tempfile.mkdtemp()
+os.environ.setdefault("FURBY_SIMULATOR", "1")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("FURBY_LOG_LEVEL", "WARNING")
+os.environ["FURBY_DEVICE_CACHE"] = os.path.join(workdir, "furby_devices.json")
+os.environ["FURBY_DURATIONS"] = os.path.join(workdir, "durations.json")
+
+from fastmcp import Client
+
+import mcp_server_furby_actions
+import mcp_server_using_fastmcp
+from furby_catalog import get_catalog
+from furby_log import setup_logging
+from furby_reaction import reaction_for
+
+SCORES = (10, 8, 4.5, 1)
+
+def result(response):
+    return json.loads(response[0].text)
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {"p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            "max_ms": round(samples[-1], 3)}
+
+def action_id(action):
+    return get_catalog().query(*action, None, 0, 1, ["id"])["actions"][0]["id"]
+
+async def bench_baseline(args):
+    ids = {score: action_id(reaction_for(score).actions[0]) for score in SCORES}
+    skews, latencies = [], []
+    async with Client(mcp_server_using_fastmcp.app) as gigglebot, \
+            Client(mcp_server_furby_actions.app) as furby:
+        await gigglebot.call_tool("warm_up", {"wait": True})
+        await furby.call_tool("connect_furby", {"count": args.furbies})
+        for i in range(args.rounds):
+            score = SCORES[i % len(SCORES)]
+            start = time.perf_counter()
+            await gigglebot.call_tool(reaction_for(score).clip)
+            audio_at = time.perf_counter()
+            await furby.call_tool("send_action", {"action_id": ids[score]})
+            done = time.perf_counter()
+            skews.append(abs(done - audio_at) * 1000)
+            latencies.append((done - start) * 1000)
+        await furby.call_tool("disconnect_furby")
+    return {"skew": summarize(skews), "latency": summarize(latencies)}
+
+async def bench_pipeline(args):
+    skews, latencies = [], []
+    async with Client(mcp_server_using_fastmcp.app) as gigglebot:
+        await gigglebot.call_tool("connect_furby", {"count": args.furbies})
+        for i in range(args.rounds):
+            start = time.perf_counter()
+            reaction = result(await gigglebot.call_tool(
+                "react_to_joke", {"score": SCORES[i % len(SCORES)]}))
+            latencies.append((time.perf_counter() - start) * 1000)
+            if reaction["skew_ms"] is not None:
+                skews.append(abs(reaction["skew_ms"]))
+    return {"skew": summarize(skews), "latency": summarize(latencies)}
+
+async def main(args):
+    results = {"baseline": await bench_baseline(args), "pipeline": await bench_pipeline(args)}
+    for name, stats in results.items():
+        for metric, value in stats.items():
+            print(f"{name:9} {metric:8} {value}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="react_to_joke skew and latency benchmark")
+    parser.add_argument("--rounds", type=int, default=100, help="reactions per flow")
+    parser.add_argument("--furbies", type=int, default=2, help="simulated Furbies")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    setup_logging()
+    os.environ.setdefault("FURBY_SIM_COUNT", str(args.furbies))
+    results = asyncio.run(main(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start cost of the MCP servers, as a client that spawns them over stdio sees it.
+# Each server is started fresh `--rounds` times and timed from spawn to the initialize reply,
+# to the list_tools reply and to the reply of its first real tool call, next to a bare
+# FastMCP server that has no tools. Import time is measured on its own, beyond importing
+# fastmcp. Exits non-zero if a server adds more than --budget-ms to list_tools.
+#
+#   python bench_startup.py
+#   python bench_startup.py --warm        # with FURBY_WARM_UP / GIGGLEBOT_WARM_UP set
+
+SERVERS = {
+    "furby": ("mcp_server_furby_actions.py", "FURBY_WARM_UP",
+              ("query_furby_actions", {"text": "giggle", "limit": 1})),
+    "gigglebot": ("mcp_server_using_fastmcp.py", "GIGGLEBOT_WARM_UP",
+                  ("say_rating_7", {})),
+}
+BARE_SERVER = "from fastmcp import FastMCP; FastMCP('bare').run()"
+
+# Time a server may add to the first list_tools reply over a bare FastMCP server
+STARTUP_BUDGET_MS = 200.0
+
+IMPORT_TIMER = """
+import time
+start = time.perf_counter()
+import fastmcp
+loaded = time.perf_counter()
+import {module}
+print((loaded - start) * 1000, (time.perf_counter() - loaded) * 1000)
+"""
+
+def import_ms(module, env):
+    """(fastmcp import, server import beyond that) in ms, in a fresh interpreter."""
+    out = subprocess.run([sys.executable, "-c", IMPORT_TIMER.format(module=module)], env=env,
+                         capture_output=True, text=True, check=True).stdout
+    fastmcp_ms, server_ms = out.split()[-2:]
+    return float(fastmcp_ms), float(server_ms)
+
+async def first_responses(command, first_call, env):
+    """Spawn a stdio server and time each reply from the moment it was spawned."""
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        env=env)
+    next_id = 0
+
+    async def request(method, params=None):
+        nonlocal next_id
+        next_id += 1
+        message = {"jsonrpc": "2.0", "id": next_id, "method": method, "params": params or {}}
+        process.stdin.write((json.dumps(message) + "\n").encode())
+        await process.stdin.drain()
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"server exited during {method}")
+            reply = json.loads(line)
+            if reply.get("id") == next_id:
+                if "error" in reply:
+                    raise RuntimeError(f"{method}: {reply['error']}")
+                return (time.perf_counter() - start) * 1000
+
+    try:
+        timings = {"initialize": await request("initialize", {
+            "protocolVersion": "2025-03-26", "capabilities": {},
+            "clientInfo": {"name": "bench_startup", "version": "1"}})}
+        process.stdin.write(b'{"jsonrpc": "2.0", "method": "notifications/initialized"}\n')
+        timings["list_tools"] = await request("tools/list")
+        if first_call is not None:
+            tool, arguments = first_call
+            timings["first_call"] = await request("tools/call",
+                                                  {"name": tool, "arguments": arguments})
+        return timings
+    finally:
+        process.kill()
+        await process.wait()
+
+def median(samples):
+    return round(statistics.median(samples), 1)
+
+async def bench_server(command, first_call, env, rounds):
+    runs = [await first_responses(command, first_call, env) for _ in range(rounds)]
+    return {f"{step}_ms": median([run[step] for run in runs]) for step in runs[0]}
+
+async def main(args):
+    env = dict(os.environ)
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    env.setdefault("FURBY_LOG_LEVEL", "WARNING")
+    results = {"bare": await bench_server([sys.executable, "-c", BARE_SERVER], None, env,
+                                          args.rounds)}
+    for name, (script, warm_up_env, first_call) in SERVERS.items():
+        server_env = dict(env)
+        if args.warm:
+            server_env[warm_up_env] = "1"
+        imports = [import_ms(script[:-3], server_env) for _ in range(args.rounds)]
+        result = {"import_fastmcp_ms": median([i[0] for i in imports]),
+                  "import_server_ms": median([i[1] for i in imports])}
+        result.update(await bench_server([sys.executable, script], first_call, server_env,
+                                         args.rounds))
+        result["list_tools_overhead_ms"] = round(result["list_tools_ms"]
+                                                 - results["bare"]["list_tools_ms"], 1)
+        results[name] = result
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCP server cold-start benchmark")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="start the servers' warm-up at load")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="max time a server may add to list_tools over a bare server")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    results = asyncio.run(main(args))
+    over = []
+    for name, result in results.items():
+        print(f"{name:10} {result}")
+        if result.get("list_tools_overhead_ms", 0) > args.budget_ms:
+            over.append(name)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if over:
+        print(f"❌ Over the {args.budget_ms:.0f} ms startup budget: {', '.join(over)}")
+        sys.exit(1)
+    print(f"✅ Every server within the {args.budget_ms:.0f} ms startup budget")
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+# Cost of recording BLE sessions (furby_trace.py) and of reading traces back.
+#   hot path:  time per recorded write/notification, and keep-alive round trips against a
+#              simulated Furby with FURBY_TRACE off and on
+#   stats:     records/s for a single-pass stats() over a synthetic trace, and the peak
+#              Python memory it takes, which shouldn't grow with the trace
+#   replay:    the recorded session replayed at full speed against the simulator
+#
+#   python bench_trace.py --records 1000000
+workdir = tempfile.mkdtemp()
+os.environ["FURBY_DEVICE_CACHE"] = os.path.join(workdir, "furby_devices.json")
+os.environ["FURBY_DURATIONS"] = os.path.join(workdir, "durations.json")
+os.environ.setdefault("FURBY_LOG_LEVEL", "WARNING")
+os.environ.pop("FURBY_TRACE", None)
+
+import furby_sim
+import furby_trace
+from furby_log import setup_logging
+from furby_scheduler import PRIORITY_URGENT
+from pyFurby import KEEP_ALIVE_CMD, KEEP_ALIVE_RESP_PREFIX, pyFurby
+
+def record_ns(count):
+    recorder = furby_trace.TraceRecorder(os.path.join(workdir, "hot.trace"))
+    trace = recorder.session("SIM:FB:00:00:00:01")
+    frame = bytes([0x13, 0x00, 1, 2, 3, 4])
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        trace.tx(frame, time.monotonic())
+    elapsed = time.perf_counter_ns() - start
+    recorder.close()
+    return round(elapsed / count, 1)
+
+async def round_trips_ms(rounds):
+    furby = pyFurby("SIM:FB:00:00:00:01")
+    await furby.connect()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await furby.scheduler.send(KEEP_ALIVE_CMD, PRIORITY_URGENT, None, KEEP_ALIVE_RESP_PREFIX)
+    elapsed = time.perf_counter() - start
+    await furby.disconnect()
+    return round(elapsed / rounds * 1000, 3)
+
+def synthetic_trace(path, records):
+    """A session of keep-alive writes, each answered 16 ms later, 100 ms apart."""
+    recorder = furby_trace.TraceRecorder(path)
+    trace = recorder.session("SIM:FB:00:00:00:01")
+    t_ns = time.monotonic_ns()
+    for i in range(records // 2):
+        recorder.append(trace.session_id, furby_trace.KIND_TX, KEEP_ALIVE_CMD, t_ns)
+        recorder.append(trace.session_id, furby_trace.KIND_RX, b"\x22\x00", t_ns + 16_000_000)
+        t_ns += 100_000_000
+    recorder.append(trace.session_id, furby_trace.KIND_END, b"done", t_ns)
+    recorder.close()
+
+def bench_stats(records):
+    path = os.path.join(workdir, "synthetic.trace")
+    synthetic_trace(path, records)
+    start = time.perf_counter()
+    with furby_trace.Trace(path) as trace:
+        report = trace.stats()
+        count = len(trace)
+    elapsed = time.perf_counter() - start
+    # Again under tracemalloc, which slows allocation down too much to time
+    tracemalloc.start()
+    with furby_trace.Trace(path) as trace:
+        trace.stats()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"records": count, "file_mb": round(os.path.getsize(path) / 1e6, 1),
+            "records_per_s": round(count / elapsed), "peak_kb": round(peak / 1024, 1),
+            "reply_latency_ms": report[0]["reply_latency_ms"]}
+
+async def bench_replay(rounds):
+    path = os.path.join(workdir, "session.trace")
+    os.environ["FURBY_TRACE"] = path
+    furby = pyFurby("SIM:FB:00:00:00:01")
+    await furby.connect()
+    for _ in range(rounds):
+        await furby.scheduler.send(KEEP_ALIVE_CMD, PRIORITY_URGENT, None, KEEP_ALIVE_RESP_PREFIX)
+        await asyncio.sleep(0.005)
+    await furby.disconnect()
+    del os.environ["FURBY_TRACE"]
+    with furby_trace.Trace(path) as trace:
+        recorded = trace.stats()[0]
+        result = await furby_trace.replay(trace, recorded["session"], speed=0)
+    return {"recorded_tx": recorded["tx"], "recorded_latency_ms": recorded["reply_latency_ms"],
+            "replayed": result}
+
+async def main(args):
+    furby_sim.install()
+    results = {"record_ns": record_ns(args.calls)}
+    results["round_trip_ms"] = {"off": await round_trips_ms(args.rounds)}
+    os.environ["FURBY_TRACE"] = os.path.join(workdir, "round_trips.trace")
+    results["round_trip_ms"]["on"] = await round_trips_ms(args.rounds)
+    del os.environ["FURBY_TRACE"]
+    results["stats"] = bench_stats(args.records)
+    results["replay"] = await bench_replay(args.rounds)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BLE session trace benchmark")
+    parser.add_argument("--calls", type=int, default=200000, help="records for the hot path")
+    parser.add_argument("--rounds", type=int, default=200, help="keep-alive round trips")
+    parser.add_argument("--records", type=int, default=500000, help="synthetic trace size")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    setup_logging()
+    results = asyncio.run(main(args))
+    for name, value in results.items():
+        print(f"{name:14} {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
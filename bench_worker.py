@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+
+# Command timing under server load, with the BLE link in the server's process and in a
+# worker process (furby_worker). A sequence of --steps actions, --interval seconds apart,
+# plays while --load threads serialize the full action list to JSON over and over, like a
+# server busy answering list_furby_actions. Each step's lateness (sent minus planned) is
+# measured where the link lives, against simulated Furbies with no link jitter, so any
+# spread comes from scheduling.
+#
+#   python bench_worker.py
+#   python bench_worker.py --load 8 --steps 100 --json worker.json
+os.environ.setdefault("FURBY_SIMULATOR", "1")
+os.environ.setdefault("FURBY_SIM_JITTER_MS", "0")
+os.environ.setdefault("FURBY_LOG_LEVEL", "WARNING")
+os.environ.setdefault("FURBY_DURATIONS", os.path.join(
+    os.environ.get("TMPDIR", "/tmp"), "bench_worker.durations.json"))
+
+from furby_catalog import get_catalog
+from furby_log import setup_logging
+from furby_loop import get_ble_loop
+from furby_worker import FurbyProxy
+from pyFurby import pyFurby
+
+MODES = {"in-process": pyFurby, "worker": FurbyProxy}
+
+def serialize_forever(stop):
+    actions = get_catalog().all()
+    while not stop.is_set():
+        json.dumps(actions)
+
+async def lateness_ms(furby, steps, interval):
+    plan = [{"action": 1, "delay": interval if i else 0.0} for i in range(steps)]
+    result = await get_ble_loop().call(furby.perform_sequence(plan))
+    return [(s["sent"] - s["planned"]) * 1000 for s in result["steps"] if s["sent"] is not None]
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {"p50_ms": round(statistics.median(samples), 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+            "max_ms": round(samples[-1], 2),
+            "jitter_ms": round(statistics.pstdev(samples), 2)}
+
+async def bench_mode(factory, args):
+    furby = factory("SIM:FB:00:00:00:01")
+    if not await get_ble_loop().call(furby.connect()):
+        raise RuntimeError("Couldn't connect to the simulated Furby")
+    results = {}
+    try:
+        for load in (0, args.load):
+            stop = threading.Event()
+            threads = [threading.Thread(target=serialize_forever, args=(stop,), daemon=True)
+                       for _ in range(load)]
+            for thread in threads:
+                thread.start()
+            try:
+                samples = await lateness_ms(furby, args.steps, args.interval)
+            finally:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+            results[f"load_{load}"] = summarize(samples)
+    finally:
+        await get_ble_loop().call(furby.disconnect())
+    return results
+
+async def main(args):
+    get_catalog().all()
+    results = {}
+    for name, factory in MODES.items():
+        results[name] = await bench_mode(factory, args)
+        for load, stats in results[name].items():
+            print(f"{name:11} {load:8} {stats}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BLE command jitter, in-process vs worker")
+    parser.add_argument("--steps", type=int, default=60, help="actions per sequence (max 64)")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between steps")
+    parser.add_argument("--load", type=int, default=4, help="JSON serializing threads")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    setup_logging()
+    started = time.perf_counter()
+    results = asyncio.run(main(args))
+    print(f"⏱️ {time.perf_counter() - started:.1f}s")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -2,25 +2,14 @@ import asyncio
 import time
 from bleak import BleakScanner, BleakClient
 
-# UUIDs for the Furby BLE service and characteristics
-# There are more UUIDs for other services, but these are the ones used for action commands
-RX_CHAR_UUID = "dab91382-b5a1-e29c-b041-bcd562613bde"
-TX_CHAR_UUID = "dab91383-b5a1-e29c-b041-bcd562613bde"
-
-# Pre-selected Furby commands used for testing
-FURBY_COMMANDS = {
-    "fart":   bytes([0x13, 0x00, 0x01, 0x02, 0x01, 0x04]),
-    "snore":  bytes([0x13, 0x00, 0x4a, 0x00, 0x00, 0x01]),
-    "toot":   bytes([0x13, 0x00, 0x07, 0x00, 0x01, 0x02]),
-    "laugh":  bytes([0x13, 0x00, 0x02, 0x00, 0x00, 0x00]),
-}
+# UUIDs, the pre-selected test commands (fart, snore, toot, laugh), the keep-alive and the
+# action encoding come from the library, so this script sends exactly what the servers send
+from furby_codec import encode_action
+from furby_idle import KEEP_ALIVE_CMD, KEEP_ALIVE_RESP_PREFIX
+from pyFurby import FURBY_COMMANDS, RX_CHAR_UUID, TX_CHAR_UUID
 
 last_command_time = 0.0
 
-# Command to keep Furby focused and not constantly reacting like a caffeinated child
-KEEP_ALIVE_CMD = bytes([0x20, 0x06])
-KEEP_ALIVE_RESP_PREFIX = b'\x22'
-
 # List of (future, prefix) pairs for response matching
 pending_responses = []
 
@@ -68,14 +57,16 @@ async def keep_alive_task(client, tx_uuid):
 
 async def main():
     print("🔍 Scanning for BLE devices...")
-    devices = await BleakScanner.discover(timeout=5.0)
-    furby = next((d for d in devices if d.name and "Furby" in d.name), None)
+    # Stop scanning as soon as the first Furby advertises
+    furby = await BleakScanner.find_device_by_filter(
+        lambda d, ad: bool(d.name and "Furby" in d.name), timeout=5.0
+    )
     if not furby:
         print("❌ No device named 'Furby' found.")
         return
 
     print(f"✅ Found Furby @ {furby.address}")
-    client = BleakClient(furby.address)
+    client = BleakClient(furby)
 
     try:
         await client.connect(timeout=10.0)
@@ -108,13 +99,14 @@ async def main():
                 # Try to parse as W,X,Y,Z
                 try:
                     nums = [int(x) for x in cmd.split(",")]
-                    if len(nums) == 4 and all(0 <= n <= 255 for n in nums):
-                        data = bytes([0x13, 0x00] + nums)
+                    try:
+                        data = encode_action(nums)
+                    except ValueError:
+                        print("❌ Enter four numbers between 0 and 255, separated by commas.")
+                    else:
                         print(f"➡️ Sending custom command: {data.hex()}")
                         await send_command(client, TX_CHAR_UUID, data, None)
                         print("✅ Sent custom command.")
-                    else:
-                        print("❌ Enter four numbers between 0 and 255, separated by commas.")
                 except Exception:
                     print("❌ Unknown command or invalid format.")
 
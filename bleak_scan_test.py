@@ -1,28 +1,33 @@
 import asyncio
+import time
 from bleak import BleakScanner, BleakClient
 
 async def scan_and_connect():
-    print("🔍 Scanning for BLE devices (5 seconds)...")
+    print("🔍 Scanning for BLE devices (up to 5 seconds)...")
+    start = time.perf_counter()
+    seen = set()
+
+    def found(d, ad):
+        # Print each device as it shows up; stop at the first Furby
+        if d.address not in seen:
+            seen.add(d.address)
+            print(f"Found: {d.name} @ {d.address}")
+        return bool(d.name and "Furby" in d.name)
+
     try:
-        devices = await BleakScanner.discover(timeout=5.0)
+        furby = await BleakScanner.find_device_by_filter(found, timeout=5.0)
     except Exception as e:
         print(f"⚠️ Scan failed: {e}")
         return
 
-    furby = None
-    for d in devices:
-        print(f"Found: {d.name} @ {d.address}")
-        if d.name and "Furby" in d.name:
-            furby = d
-            break
-
     if not furby:
         print("❌ No device named 'Furby' found.")
         return
 
+    print(f"⏱️ Scan took {(time.perf_counter() - start) * 1000:.0f} ms")
     print(f"✅ Found Furby: {furby.name} @ {furby.address}")
 
-    client = BleakClient(furby.address)
+    client = BleakClient(furby)
     try:
         await client.connect(timeout=10.0)
         if not client.is_connected:
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+
+# Default location of the Furby action list, next to this file so servers launched from
+# another working directory (e.g. spawned over stdio) still find it
+ACTION_LIST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "actionlist.json")
+
+# The four numbers that make up a custom command, in send order
+ACTION_FIELDS = ("Input", "Index", "SubIndex", "specific")
+# Everything a query can hand back for an action
+ALL_FIELDS = ("id",) + ACTION_FIELDS + ("Action",)
+# Largest page query() returns; all() is there for the whole list
+MAX_PAGE_SIZE = 200
+
+def parse_field(value):
+    """Parse a catalog field into a tuple of ints.
+
+    Most fields are a single number ("7"), but the list also has sets ("3, 4", "2,3,4"),
+    ranges ("0-10", "0 - 7") and unknowns ("x"). Unknowns parse to an empty tuple.
+    """
+    values = []
+    for part in str(value).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, _, hi = part.partition("-")
+            try:
+                lo, hi = int(lo), int(hi)
+            except ValueError:
+                continue
+            values.extend(range(lo, hi + 1))
+        else:
+            try:
+                values.append(int(part))
+            except ValueError:
+                continue
+    return tuple(v for v in values if 0 <= v <= 255)
+
+class ActionCatalog:
+    """In-memory, indexed copy of actionlist.json.
+
+    The file is parsed once and only re-read when its mtime changes. Lookups by
+    Input/Index/SubIndex/specific go through per-field indexes instead of a list scan.
+    """
+
+    def __init__(self, path=ACTION_LIST_PATH):
+        self.path = path
+        self.actions = []
+        self._raw = []
+        self._mtime_ns = None
+        self._texts = []
+        self._indexes = {field: {} for field in ACTION_FIELDS}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the action list if the file changed on disk. Returns True if reloaded."""
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        if mtime_ns == self._mtime_ns:
+            return False
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return False
+            self._load(mtime_ns)
+        return True
+
+    def _load(self, mtime_ns):
+        with open(self.path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        actions = []
+        texts = []
+        indexes = {field: {} for field in ACTION_FIELDS}
+        for action_id, entry in enumerate(raw):
+            action = {"id": action_id}
+            for field in ACTION_FIELDS:
+                action[field] = entry.get(field, "")
+                for value in parse_field(action[field]):
+                    indexes[field].setdefault(value, []).append(action_id)
+            action["Action"] = entry.get("Action", "")
+            actions.append(action)
+            texts.append(action["Action"].lower())
+        # Swap everything in at once so readers never see a half-built catalog
+        self.actions, self._raw, self._texts, self._indexes = actions, raw, texts, indexes
+        self._mtime_ns = mtime_ns
+
+    def __len__(self):
+        self.refresh()
+        return len(self.actions)
+
+    def all(self):
+        """Return every action exactly as stored in the file. The list is shared, don't modify it."""
+        self.refresh()
+        return self._raw
+
+    def get(self, action_id):
+        """Return a single action by its position in the list, or None."""
+        self.refresh()
+        if 0 <= action_id < len(self.actions):
+            return dict(self.actions[action_id])
+        return None
+
+    def find(self, input=None, index=None, subindex=None, specific=None, text=None):
+        """Return the ids of all actions matching every given filter, in list order."""
+        self.refresh()
+        actions, texts, indexes = self.actions, self._texts, self._indexes
+        candidates = None
+        for field, value in zip(ACTION_FIELDS, (input, index, subindex, specific)):
+            if value is None:
+                continue
+            ids = indexes[field].get(value, ())
+            candidates = set(ids) if candidates is None else candidates.intersection(ids)
+            if not candidates:
+                return []
+        ids = sorted(candidates) if candidates is not None else range(len(actions))
+        if text:
+            needle = text.lower()
+            ids = [i for i in ids if needle in texts[i]]
+        return list(ids)
+
+    def query(self, input=None, index=None, subindex=None, specific=None, text=None,
+              offset=0, limit=20, fields=None):
+        """Filtered, paginated and projected view of the catalog.
+
+        Returns a dict with the total match count, the page bounds and the page of actions,
+        each trimmed to `fields` (default: all fields plus the action id). `limit` is clamped
+        to 0..MAX_PAGE_SIZE. Raises ValueError for a field that doesn't exist.
+        """
+        unknown = [f for f in fields or () if f not in ALL_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. "
+                             f"Use any of {', '.join(ALL_FIELDS)}.")
+        ids = self.find(input, index, subindex, specific, text)
+        fields = tuple(fields or ALL_FIELDS)
+        offset = max(0, offset)
+        limit = MAX_PAGE_SIZE if limit is None else min(max(0, limit), MAX_PAGE_SIZE)
+        page = ids[offset:offset + limit]
+        actions = self.actions
+        return {
+            "total": len(ids),
+            "offset": offset,
+            "limit": limit,
+            "actions": [{f: actions[i][f] for f in fields} for i in page],
+        }
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def get_catalog(path=ACTION_LIST_PATH) -> ActionCatalog:
+    """Return the shared catalog for `path`, loading it on first use."""
+    path = os.path.abspath(path)
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.setdefault(path, ActionCatalog(path))
+    catalog.refresh()
+    return catalog
@@ -0,0 +1,195 @@
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from furby_catalog import ACTION_FIELDS, ACTION_LIST_PATH, parse_field
+from furby_log import get_logger
+
+log = get_logger("codec")
+
+# Every action command is 0x13 0x00 followed by the four catalog numbers
+ACTION_PREFIX = bytes([0x13, 0x00])
+FRAME_SIZE = 6
+
+# Compiled table lives next to the action list and is rebuilt when the list changes
+COMMAND_TABLE_PATH = os.path.splitext(ACTION_LIST_PATH)[0] + ".bin"
+
+# File layout: header, then count * 6-byte frames, then count validity flags,
+# then the slug names as newline-separated utf-8
+TABLE_MAGIC = b"FRBC"
+TABLE_VERSION = 1
+HEADER = struct.Struct("<4sHHIq")  # magic, version, frame size, count, source mtime_ns
+# get_command_table() looks at the action list's mtime at most this often
+RELOAD_CHECK_INTERVAL = 1.0
+
+def encode_action(nums):
+    """Encode four 0-255 numbers as an action command frame. Raises ValueError if invalid."""
+    if len(nums) != 4 or not all(0 <= n <= 255 for n in nums):
+        raise ValueError("Action commands need four numbers between 0 and 255.")
+    return ACTION_PREFIX + bytes(nums)
+
+def slugify(text):
+    """Turn an action description into a lower-case, dash-separated name."""
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    return slug or "action"
+
+def compile_table(json_path=ACTION_LIST_PATH):
+    """Compile the action list into the binary table format. Returns the file contents.
+
+    Fields that hold a set or range ("3, 4", "0-10") use their first value; entries with
+    no usable number ("x") are kept, so ids still line up with the catalog, but marked invalid.
+    """
+    import json
+    with open(json_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    frames = bytearray()
+    flags = bytearray()
+    slugs = []
+    seen = {}
+    for entry in raw:
+        nums = [parse_field(entry.get(field, "")) for field in ACTION_FIELDS]
+        if all(nums):
+            frames += encode_action([n[0] for n in nums])
+            flags.append(1)
+        else:
+            frames += bytes(FRAME_SIZE)
+            flags.append(0)
+        slug = slugify(entry.get("Action", ""))
+        seen[slug] = seen.get(slug, 0) + 1
+        if seen[slug] > 1:
+            slug = f"{slug}-{seen[slug]}"
+        slugs.append(slug)
+    header = HEADER.pack(TABLE_MAGIC, TABLE_VERSION, FRAME_SIZE, len(raw),
+                         os.stat(json_path).st_mtime_ns)
+    return header + bytes(frames) + bytes(flags) + "\n".join(slugs).encode("utf-8")
+
+class CommandTable:
+    """Ready-to-send frames for every catalog action, backed by a memory-mapped file.
+
+    frames[action_id] is a 6-byte view that can go straight to write_gatt_char;
+    nothing is encoded or copied when sending.
+    """
+
+    def __init__(self, data):
+        magic, version, frame_size, count, self.source_mtime_ns = HEADER.unpack_from(data, 0)
+        if magic != TABLE_MAGIC or version != TABLE_VERSION or frame_size != FRAME_SIZE:
+            raise ValueError("Not a compiled Furby command table.")
+        self._data = data
+        view = memoryview(data)
+        frames_start = HEADER.size
+        flags_start = frames_start + count * FRAME_SIZE
+        slugs_start = flags_start + count
+        self.frames = [view[o:o + FRAME_SIZE]
+                       for o in range(frames_start, flags_start, FRAME_SIZE)]
+        self.valid = bytes(view[flags_start:slugs_start])
+        self.names = bytes(view[slugs_start:]).decode("utf-8").split("\n") if count else []
+        self._by_name = {name: i for i, name in enumerate(self.names)}
+        self._by_tuple = {}
+        for i, frame in enumerate(self.frames):
+            if self.valid[i]:
+                self._by_tuple.setdefault(tuple(frame[2:]), i)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def lookup(self, nums):
+        """Return the id of the action whose frame carries these four numbers, or None."""
+        return self._by_tuple.get(tuple(nums))
+
+    def by_name(self, name):
+        """Return the id of the action with this slug name, or None."""
+        return self._by_name.get(name)
+
+    def resolve(self, action):
+        """Resolve an id, slug name or (Input, Index, SubIndex, specific) tuple to a valid id.
+        Anything else (bools, floats, malformed tuples) resolves to None."""
+        if isinstance(action, bool):
+            return None
+        if isinstance(action, int):
+            action_id = action if 0 <= action < len(self.frames) else None
+        elif isinstance(action, str):
+            action_id = self._by_name.get(action)
+        elif isinstance(action, (tuple, list)):
+            try:
+                action_id = self._by_tuple.get(tuple(action))
+            except TypeError:
+                return None
+        else:
+            return None
+        if action_id is None or not self.valid[action_id]:
+            return None
+        return action_id
+
+    def frame(self, action):
+        """Return the ready-to-send frame for an action, or None if it can't be resolved."""
+        action_id = self.resolve(action)
+        return None if action_id is None else self.frames[action_id]
+
+    def close(self):
+        """Drop the frames and unmap the file. A frame still held elsewhere (e.g. queued
+        for sending) keeps the mapping open until it's dropped too."""
+        self.frames = []
+        if isinstance(self._data, mmap.mmap):
+            try:
+                self._data.close()
+            except BufferError:
+                pass
+
+def load_command_table(json_path=ACTION_LIST_PATH, table_path=COMMAND_TABLE_PATH):
+    """Load the compiled command table, rebuilding it first if the action list changed.
+
+    Only the action list's mtime is checked, so a warm start never parses the JSON.
+    """
+    try:
+        source_mtime_ns = os.stat(json_path).st_mtime_ns
+    except FileNotFoundError:
+        source_mtime_ns = None
+    try:
+        with open(table_path, "rb") as f:
+            # Check the header before mapping so a stale table is never held open
+            magic, version, _, _, table_mtime_ns = HEADER.unpack(f.read(HEADER.size))
+            if magic == TABLE_MAGIC and version == TABLE_VERSION and (
+                    source_mtime_ns is None or table_mtime_ns == source_mtime_ns):
+                return CommandTable(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except (OSError, ValueError, struct.error):
+        pass
+    data = compile_table(json_path)
+    try:
+        tmp_path = table_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, table_path)
+    except OSError as e:
+        log.warning("⚠️ Could not cache command table: %s", e)
+    return CommandTable(data)
+
+_command_table = None
+_command_table_lock = threading.Lock()
+_checked_at = 0.0
+
+def get_command_table():
+    """Return the shared command table, loading it on first use and again when the action
+    list's mtime changes, like get_catalog(), so frames and catalog agree. The mtime is
+    checked at most every RELOAD_CHECK_INTERVAL seconds, so sending stays syscall-free."""
+    global _command_table, _checked_at
+    table = _command_table
+    now = time.monotonic()
+    if table is not None and now - _checked_at < RELOAD_CHECK_INTERVAL:
+        return table
+    _checked_at = now
+    try:
+        source_mtime_ns = os.stat(ACTION_LIST_PATH).st_mtime_ns
+    except FileNotFoundError:
+        source_mtime_ns = None
+    if table is not None and (source_mtime_ns is None
+                              or table.source_mtime_ns == source_mtime_ns):
+        return table
+    with _command_table_lock:
+        if _command_table is table:
+            _command_table = load_command_table()
+            if table is not None:
+                table.close()
+        return _command_table
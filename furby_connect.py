@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import time
+from bleak import BleakScanner
+from furby_log import get_logger
+
+if os.environ.get("FURBY_SIMULATOR"):
+    from furby_sim import SimBleakScanner as BleakScanner
+
+log = get_logger("scan")
+
+# Known Furbies and where their characteristics live, so a warm reconnect can skip scanning
+DEVICE_CACHE_PATH = os.environ.get(
+    "FURBY_DEVICE_CACHE", os.path.join(os.path.expanduser("~"), ".furby_devices.json")
+)
+
+FURBY_NAME = "Furby"
+
+def is_furby(device, advertisement_data=None):
+    """Scanner filter: does this advertisement come from a Furby?"""
+    name = device.name or (advertisement_data.local_name if advertisement_data else None)
+    return bool(name and FURBY_NAME in name)
+
+async def find_furby(timeout=5.0):
+    """Scan until the first Furby advertisement arrives (or `timeout` runs out).
+    Returns the BLEDevice, or None if nothing turned up."""
+    return await BleakScanner.find_device_by_filter(is_furby, timeout=timeout)
+
+async def find_furbies(timeout=5.0, max_devices=None):
+    """Scan for Furbies, stopping early once `max_devices` have been seen.
+    Returns the BLEDevices in the order they were found."""
+    found = {}
+    enough = asyncio.Event()
+
+    def detected(device, advertisement_data):
+        if device.address not in found and is_furby(device, advertisement_data):
+            found[device.address] = device
+            if max_devices is not None and len(found) >= max_devices:
+                enough.set()
+
+    async with BleakScanner(detected):
+        try:
+            await asyncio.wait_for(enough.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    return list(found.values())
+
+class DeviceCache:
+    """Small JSON file of Furbies we've connected to before, keyed by address.
+
+    Each entry records the GATT service holding the TX/RX characteristics and their
+    handles, so service discovery on reconnect can be limited to that one service.
+    """
+
+    def __init__(self, path=DEVICE_CACHE_PATH):
+        self.path = path
+        self.devices = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.devices = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, address):
+        return self.devices.get(address)
+
+    def latest(self):
+        """The most recently connected device, or None."""
+        if not self.devices:
+            return None
+        return max(self.devices.values(), key=lambda e: e.get("last_connected", 0))
+
+    def remember(self, address, name, tx_char, rx_char):
+        self.devices[address] = {
+            "address": address,
+            "name": name,
+            "service": tx_char.service_uuid,
+            "tx_handle": tx_char.handle,
+            "rx_handle": rx_char.handle,
+            "last_connected": time.time(),
+        }
+        self.save()
+
+    def forget(self, address):
+        if self.devices.pop(address, None) is not None:
+            self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.devices, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("⚠️ Could not save device cache: %s", e)
+
+_device_caches = {}
+
+def get_device_cache(path=DEVICE_CACHE_PATH):
+    """Return the shared device cache for `path`, so several pyFurby instances don't
+    overwrite each other's entries."""
+    cache = _device_caches.get(path)
+    if cache is None:
+        cache = _device_caches[path] = DeviceCache(path)
+    return cache
@@ -0,0 +1,74 @@
+import asyncio
+from collections import deque
+
+class ResponseDispatcher:
+    """Routes RX notifications to the futures waiting on them, one dispatcher per connection.
+
+    Waiters are kept in a FIFO per response prefix, so a notification costs one dict lookup
+    per distinct prefix length no matter how many requests are in flight. Futures that time
+    out or get cancelled are left in place and skipped when they reach the front of the queue.
+    """
+
+    def __init__(self):
+        self._waiters = {}      # prefix -> deque of futures, oldest first
+        self._lengths = ()      # distinct prefix lengths currently registered
+        self._any = deque()     # futures that take the next notification, whatever it is
+
+    def expect(self, prefix=None):
+        """Return a future resolved with the next notification starting with `prefix`
+        (or the next notification of any kind if `prefix` is None)."""
+        fut = asyncio.get_running_loop().create_future()
+        if prefix is None:
+            waiters = self._any
+        else:
+            prefix = bytes(prefix)
+            waiters = self._waiters.get(prefix)
+            if waiters is None:
+                waiters = self._waiters[prefix] = deque()
+                if len(prefix) not in self._lengths:
+                    self._lengths = tuple(sorted(set(self._lengths) | {len(prefix)}))
+        # Drop timed-out waiters from the front while we're here, so a reply that never
+        # comes can't grow the queue forever
+        while waiters and waiters[0].done():
+            waiters.popleft()
+        waiters.append(fut)
+        return fut
+
+    def dispatch(self, data):
+        """Hand a notification to the oldest live waiter for it. Returns True if one took it."""
+        if self._any and self._resolve(self._any, data):
+            return True
+        waiters = self._waiters
+        if not waiters:
+            return False
+        for length in self._lengths:
+            prefix = bytes(data[:length])
+            queue = waiters.get(prefix)
+            if queue is None:
+                continue
+            resolved = self._resolve(queue, data)
+            if not queue:
+                del waiters[prefix]
+            if resolved:
+                return True
+        return False
+
+    @staticmethod
+    def _resolve(queue, data):
+        while queue:
+            fut = queue.popleft()
+            if not fut.done():
+                fut.set_result(bytes(data))
+                return True
+        return False
+
+    def pending(self):
+        """Number of waiters still queued (including any not yet cleaned up)."""
+        return len(self._any) + sum(len(q) for q in self._waiters.values())
+
+    def cancel_all(self):
+        """Cancel every waiter, e.g. when the connection goes away."""
+        for queue in (self._any, *self._waiters.values()):
+            while queue:
+                queue.popleft().cancel()
+        self._waiters.clear()
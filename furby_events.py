@@ -0,0 +1,227 @@
+import asyncio
+import time
+from collections import deque
+
+# Notification frames start with a type byte
+FRAME_SENSOR = 0x21
+FRAME_KEEP_ALIVE = 0x22
+
+EVENT_SENSOR = "sensor"
+EVENT_KEEP_ALIVE = "keep_alive"
+EVENT_RAW = "raw"   # any frame type without a decoder; the frame is kept as-is
+
+# Sensor frames carry a 16-bit little-endian flag field in bytes 1-2, one bit per sensor
+SENSOR_BITS = {
+    "antenna_left": 0x0001,
+    "antenna_right": 0x0002,
+    "antenna_forward": 0x0004,
+    "antenna_back": 0x0008,
+    "pet_head": 0x0010,
+    "pet_back": 0x0020,
+    "tickle_tummy": 0x0040,
+    "tongue": 0x0080,
+    "tilt": 0x0100,
+    "upside_down": 0x0200,
+    "shake": 0x0400,
+}
+
+# What a subscriber's full queue does with a new event
+DROP_OLDEST = "drop_oldest"   # make room by dropping the oldest queued event
+DROP_NEWEST = "drop_newest"   # keep what's queued and drop the new event
+DROP_CLOSE = "close"          # close the subscription; the consumer is too slow to be useful
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, DROP_CLOSE)
+
+class FurbyEvent:
+    """A decoded notification. `frame` is a view of the bytes bleak delivered, not a copy."""
+
+    __slots__ = ("kind", "device", "time", "frame")
+
+    def __init__(self, kind, device, time, frame):
+        self.kind = kind
+        self.device = device
+        self.time = time
+        self.frame = frame
+
+    def as_dict(self):
+        return {"kind": self.kind, "device": self.device, "time": self.time,
+                "frame": self.frame.hex()}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.kind} from {self.device}>"
+
+class SensorEvent(FurbyEvent):
+    __slots__ = ("flags",)
+
+    def __init__(self, device, time, frame):
+        super().__init__(EVENT_SENSOR, device, time, frame)
+        self.flags = frame[1] | frame[2] << 8 if len(frame) >= 3 else 0
+
+    def __contains__(self, sensor):
+        return bool(self.flags & SENSOR_BITS[sensor])
+
+    def sensors(self):
+        """Names of the sensors that are active in this frame."""
+        return tuple(name for name, bit in SENSOR_BITS.items() if self.flags & bit)
+
+    def as_dict(self):
+        d = super().as_dict()
+        d["sensors"] = list(self.sensors())
+        return d
+
+class KeepAliveEvent(FurbyEvent):
+    __slots__ = ("status",)
+
+    def __init__(self, device, time, frame):
+        super().__init__(EVENT_KEEP_ALIVE, device, time, frame)
+        self.status = frame[1] if len(frame) >= 2 else None
+
+    def as_dict(self):
+        d = super().as_dict()
+        d["status"] = self.status
+        return d
+
+PARSERS = {
+    FRAME_SENSOR: SensorEvent,
+    FRAME_KEEP_ALIVE: KeepAliveEvent,
+}
+
+def parse_frame(data, device=None, now=None):
+    """Decode one notification into an event without copying it."""
+    frame = memoryview(data)
+    now = time.monotonic() if now is None else now
+    parser = PARSERS.get(frame[0]) if len(frame) else None
+    if parser is None:
+        return FurbyEvent(EVENT_RAW, device, now, frame)
+    return parser(device, now, frame)
+
+class Subscription:
+    """One consumer's view of an EventStream: `async for event in subscription`.
+
+    Events wait in a bounded queue; when it's full, `policy` decides what gets dropped
+    (counted in `dropped`). Publishing may happen on another thread's loop (the BLE loop),
+    in which case the consumer is woken thread-safely. Iteration ends once closed and drained.
+    """
+
+    def __init__(self, stream, kinds=None, predicate=None, maxsize=64, policy=DROP_OLDEST):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"policy must be one of {DROP_POLICIES}")
+        self.stream = stream
+        self.kinds = frozenset(kinds) if kinds else None
+        self.predicate = predicate
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._queue = deque()
+        self._waiter = None
+        self._loop = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _offer(self, event):
+        if self.closed or (self.kinds is not None and event.kind not in self.kinds):
+            return
+        if self.predicate is not None and not self.predicate(event):
+            return
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return
+            if self.policy == DROP_CLOSE:
+                self.close()
+                return
+            self._queue.popleft()
+        self._queue.append(event)
+        self._wake()
+
+    def _wake(self):
+        waiter = self._waiter
+        if waiter is None or waiter.done():
+            return
+        try:
+            same_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            same_loop = False
+        if same_loop:
+            waiter.set_result(None)
+        else:
+            self._loop.call_soon_threadsafe(_set_done, waiter)
+
+    def drain(self):
+        """Take every queued event without waiting."""
+        events = list(self._queue)
+        self._queue.clear()
+        return events
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.stream._unsubscribe(self)
+        self._wake()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            if self._queue:
+                return self._queue.popleft()
+            if self.closed:
+                raise StopAsyncIteration
+            self._loop = asyncio.get_running_loop()
+            self._waiter = self._loop.create_future()
+            # Re-check after publishing the waiter, in case an event landed in between
+            if not self._queue and not self.closed:
+                try:
+                    await self._waiter
+                finally:
+                    self._waiter = None
+            self._waiter = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+def _set_done(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+class EventStream:
+    """Fans events out to any number of subscribers, each with its own filter and queue.
+
+    A stream with a `parent` also republishes everything to it, which is how a fleet
+    gets one stream covering all its Furbies.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._subscribers = ()
+
+    @property
+    def active(self):
+        """True if anyone would receive a published event; callers can skip parsing if not."""
+        return bool(self._subscribers) or (self.parent is not None and self.parent.active)
+
+    def subscribe(self, kinds=None, predicate=None, maxsize=64, policy=DROP_OLDEST):
+        sub = Subscription(self, kinds, predicate, maxsize, policy)
+        # Copy-on-write, so publish() never iterates a list that's changing under it
+        self._subscribers = self._subscribers + (sub,)
+        return sub
+
+    def _unsubscribe(self, sub):
+        self._subscribers = tuple(s for s in self._subscribers if s is not sub)
+
+    def publish(self, event):
+        for sub in self._subscribers:
+            sub._offer(event)
+        if self.parent is not None:
+            self.parent.publish(event)
+
+    def close(self):
+        """Close every subscription; their iterators finish once drained."""
+        for sub in self._subscribers:
+            sub.close()
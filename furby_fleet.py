@@ -0,0 +1,162 @@
+import asyncio
+import os
+import time
+from furby_connect import find_furbies
+from furby_events import EventStream
+from furby_log import get_logger
+from furby_supervisor import FurbySupervisor
+from pyFurby import pyFurby
+
+log = get_logger("fleet")
+
+# How send_action spreads one action across several Furbies
+MODE_SYNC = "sync"            # everyone starts together
+MODE_STAGGERED = "staggered"  # one after another, `stagger` seconds apart
+MODES = (MODE_SYNC, MODE_STAGGERED)
+
+def default_factory():
+    """pyFurby, or furby_worker.FurbyProxy when FURBY_BLE_WORKER is set."""
+    if os.environ.get("FURBY_BLE_WORKER"):
+        from furby_worker import FurbyProxy
+        return FurbyProxy
+    return pyFurby
+
+class FurbyFleet:
+    """Several Furbies driven from one event loop.
+
+    Every device gets its own pyFurby (its own dispatcher, command queue and keep-alive)
+    and its own supervisor, so nothing is shared between them except the adapter.
+    Connecting goes through a small semaphore, because most adapters can only set up a
+    few connections at a time. `factory` builds each device's driver; pass
+    furby_worker.FurbyProxy to run every link in its own process.
+    """
+
+    def __init__(self, max_parallel_connects=3, factory=pyFurby, **furby_kwargs):
+        self.furbies = {}       # address -> pyFurby, in connect order
+        self.supervisors = {}   # address -> FurbySupervisor
+        self.factory = factory
+        self.furby_kwargs = furby_kwargs
+        # Every Furby's events are republished here
+        self.events = EventStream()
+        self._connect_slots = asyncio.Semaphore(max_parallel_connects)
+
+    def __len__(self):
+        return len(self.furbies)
+
+    async def connect(self, addresses=None, max_devices=None, timeout=5.0):
+        """Connect to the given addresses, or to every Furby found by a scan (up to
+        `max_devices`). Returns the addresses that connected."""
+        if addresses:
+            furbies = [self.factory(a, **self.furby_kwargs) for a in addresses if a not in self.furbies]
+        else:
+            log.info("🔍 Scanning for Furbies...")
+            devices = await find_furbies(timeout, max_devices)
+            furbies = [self.factory(device=d, **self.furby_kwargs)
+                       for d in devices if d.address not in self.furbies]
+        results = await asyncio.gather(*(self._connect_one(f) for f in furbies))
+        connected = [f.address for f, ok in zip(furbies, results) if ok]
+        log.info("🔌 %d/%d Furbies connected.", len(connected), len(furbies))
+        return connected
+
+    async def _connect_one(self, furby):
+        furby.stream.parent = self.events
+        supervisor = FurbySupervisor(furby)
+        async with self._connect_slots:
+            try:
+                ok = await supervisor.start()
+            except Exception as e:
+                log.warning("⚠️ %s: %s", furby.address, e)
+                ok = False
+        if ok:
+            self.furbies[furby.address] = furby
+            self.supervisors[furby.address] = supervisor
+        return ok
+
+    async def disconnect(self, selector=None):
+        """Disconnect the selected Furbies (all of them by default)."""
+        furbies = self.select(selector)
+        await asyncio.gather(*(self.supervisors[f.address].stop() for f in furbies),
+                             return_exceptions=True)
+        for furby in furbies:
+            del self.furbies[furby.address]
+            del self.supervisors[furby.address]
+
+    def select(self, selector=None):
+        """Pick Furbies by selector: None or "all" for every device, otherwise a
+        comma-separated list of connect-order indexes, addresses or names."""
+        furbies = list(self.furbies.values())
+        if selector is None or str(selector).strip().lower() in ("", "all"):
+            return furbies
+        if isinstance(selector, int):
+            parts = [selector]
+        elif isinstance(selector, str):
+            parts = [p.strip() for p in selector.split(",") if p.strip()]
+        else:
+            parts = list(selector)
+        selected = []
+        for part in parts:
+            if isinstance(part, int) or part.isdigit():
+                i = int(part)
+                match = furbies[i] if 0 <= i < len(furbies) else None
+            else:
+                key = part.lower()
+                match = next((f for f in furbies if f.address.lower() == key
+                              or (f.name and f.name.lower() == key)), None)
+            if match is None:
+                raise KeyError(f"No connected Furby matches '{part}'")
+            if match not in selected:
+                selected.append(match)
+        return selected
+
+    async def send_action(self, action, selector=None, mode=MODE_SYNC, stagger=0.25, **kwargs):
+        """Send one action to the selected Furbies. Returns {address: True/False/error}.
+
+        In sync mode every command is queued in the same loop tick so the writes go out
+        together; in staggered mode device i starts `i * stagger` seconds after the first.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        furbies = self.select(selector)
+
+        async def send(i, furby):
+            if mode == MODE_STAGGERED and i:
+                await asyncio.sleep(i * stagger)
+            return await furby.send_action(action, **kwargs)
+
+        results = await asyncio.gather(*(send(i, f) for i, f in enumerate(furbies)),
+                                       return_exceptions=True)
+        return {f.address: (r if not isinstance(r, Exception) else f"error: {r}")
+                for f, r in zip(furbies, results)}
+
+    async def chorus(self, actions, selector=None, mode=MODE_SYNC, stagger=0.25, gap=0.0):
+        """Play a list of actions across the selected Furbies, one after another.
+        Returns the per-step results of send_action."""
+        steps = []
+        for i, action in enumerate(actions):
+            if i and gap:
+                await asyncio.sleep(gap)
+            steps.append(await self.send_action(action, selector, mode, stagger))
+        return steps
+
+    def health(self):
+        """Per-device link state: connected, reconnecting, reconnect count, queue depth,
+        seconds since the last write and the keep-alive schedule."""
+        now = time.monotonic()
+        report = []
+        for i, (address, furby) in enumerate(self.furbies.items()):
+            supervisor = self.supervisors[address]
+            scheduler = furby.scheduler
+            report.append({
+                "index": i,
+                "address": address,
+                "name": furby.name,
+                "connected": furby.connected,
+                "reconnecting": supervisor.reconnecting,
+                "reconnects": supervisor.reconnects,
+                "queued_commands": len(scheduler) if scheduler is not None else 0,
+                "idle_seconds": (round(now - scheduler.last_write_time, 3)
+                                 if scheduler is not None and scheduler.last_write_time else None),
+                "keep_alive": furby.idle.schedule() if furby.idle is not None else None,
+                "connect_time": furby.connect_time,
+            })
+        return report
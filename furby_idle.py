@@ -0,0 +1,206 @@
+import asyncio
+import time
+from furby_log import get_logger
+from furby_metrics import get_metrics
+from furby_scheduler import PRIORITY_URGENT
+
+log = get_logger("keepalive")
+
+# Command to keep Furby focused and not constantly reacting like a caffeinated child
+KEEP_ALIVE_CMD = bytes([0x20, 0x06])
+KEEP_ALIVE_RESP_PREFIX = b'\x22'
+# Queued keep-alives share this key, so at most one is ever waiting
+KEEP_ALIVE_KEY = "keep-alive"
+# Consecutive unanswered keep-alives before the link is considered dead
+KEEP_ALIVE_MAX_MISSES = 3
+
+# Idle seconds before a keep-alive goes out. The interval grows by GROW_STEP after every
+# GROW_AFTER answered keep-alives, up to FOCUS_MARGIN of the focus timeout, and halves
+# (down to MIN_INTERVAL) when one goes unanswered.
+KEEP_ALIVE_INTERVAL = 3.0
+MIN_INTERVAL = 1.0
+GROW_AFTER = 5
+GROW_STEP = 0.25
+# How long Furby stays focused without a command, until it drops off after less
+FOCUS_TIMEOUT = 5.0
+FOCUS_MARGIN = 0.75
+
+class IdleManager:
+    """Sends a keep-alive when a device has been idle for `interval` seconds.
+
+    There is one timer per device, set for the scheduler's last write + interval on the
+    monotonic clock. Writes don't touch the timer: when it fires early because a command
+    went out in the meantime, it just moves to the new deadline. It also stands down while
+    commands are queued, since those will keep Furby focused anyway. suspend() parks it while
+    no client is attached; schedule() shows what it plans to do next (the fleet status
+    reports it). When keep-alives are written but stop being answered, the idle gap before
+    the first miss is taken as Furby's real focus timeout, so the interval stays under it
+    from then on. Failed writes don't count towards that, and resume() restores the interval.
+    """
+
+    def __init__(self, scheduler, on_lost=None, interval=KEEP_ALIVE_INTERVAL,
+                 focus_timeout=FOCUS_TIMEOUT, max_misses=KEEP_ALIVE_MAX_MISSES):
+        self.scheduler = scheduler
+        self.on_lost = on_lost
+        self.base_interval = interval
+        self.interval = min(interval, focus_timeout * FOCUS_MARGIN)
+        self.focus_timeout = focus_timeout
+        self.max_misses = max_misses
+        self.misses = 0
+        self.focus_lost = 0
+        self.suspended = True
+        self._answered = 0
+        self._resumed_at = 0.0
+        self._idle_before_miss = None  # idle seconds before the first unanswered keep-alive
+        self._clean_misses = 0  # misses where the write went through but nothing answered
+        self._loop = None
+        self._timer = None
+        self._task = None
+        metrics = get_metrics()
+        if metrics is not None:
+            self._rtt = metrics.histogram("furby_keep_alive_rtt_seconds", "Keep-alive round trip")
+            self._sent = metrics.counter("furby_keep_alives_total", "Keep-alives sent")
+            self._missed = metrics.counter("furby_keep_alive_misses_total",
+                                           "Keep-alives with no reply")
+        else:
+            self._rtt = self._sent = self._missed = None
+
+    @property
+    def in_flight(self):
+        return self._task is not None and not self._task.done()
+
+    def next_keep_alive(self):
+        """time.monotonic() at which the next keep-alive is due, or None while suspended."""
+        if self.suspended:
+            return None
+        # Idle time counts from the last write, or from resume() if nothing was written since
+        return max(self.scheduler.last_write_time, self._resumed_at) + self.interval
+
+    def schedule(self):
+        next_due = self.next_keep_alive()
+        return {
+            "suspended": self.suspended,
+            "interval": round(self.interval, 3),
+            "focus_timeout": round(self.focus_timeout, 3),
+            "next_keep_alive_in": (round(max(0.0, next_due - time.monotonic()), 3)
+                                   if next_due is not None else None),
+            "in_flight": self.in_flight,
+            "misses": self.misses,
+            "focus_lost": self.focus_lost,
+        }
+
+    def resume(self):
+        """Start (or restart) keeping the device focused. Call from the device's loop."""
+        self._loop = asyncio.get_running_loop()
+        self._resumed_at = time.monotonic()
+        self.suspended = False
+        self.misses = 0
+        self._clean_misses = 0
+        self._answered = 0
+        # Misses before a link drop halved the interval; a fresh link starts over
+        self.interval = min(self.base_interval, self.focus_timeout * FOCUS_MARGIN)
+        self._arm()
+
+    def suspend(self):
+        """Stop sending keep-alives until resume(), e.g. while the link is down."""
+        self.suspended = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.in_flight and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def stop(self):
+        task = self._task
+        self.suspend()
+        if task is not None and task is not asyncio.current_task():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def note_focus_lost(self, idle=None):
+        """Furby lost focus after `idle` seconds without a command (default: the time since
+        the last write). Keeps the interval safely under that from now on."""
+        if idle is None:
+            idle = time.monotonic() - self.scheduler.last_write_time
+        self.focus_lost += 1
+        self.focus_timeout = min(self.focus_timeout, max(idle, MIN_INTERVAL / FOCUS_MARGIN))
+        self.interval = min(self.interval, self.focus_timeout * FOCUS_MARGIN)
+        self._arm()
+
+    def _arm(self, delay=None):
+        if self.suspended or self.in_flight:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        if delay is None:
+            delay = max(0.0, self.next_keep_alive() - time.monotonic())
+        self._timer = self._loop.call_later(delay, self._fire)
+
+    def _fire(self):
+        self._timer = None
+        if self.suspended:
+            return
+        due = self.next_keep_alive()
+        now = time.monotonic()
+        if now < due:
+            # Something was written since the timer was set; move to the new deadline
+            self._arm(due - now)
+        elif len(self.scheduler):
+            # Commands are about to go out and will keep Furby focused on their own
+            self._arm(self.interval)
+        else:
+            self._task = self._loop.create_task(self._keep_alive())
+
+    async def _keep_alive(self):
+        log.debug("👁️ Sending keep-alive...")
+        idle = time.monotonic() - max(self.scheduler.last_write_time, self._resumed_at)
+        start = time.perf_counter_ns()
+        try:
+            resp = await self.scheduler.send(KEEP_ALIVE_CMD, PRIORITY_URGENT, KEEP_ALIVE_KEY,
+                                             KEEP_ALIVE_RESP_PREFIX)
+        except asyncio.CancelledError:
+            return
+        except Exception as e:
+            # The write itself failed, so this says nothing about Furby's focus
+            log.warning("⚠️ Keep-alive failed: %s", e)
+            resp = None
+            written = False
+        else:
+            written = True
+        if self._sent is not None:
+            self._sent.inc()
+            if resp:
+                self._rtt.observe_ns(time.perf_counter_ns() - start)
+            else:
+                self._missed.inc()
+        if resp:
+            log.debug("✅ Keep-alive response received!")
+            self.misses = 0
+            self._clean_misses = 0
+            self._answered += 1
+            if self._answered >= GROW_AFTER:
+                self._answered = 0
+                self.interval = min(self.interval + GROW_STEP,
+                                    self.focus_timeout * FOCUS_MARGIN)
+        else:
+            if written:
+                log.warning("⚠️ No keep-alive response!")
+            if not self.misses:
+                self._idle_before_miss = idle
+            self.misses += 1
+            self._clean_misses += written
+            self._answered = 0
+            self.interval = max(MIN_INTERVAL, self.interval / 2)
+            if self._clean_misses == self.max_misses:
+                # Every probe was written and none answered: the link is up but Furby
+                # stopped listening, so it let go before that first keep-alive went out
+                self.note_focus_lost(self._idle_before_miss)
+                log.info("🎯 Focus lost after %.2fs idle; keep-alives now every %.2fs.",
+                         self._idle_before_miss, self.interval)
+            if self.misses >= self.max_misses and self.on_lost is not None:
+                self.on_lost(f"{self.misses} keep-alives missed")
+                return
+        self._task = None
+        self._arm()
@@ -0,0 +1,119 @@
+import atexit
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# Everything logs under "furby.<component>", e.g. furby.keepalive or furby.notify.
+# FURBY_LOG_LEVEL sets the default level, FURBY_LOG_LEVELS overrides it per component
+# ("keepalive=WARNING,notify=DEBUG"), and FURBY_LOG_FORMAT=json writes one JSON object per line.
+# Importing a module never configures anything: entry points (servers, the worker, CLIs,
+# benches) call setup_logging(). Until then records follow the host application's logging.
+ROOT_LOGGER = "furby"
+DEFAULT_LEVEL = "INFO"
+# Records waiting for the writer thread; past this they are dropped rather than blocking
+QUEUE_SIZE = 10000
+
+class hexdump:
+    """Log argument that only turns bytes into hex if the record is actually written."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return bytes(self.data).hex()
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread untouched, so the message (and any hexdump) is
+    formatted there instead of on the event loop. A full queue drops the record."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"time": round(record.created, 6), "level": record.levelname,
+                 "component": record.name.partition(".")[2] or record.name,
+                 "message": record.getMessage()}
+        if record.exc_info:
+            entry["error"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+_handler = None
+_listener = None
+_setup_lock = threading.Lock()
+
+def parse_levels(spec):
+    """Parse "keepalive=WARNING,notify=DEBUG" into {"keepalive": "WARNING", ...}."""
+    levels = {}
+    for part in (spec or "").split(","):
+        component, _, level = part.partition("=")
+        if component.strip() and level.strip():
+            levels[component.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging(level=None, levels=None, stream=None, fmt=None):
+    """Route furby.* logs through a queue to a writer thread. Safe to call more than once:
+    later calls change levels, and restart the writer if given a new stream or format.
+    Output goes to stderr by default, so it can never end up in a stdio MCP stream."""
+    global _handler, _listener
+    if stream is not None or fmt is not None:
+        stop_logging()
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level or os.environ.get("FURBY_LOG_LEVEL", DEFAULT_LEVEL).upper())
+    for component, component_level in (levels or parse_levels(
+            os.environ.get("FURBY_LOG_LEVELS"))).items():
+        logging.getLogger(f"{ROOT_LOGGER}.{component}").setLevel(component_level)
+    with _setup_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(stream or sys.stderr)
+        if (fmt or os.environ.get("FURBY_LOG_FORMAT")) == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(message)s"))
+        _handler = _QueueHandler(queue.Queue(QUEUE_SIZE))
+        root.addHandler(_handler)
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(_handler.queue, output)
+        _listener.start()
+        atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush what's queued and stop the writer thread."""
+    global _handler, _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger(ROOT_LOGGER).removeHandler(_handler)
+        _handler = _listener = None
+
+@contextlib.asynccontextmanager
+async def logging_lifespan(server):
+    """FastMCP lifespan that sets up logging when the server starts."""
+    setup_logging()
+    yield {}
+
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
+
+def get_logger(component):
+    """Logger for one component, e.g. get_logger("keepalive")."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{component}")
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+class BleLoop:
+    """A long-lived event loop on its own thread that owns all BLE I/O.
+
+    Keep-alives, notifications and the command queues keep running on it no matter what
+    the caller's loop is doing. Coroutines are handed over with call() (from async code)
+    or run() (from sync code); the caller's loop is never blocked while BLE work is
+    in flight, so concurrent callers just queue up on the device schedulers.
+    """
+
+    def __init__(self, name="furby-ble"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._started = threading.Event()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the BLE loop; returns a concurrent.futures.Future."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def call(self, coro):
+        """Run a coroutine on the BLE loop and await its result from another loop."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the BLE loop and block this thread until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        if self.loop is not None and self._thread is not None and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+        self._thread = None
+
+_ble_loop = None
+_ble_loop_lock = threading.Lock()
+
+def get_ble_loop():
+    """Return the shared BLE loop, starting its thread on first use."""
+    global _ble_loop
+    with _ble_loop_lock:
+        if _ble_loop is None:
+            _ble_loop = BleLoop()
+        _ble_loop.start()
+    return _ble_loop
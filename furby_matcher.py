@@ -0,0 +1,176 @@
+import os
+import re
+import threading
+import numpy as np
+
+from furby_catalog import ACTION_LIST_PATH, get_catalog
+from furby_codec import get_command_table
+from furby_log import get_logger
+from furby_sequence import MAX_STEPS
+
+log = get_logger("matcher")
+
+# Feature matrix lives next to the action list and is rebuilt when the list changes
+MATCHER_CACHE_PATH = os.path.splitext(ACTION_LIST_PATH)[0] + ".matcher.npz"
+MATCHER_VERSION = 1
+
+NGRAM = 3
+WORD_RE = re.compile(r"[a-z0-9']+")
+# Replies are split into clauses on sentence punctuation and line breaks
+CLAUSE_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+def features(text):
+    """Character trigrams of each word (padded with spaces) plus the whole words."""
+    feats = []
+    for word in WORD_RE.findall(text.lower()):
+        feats.append("w:" + word)
+        padded = f" {word} "
+        feats.extend(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+    return feats
+
+def build_matrix(json_path=ACTION_LIST_PATH):
+    """Build the TF-IDF matrix over every sendable action text.
+
+    Actions with the same text share a row (the first id stands for all of them), and
+    actions with no valid frame are left out. Returns (vocab, idf, matrix, ids, mtime_ns),
+    with matrix stored transposed (features x rows) and every row L2-normalised.
+    """
+    mtime_ns = os.stat(json_path).st_mtime_ns
+    catalog = get_catalog(json_path)
+    table = get_command_table()
+    ids = []
+    docs = []
+    seen = set()
+    for action in catalog.actions:
+        text = " ".join(WORD_RE.findall(action["Action"].lower()))
+        if not text or text in seen or table.resolve(action["id"]) is None:
+            continue
+        seen.add(text)
+        ids.append(action["id"])
+        docs.append(features(text))
+    vocab = sorted({f for doc in docs for f in doc})
+    index = {f: i for i, f in enumerate(vocab)}
+    matrix = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+    for row, doc in enumerate(docs):
+        for f in doc:
+            matrix[row, index[f]] += 1.0
+    np.log1p(matrix, out=matrix)  # sublinear tf, so a repeated "hee hee hee" doesn't dominate
+    df = np.count_nonzero(matrix, axis=0)
+    idf = (np.log((1 + len(docs)) / (1 + df)) + 1.0).astype(np.float32)
+    matrix *= idf
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return (np.array(vocab), idf, np.ascontiguousarray(matrix.T),
+            np.array(ids, dtype=np.int32), mtime_ns)
+
+class ActionMatcher:
+    """Scores free text against every Furby action text.
+
+    Input sentences are turned into the same trigram TF-IDF vectors as the catalog and
+    scored with one matrix multiply per batch, restricted to the feature columns the
+    batch actually uses. Scores are cosine similarities between 0 and 1.
+    """
+
+    def __init__(self, vocab, idf, matrix, ids, source_mtime_ns):
+        self.vocab = vocab
+        self.idf = idf
+        self.matrix = matrix
+        self.ids = ids
+        self.source_mtime_ns = source_mtime_ns
+        self._index = {f: i for i, f in enumerate(vocab.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def score(self, texts):
+        """Return a (len(texts), len(self)) array of similarity scores."""
+        index = self._index
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            for f in features(text):
+                col = index.get(f)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        if not cols:
+            return np.zeros((len(texts), len(self.ids)), dtype=np.float32)
+        used, local = np.unique(cols, return_inverse=True)
+        queries = np.zeros((len(texts), len(used)), dtype=np.float32)
+        np.add.at(queries, (np.array(rows), local), 1.0)
+        np.log1p(queries, out=queries)
+        queries *= self.idf[used]
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        return queries @ self.matrix[used]
+
+    def match(self, texts, k=5):
+        """Return the top-k actions for each text, best first, as dicts with the action id,
+        its four command numbers, its description and the score."""
+        scores = self.score(texts)
+        k = max(1, min(k, len(self.ids)))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        frames = get_command_table().frames
+        actions = get_catalog().actions
+        results = []
+        for row, cols in zip(scores, top):
+            cols = cols[np.argsort(-row[cols])]
+            results.append([{
+                "id": int(self.ids[c]),
+                "command": list(frames[self.ids[c]][2:]),
+                "Action": actions[self.ids[c]]["Action"],
+                "score": round(float(row[c]), 4),
+            } for c in cols])
+        return results
+
+    def suggest(self, text, min_score=0.2, gap=1.5, max_steps=MAX_STEPS):
+        """Suggest a perform_sequence step list for a reply: the best action for each clause,
+        `gap` seconds apart. Clauses with nothing above `min_score` and repeats of the
+        previous action are skipped."""
+        clauses = [c.strip() for c in CLAUSE_RE.split(text) if c and c.strip()]
+        if not clauses:
+            return []
+        steps = []
+        for clause, (best,) in zip(clauses, self.match(clauses, k=1)):
+            if best["score"] < min_score or (steps and steps[-1]["action"] == best["id"]):
+                continue
+            steps.append({"action": best["id"], "delay": gap if steps else 0.0,
+                          "text": clause, "Action": best["Action"], "score": best["score"]})
+            if len(steps) == max_steps:
+                break
+        return steps
+
+def load_matcher(json_path=ACTION_LIST_PATH, cache_path=MATCHER_CACHE_PATH):
+    """Load the cached feature matrix, rebuilding it first if the action list changed."""
+    try:
+        source_mtime_ns = os.stat(json_path).st_mtime_ns
+    except FileNotFoundError:
+        source_mtime_ns = None
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            if int(data["version"]) == MATCHER_VERSION and (
+                    source_mtime_ns is None or int(data["mtime_ns"]) == source_mtime_ns):
+                return ActionMatcher(data["vocab"], data["idf"], data["matrix"], data["ids"],
+                                     int(data["mtime_ns"]))
+    except (OSError, KeyError, ValueError):
+        pass
+    vocab, idf, matrix, ids, mtime_ns = build_matrix(json_path)
+    try:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, version=MATCHER_VERSION, mtime_ns=mtime_ns, vocab=vocab, idf=idf,
+                     matrix=matrix, ids=ids)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log.warning("⚠️ Could not cache action matcher: %s", e)
+    return ActionMatcher(vocab, idf, matrix, ids, mtime_ns)
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_matcher():
+    """Return the shared matcher, loading it on first use and again if the action list changed."""
+    global _matcher
+    mtime_ns = os.stat(ACTION_LIST_PATH).st_mtime_ns
+    if _matcher is None or _matcher.source_mtime_ns != mtime_ns:
+        with _matcher_lock:
+            if _matcher is None or _matcher.source_mtime_ns != mtime_ns:
+                _matcher = load_matcher()
+    return _matcher
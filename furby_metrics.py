@@ -0,0 +1,279 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from furby_log import get_logger
+
+log = get_logger("metrics")
+
+# Set FURBY_METRICS=0 to turn instrumentation off. Instrumented code looks its metrics up
+# once at construction and skips recording entirely when they're None.
+METRICS_ENV = "FURBY_METRICS"
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0)  # seconds
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# Labelled metrics stop making new series past this many values, so stray tool names from
+# a client can't grow memory without bound
+MAX_LABEL_VALUES = 64
+OVERFLOW_LABEL = "other"
+
+class Counter:
+    """A running count. Series are updated from several threads (the BLE loop, the server
+    loop, the audio worker), so every update takes the series' lock."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.value = 0
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+    def labels(self, value):
+        """The child series for one label value."""
+        child = self.children.get(value)
+        if child is None:
+            with self._lock:
+                if value not in self.children and len(self.children) >= MAX_LABEL_VALUES:
+                    value = OVERFLOW_LABEL
+                child = self.children.setdefault(value, self._child())
+        return child
+
+    def _child(self):
+        return Counter(self.name, self.help)
+
+    def summary(self, uptime):
+        return {"value": self.value, "per_s": round(self.value / uptime, 3) if uptime else None}
+
+    def samples(self, labels):
+        yield self.name, labels, self.value
+
+class _Span:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe_ns(time.perf_counter_ns() - self.start)
+
+class Histogram(Counter):
+    """Fixed-bucket histogram that also keeps the largest value seen, so quantiles past
+    the last bucket aren't clamped to its bound."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, label=None):
+        super().__init__(name, help, label)
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.max = None
+
+    def _child(self):
+        return Histogram(self.name, self.help, self.bounds)
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.value += 1
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def observe_ns(self, ns):
+        self.observe(ns / 1e9)
+
+    def time(self):
+        """Context manager that records how long its body took."""
+        return _Span(self)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket. The +Inf bucket runs up
+        to the largest value seen, and no estimate goes past it."""
+        if not self.value:
+            return None
+        rank = q * self.value
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.bounds + (self.max,), self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                lower = min(lower, upper)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def summary(self, uptime):
+        if not self.value:
+            return {"count": 0}
+        return {"count": self.value, "mean": self.sum / self.value,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99),
+                "max": self.max}
+
+    def samples(self, labels):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            yield self.name + "_bucket", labels + (("le", repr(float(bound))),), cumulative
+        yield self.name + "_bucket", labels + (("le", "+Inf"),), self.value
+        yield self.name + "_sum", labels, self.sum
+        yield self.name + "_count", labels, self.value
+
+class Metrics:
+    """Registry of counters and histograms, readable as a dict or as Prometheus text."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, cls(name, *args))
+        return metric
+
+    def counter(self, name, help, label=None):
+        return self._get(Counter, name, help, label)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, label=None):
+        return self._get(Histogram, name, help, buckets, label)
+
+    def snapshot(self):
+        """Every metric with its count/rate or its mean and estimated p50/p95/p99."""
+        uptime = time.monotonic() - self.started
+        snapshot = {"uptime_s": round(uptime, 3)}
+        for name, metric in list(self._metrics.items()):
+            if metric.label is None:
+                snapshot[name] = metric.summary(uptime)
+            else:
+                snapshot[name] = {metric.label: {value: child.summary(uptime)
+                                                 for value, child in list(metric.children.items())}}
+        return snapshot
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for name, metric in list(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.label is None:
+                series = [((), metric)]
+            else:
+                series = [(((metric.label, value),), child)
+                          for value, child in list(metric.children.items())]
+            for labels, child in series:
+                for sample, sample_labels, value in child.samples(labels):
+                    if sample_labels:
+                        rendered = ",".join(f'{k}="{v}"' for k, v in sample_labels)
+                        sample = f"{sample}{{{rendered}}}"
+                    lines.append(f"{sample} {value}")
+        return "\n".join(lines) + "\n"
+
+_metrics = None
+_metrics_checked = False
+
+def get_metrics():
+    """Return the shared registry, or None if FURBY_METRICS=0."""
+    global _metrics, _metrics_checked
+    if not _metrics_checked:
+        if os.environ.get(METRICS_ENV, "1") != "0":
+            _metrics = Metrics()
+        _metrics_checked = True
+    return _metrics
+
+def metrics_snapshot():
+    metrics = get_metrics()
+    if metrics is None:
+        return {"enabled": False}
+    return metrics.snapshot()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        metrics = get_metrics()
+        body = (metrics.render() if metrics is not None else "").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serve /metrics in Prometheus text format from a daemon thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("📈 Metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
+
+def instrument_tools(app):
+    """A drop-in for app.tool() that also times every call of the tools it registers, per
+    tool, and counts the ones that fail: use `@tool()` in place of `@app.tool()`. The
+    timing wraps the tool function itself, so it leaves FastMCP's internals alone."""
+    metrics = get_metrics()
+    if metrics is None:
+        return app.tool
+    durations = metrics.histogram("mcp_tool_call_seconds", "MCP tool call duration",
+                                  label="tool")
+    errors = metrics.counter("mcp_tool_errors_total", "MCP tool calls that raised",
+                             label="tool")
+
+    def timed(fn, name):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_fn(*args, **kwargs):
+                start = time.perf_counter_ns()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception:
+                    errors.labels(name).inc()
+                    raise
+                finally:
+                    durations.labels(name).observe_ns(time.perf_counter_ns() - start)
+        else:
+            @functools.wraps(fn)
+            def timed_fn(*args, **kwargs):
+                start = time.perf_counter_ns()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    errors.labels(name).inc()
+                    raise
+                finally:
+                    durations.labels(name).observe_ns(time.perf_counter_ns() - start)
+        return timed_fn
+
+    def tool(name=None, **kwargs):
+        register = app.tool(name, **kwargs)
+
+        def decorator(fn):
+            register(timed(fn, name or fn.__name__))
+            return fn
+        return decorator
+
+    return tool
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from audio_engine import POLICY_INTERRUPT
+from furby_log import get_logger
+from furby_scheduler import PRIORITY_URGENT
+
+log = get_logger("reaction")
+
+class ReactionProfile:
+    """How GiggleBot reacts to scores from `min_score` up: a clip, the Furby actions that go
+    with it and what it says back."""
+
+    __slots__ = ("name", "min_score", "clip", "actions", "text")
+
+    def __init__(self, name, min_score, clip, actions, text):
+        self.name = name
+        self.min_score = min_score
+        self.clip = clip
+        self.actions = actions
+        self.text = text
+
+# Best first. Actions are (Input, Index, SubIndex, specific), so they don't depend on catalog
+# ids; the first starts together with the clip and the rest follow back to back.
+REACTIONS = (
+    ReactionProfile("ecstatic", 9, "say_rating_10", ((2, 0, 0, 0), (2, 0, 0, 4)),
+                    "That joke was hilarious! {score} out of 10!"),
+    ReactionProfile("amused", 6, "say_rating_7", ((2, 0, 1, 1), (6, 2, 1, 0)),
+                    "Nice one! I give that {score} out of 10!"),
+    ReactionProfile("unimpressed", 3, "say_rating_3", ((1, 1, 0, 4), (1, 2, 1, 5)),
+                    "Hmm... I've heard better. That's a {score} out of 10."),
+    ReactionProfile("groan", 0, "say_rating_1", ((1, 3, 0, 1), (1, 0, 1, 1)),
+                    "Yikes! That joke gets a {score}."),
+)
+
+# How long the clip waits for a Furby's first write before playing without it
+MAX_WRITE_WAIT = 0.25
+# How long react() waits for the mixer to report the clip started
+AUDIO_START_TIMEOUT = 1.0
+
+def reaction_for(score):
+    """The profile for a 0-10 score. Raises ValueError outside that range."""
+    if not 0 <= score <= 10:
+        raise ValueError("Score must be between 0 and 10.")
+    return next(p for p in REACTIONS if score >= p.min_score)
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+class ReactionPipeline:
+    """Reacts to a joke score with sound, Furby and text in one go.
+
+    Each Furby's first action is written ahead of anything queued, and the clip goes to the
+    audio engine the moment the first write lands, which is when Furby starts moving. So
+    both start together however long the BLE write took, and a preloaded clip starts in
+    well under a millisecond. react() returns once both have started; the rest of the
+    actions follow via perform_all(), and a new reaction cancels whatever of the last one
+    is still to come on the same Furby. `run` hands coroutines to the loop the Furbies live on
+    (e.g. BleLoop.call); without it they're driven from the caller's loop.
+    """
+
+    def __init__(self, engine, run=None):
+        self.engine = engine
+        self.run = run
+        self._followups = {}    # address -> the task playing that Furby's remaining actions
+
+    async def react(self, score, furbies=()):
+        profile = reaction_for(score)
+        loop = asyncio.get_running_loop()
+        requested = time.monotonic()
+        audio = loop.create_future()
+
+        def audio_started(at):
+            loop.call_soon_threadsafe(lambda: audio.done() or audio.set_result(at))
+
+        written = {}
+        if furbies:
+            coro = self._start_furbies(furbies, profile, audio_started)
+            written = await (self.run(coro) if self.run is not None else coro)
+        else:
+            self._play(profile.clip, audio_started)
+        try:
+            audio_at = await asyncio.wait_for(audio, AUDIO_START_TIMEOUT)
+        except asyncio.TimeoutError:
+            audio_at = None
+            log.warning("⚠️ Clip %s didn't start within %.1fs", profile.clip, AUDIO_START_TIMEOUT)
+        first_write = min((t for t in written.values() if t is not None), default=None)
+        return {
+            "score": score,
+            "reaction": profile.name,
+            "text": profile.text.format(score=f"{score:g}"),
+            "clip": profile.clip,
+            "actions": [list(a) for a in profile.actions],
+            "audio_started_ms": _ms(audio_at - requested) if audio_at is not None else None,
+            "furby_started_ms": {address: _ms(t - requested) if t is not None else None
+                                 for address, t in written.items()},
+            # Clip start minus the first Furby write; positive means the sound came later
+            "skew_ms": (_ms(audio_at - first_write)
+                        if audio_at is not None and first_write is not None else None),
+        }
+
+    def _forget_followup(self, address, task):
+        if self._followups.get(address) is task:
+            del self._followups[address]
+
+    def _play(self, clip, audio_started):
+        try:
+            self.engine.play(clip, POLICY_INTERRUPT, audio_started)
+        except RuntimeError as e:
+            # No mixer: the Furbies still react, the reply just has no audio timing
+            log.warning("⚠️ %s", e)
+            audio_started(None)
+
+    async def _start_furbies(self, furbies, profile, audio_started):
+        first, rest = profile.actions[0], profile.actions[1:]
+        written = {}
+        clip_started = False
+
+        def start_clip():
+            nonlocal clip_started
+            if not clip_started:
+                clip_started = True
+                self._play(profile.clip, audio_started)
+
+        async def start(furby):
+            # The last reaction's leftover actions mustn't play after this one starts
+            previous = self._followups.pop(furby.address, None)
+            if previous is not None:
+                previous.cancel()
+            try:
+                ok = await furby.send_action(first, PRIORITY_URGENT, replace_pending=True)
+            except Exception as e:
+                log.warning("⚠️ %s: %s", furby.address, e)
+                ok = False
+            written[furby.address] = time.monotonic() if ok else None
+            if ok:
+                start_clip()
+                if rest:
+                    followup = self._followups[furby.address] = asyncio.create_task(
+                        furby.perform_all(rest))
+                    followup.add_done_callback(
+                        lambda task: self._forget_followup(furby.address, task))
+
+        starts = [asyncio.create_task(start(f)) for f in furbies]
+        await asyncio.wait(starts, timeout=MAX_WRITE_WAIT)
+        start_clip()
+        await asyncio.wait(starts)
+        return written
@@ -0,0 +1,267 @@
+import asyncio
+import time
+from collections import deque
+from furby_metrics import DEPTH_BUCKETS, get_metrics
+
+# Lower numbers go first. Keep-alives and stops jump ahead of queued actions.
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BACKGROUND = 20
+
+# What submit() does when the queue is full
+OVERFLOW_BLOCK = "block"              # wait for space (backpressure)
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # evict the oldest, least urgent queued command
+OVERFLOW_REJECT = "reject"            # raise QueueFull straight away
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT)
+
+class CommandDropped(Exception):
+    """Raised on a command's future when it was evicted, flushed or the scheduler stopped
+    before it was sent."""
+
+class _Command:
+    __slots__ = ("data", "priority", "key", "response_prefix", "timeout", "futures", "queued_at")
+
+    def __init__(self, data, priority, key, response_prefix, timeout, future):
+        self.data = data
+        self.priority = priority
+        self.key = key
+        self.response_prefix = response_prefix
+        self.timeout = timeout
+        self.futures = [future]
+        self.queued_at = 0
+
+class CommandScheduler:
+    """Per-device command queue that owns all writes to the TX characteristic.
+
+    Commands are sent one at a time in priority order (FIFO within a priority). Queued
+    commands that share a `key` are coalesced: the newer data replaces the stale entry in
+    place and every submitter is told when it goes out. With `pipeline=True` commands are
+    written without response, so the next write doesn't wait for a GATT round trip, and
+    replies are matched through the dispatcher in the background.
+    """
+
+    def __init__(self, client, tx_uuid, dispatcher, maxsize=32, overflow=OVERFLOW_BLOCK,
+                 pipeline=False):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.client = client
+        self.tx_uuid = tx_uuid
+        self.dispatcher = dispatcher
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.pipeline = pipeline
+        self.last_write_time = 0.0  # time.monotonic() of the last write
+        self.on_write = None        # called with (data, last_write_time) after every write
+        self._queues = {}           # priority -> deque of _Command
+        self._keyed = {}            # coalescing key -> queued _Command
+        self._size = 0
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._running = asyncio.Event()
+        self._worker = None
+        self._stopped = False
+        metrics = get_metrics()
+        if metrics is not None:
+            self._write_time = metrics.histogram("furby_write_seconds",
+                                                 "write_gatt_char latency")
+            self._queue_wait = metrics.histogram("furby_queue_wait_seconds",
+                                                 "Time from submit to write")
+            self._queue_depth = metrics.histogram("furby_queue_depth",
+                                                  "Commands already queued at submit",
+                                                  DEPTH_BUCKETS)
+        else:
+            self._write_time = self._queue_wait = self._queue_depth = None
+
+    def __len__(self):
+        return self._size
+
+    def start(self):
+        """Start (or resume) sending queued commands."""
+        self._stopped = False
+        self._running.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def pause(self):
+        """Stop taking commands off the queue, e.g. while the link is down. Submitting
+        still works; queued commands go out once start() is called again."""
+        self._running.clear()
+
+    def attach(self, client, tx_uuid):
+        """Point the scheduler at a new connection, keeping whatever is queued."""
+        self.client = client
+        self.tx_uuid = tx_uuid
+
+    async def stop(self):
+        """Stop the worker and fail anything still queued, including the command being
+        written and submitters waiting for space. Later submits fail until start()."""
+        self._stopped = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self.flush()
+
+    async def submit(self, data, priority=PRIORITY_NORMAL, key=None, response_prefix=None,
+                     timeout=2.0):
+        """Queue a command and return a future for its outcome.
+
+        The future resolves with None once the command is written, or with the reply if
+        `response_prefix` is given (None if the reply times out).
+        """
+        if self._stopped:
+            raise CommandDropped("Scheduler stopped.")
+        fut = asyncio.get_running_loop().create_future()
+        if self._queue_depth is not None:
+            self._queue_depth.observe(self._size)
+        if key is not None:
+            queued = self._keyed.get(key)
+            if queued is not None:
+                queued.data = data
+                queued.futures.append(fut)
+                return fut
+        while self._size >= self.maxsize:
+            if self.overflow == OVERFLOW_REJECT:
+                raise asyncio.QueueFull
+            if self.overflow == OVERFLOW_DROP_OLDEST:
+                self._evict_oldest()
+            else:
+                self._space.clear()
+                await self._space.wait()
+                if self._stopped:
+                    raise CommandDropped("Scheduler stopped.")
+        command = _Command(data, priority, key, response_prefix, timeout, fut)
+        if self._queue_wait is not None:
+            command.queued_at = time.perf_counter_ns()
+        self._queues.setdefault(priority, deque()).append(command)
+        if key is not None:
+            self._keyed[key] = command
+        self._size += 1
+        self._ready.set()
+        return fut
+
+    async def send(self, data, priority=PRIORITY_NORMAL, key=None, response_prefix=None,
+                   timeout=2.0):
+        """Queue a command and wait until it has been sent (or its reply arrived)."""
+        fut = await self.submit(data, priority, key, response_prefix, timeout)
+        return await fut
+
+    def flush(self, min_priority=None):
+        """Drop queued commands, optionally only those at or below `min_priority` urgency
+        (i.e. with a priority number >= min_priority). Returns how many were dropped."""
+        dropped = 0
+        for priority, queue in self._queues.items():
+            if min_priority is not None and priority < min_priority:
+                continue
+            while queue:
+                self._fail(queue.popleft(), CommandDropped("Command flushed before sending."))
+                dropped += 1
+        return dropped
+
+    def drop(self, key, reason="Command dropped before sending."):
+        """Drop the queued command with this coalescing key, failing its futures with
+        CommandDropped. Returns False if it isn't queued (e.g. already written)."""
+        command = self._keyed.get(key)
+        if command is None:
+            return False
+        self._queues[command.priority].remove(command)
+        self._fail(command, CommandDropped(reason))
+        return True
+
+    def _evict_oldest(self):
+        for priority in sorted(self._queues, reverse=True):
+            queue = self._queues[priority]
+            if queue:
+                self._fail(queue.popleft(), CommandDropped("Command dropped, queue full."))
+                return
+
+    def _fail(self, command, exc):
+        self._forget(command)
+        for fut in command.futures:
+            if not fut.done():
+                fut.set_exception(exc)
+                # Nobody may be waiting on a dropped command; don't warn about it
+                fut.exception()
+
+    def _forget(self, command):
+        self._size -= 1
+        if command.key is not None and self._keyed.get(command.key) is command:
+            del self._keyed[command.key]
+        self._space.set()
+
+    def _pop(self):
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            if queue:
+                command = queue.popleft()
+                self._forget(command)
+                return command
+        return None
+
+    async def _run(self):
+        while True:
+            if not self._running.is_set():
+                await self._running.wait()
+            command = self._pop()
+            if command is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            reply = None
+            if command.response_prefix is not None:
+                reply = self.dispatcher.expect(command.response_prefix)
+            start = time.perf_counter_ns() if self._write_time is not None else 0
+            try:
+                # response=None lets bleak pick based on the characteristic's properties
+                await self.client.write_gatt_char(self.tx_uuid, command.data,
+                                                   response=False if self.pipeline else None)
+            except asyncio.CancelledError:
+                # stop() while writing: the command already left the queue, so nothing
+                # else will ever resolve its futures
+                if reply is not None:
+                    reply.cancel()
+                self._fail_sent(command, CommandDropped("Scheduler stopped mid-write."))
+                raise
+            except Exception as e:
+                if reply is not None:
+                    reply.cancel()
+                self._fail_sent(command, e)
+                continue
+            self.last_write_time = time.monotonic()
+            if self.on_write is not None:
+                self.on_write(command.data, self.last_write_time)
+            if self._write_time is not None:
+                self._write_time.observe_ns(time.perf_counter_ns() - start)
+                self._queue_wait.observe_ns(start - command.queued_at)
+            if reply is None:
+                self._resolve(command, None)
+            else:
+                # Don't hold up the queue waiting for the reply
+                self._await_reply(command, reply)
+
+    def _await_reply(self, command, reply):
+        loop = asyncio.get_running_loop()
+        timer = loop.call_later(command.timeout, reply.cancel)
+
+        def done(fut):
+            timer.cancel()
+            self._resolve(command, None if fut.cancelled() else fut.result())
+
+        reply.add_done_callback(done)
+
+    @staticmethod
+    def _resolve(command, result):
+        for fut in command.futures:
+            if not fut.done():
+                fut.set_result(result)
+
+    @staticmethod
+    def _fail_sent(command, exc):
+        for fut in command.futures:
+            if not fut.done():
+                fut.set_exception(exc)
+                fut.exception()
@@ -0,0 +1,101 @@
+import asyncio
+import itertools
+from furby_codec import get_command_table
+from furby_scheduler import PRIORITY_NORMAL
+
+# Guard rails for a single choreographed sequence
+MAX_STEPS = 64
+MAX_DELAY = 60.0
+
+# Each run's steps are queued under their own coalescing keys, so a cancelled run can pull
+# back whatever it queued but hasn't been written yet
+_runs = itertools.count()
+
+def build_sequence(steps):
+    """Validate a whole sequence up front and resolve it to (action_id, start offset) pairs.
+
+    Each step is a dict with an `action` (id, slug name or 4-number list) and an optional
+    `delay` in seconds, counted from the start of the previous step. Raises ValueError
+    listing every bad step, so nothing is sent if any part of the sequence is wrong.
+    """
+    if not isinstance(steps, (list, tuple)):
+        raise ValueError("Sequence must be a list of steps.")
+    if not steps:
+        raise ValueError("Sequence is empty.")
+    if len(steps) > MAX_STEPS:
+        raise ValueError(f"Sequence has {len(steps)} steps; the limit is {MAX_STEPS}.")
+    table = get_command_table()
+    plan = []
+    errors = []
+    offset = 0.0
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            errors.append(f"step {i}: must be an object")
+            plan.append((None, offset))
+            continue
+        action = step.get("action")
+        if isinstance(action, list):
+            action = tuple(action)
+        action_id = table.resolve(action) if action is not None else None
+        try:
+            delay = float(step.get("delay", 0.0))
+        except (TypeError, ValueError):
+            delay = -1.0
+        if action_id is None:
+            errors.append(f"step {i}: unknown action {step.get('action')!r}")
+        if not 0.0 <= delay <= MAX_DELAY:
+            errors.append(f"step {i}: delay must be between 0 and {MAX_DELAY} seconds")
+        offset += max(delay, 0.0)
+        plan.append((action_id, offset))
+    if errors:
+        raise ValueError("; ".join(errors))
+    return plan
+
+def plan_results(plan):
+    """The per-step result entries run_sequence() fills in."""
+    return [{"step": i, "action": action_id, "planned": round(offset, 4), "sent": None}
+            for i, (action_id, offset) in enumerate(plan)]
+
+async def run_sequence(scheduler, plan, results=None):
+    """Play a plan from build_sequence on a device's command queue.
+
+    Each step is queued at its absolute start time on the loop's monotonic clock, so
+    delays don't drift as steps run. Returns one entry per step with the planned offset
+    and when it was actually sent, in seconds from the start; pass `results` (from
+    plan_results) to keep them if the run is cancelled. Cancelling (e.g. when a newer
+    sequence replaces this one) skips the steps not yet queued, drops the queued ones that
+    haven't been written, then re-raises CancelledError.
+    """
+    loop = asyncio.get_running_loop()
+    frames = get_command_table().frames
+    start = loop.time()
+    if results is None:
+        results = plan_results(plan)
+    run = next(_runs)
+    pending = []
+
+    def sent(result):
+        def done(fut):
+            if not fut.cancelled() and fut.exception() is None:
+                result["sent"] = round(loop.time() - start, 4)
+            elif not fut.cancelled():
+                result["error"] = str(fut.exception())
+        return done
+
+    try:
+        for i, (result, (action_id, offset)) in enumerate(zip(results, plan)):
+            wait = start + offset - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            fut = await scheduler.submit(frames[action_id], PRIORITY_NORMAL,
+                                         key=("sequence", run, i))
+            fut.add_done_callback(sent(result))
+            pending.append(fut)
+        if pending:
+            # wait() rather than gather(), so cancelling us doesn't cancel the futures
+            await asyncio.wait(pending)
+    except asyncio.CancelledError:
+        for i in range(len(pending)):
+            scheduler.drop(("sequence", run, i), "Sequence cancelled.")
+        raise
+    return {"cancelled": False, "steps": results}
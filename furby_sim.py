@@ -0,0 +1,289 @@
+import asyncio
+import os
+import random
+import types
+from bleak.exc import BleakError
+
+# Set FURBY_SIMULATOR=1 to run pyFurby, the MCP servers and the benchmarks against simulated
+# Furbies instead of a BLE adapter. The FURBY_SIM_* variables tune the default link.
+
+# The Furby GATT layout as pyFurby sees it
+FURBY_SERVICE_UUID = "dab91435-b5a1-e29c-b041-bcd562613bde"
+RX_CHAR_UUID = "dab91382-b5a1-e29c-b041-bcd562613bde"
+TX_CHAR_UUID = "dab91383-b5a1-e29c-b041-bcd562613bde"
+RX_HANDLE = 0x1d
+TX_HANDLE = 0x20
+
+KEEP_ALIVE_CMD = bytes([0x20, 0x06])
+ACTION_PREFIX = bytes([0x13, 0x00])
+
+class SimulatedFurby:
+    """A Furby that lives in the event loop.
+
+    It answers keep-alives with `0x22 <status>` (status 1 while an action is still playing,
+    unless `reports_status` is off, like a Furby that only ever says 0),
+    plays each action for `action_duration` seconds (or the per-frame time in `durations`),
+    and can inject sensor frames with emit(). Every packet in either direction takes
+    `latency` +/- `jitter` seconds one way; writes without response and notifications are
+    lost with probability `loss`, writes with response are retried and cost a round trip
+    per loss. Timings come from a seeded RNG so runs are repeatable.
+    """
+
+    def __init__(self, address="SIM:FB:00:00:00:01", name="Furby", latency=0.008, jitter=0.002,
+                 loss=0.0, connect_delay=0.15, discovery_delay=0.35, action_duration=1.5,
+                 durations=None, reports_status=True, seed=0):
+        self.address = address
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.connect_delay = connect_delay
+        self.discovery_delay = discovery_delay
+        self.action_duration = action_duration
+        self.durations = dict(durations or {})
+        self.reports_status = reports_status
+        self.rng = random.Random(seed)
+        self.clients = []
+        self.busy_until = 0.0
+        self.current_action = None
+        # Counters for benchmarks and tests
+        self.writes = 0
+        self.keep_alives = 0
+        self.actions = 0
+        self.interrupted = 0
+        self.lost = 0
+        self._deliver_at = 0.0
+
+    def one_way(self):
+        return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def _lost(self):
+        if self.loss and self.rng.random() < self.loss:
+            self.lost += 1
+            return True
+        return False
+
+    def _schedule(self, callback, *args):
+        # The link layer keeps packets in order, jitter or not
+        loop = asyncio.get_running_loop()
+        self._deliver_at = max(self._deliver_at, loop.time() + self.one_way())
+        loop.call_at(self._deliver_at, callback, *args)
+
+    def receive(self, data):
+        """A packet arrived from a client."""
+        loop = asyncio.get_running_loop()
+        self.writes += 1
+        data = bytes(data)
+        if data == KEEP_ALIVE_CMD:
+            self.keep_alives += 1
+            busy = self.reports_status and loop.time() < self.busy_until
+            self.notify(bytes([0x22, 1 if busy else 0]))
+        elif data[:2] == ACTION_PREFIX and len(data) == 6:
+            if loop.time() < self.busy_until:
+                self.interrupted += 1
+            self.actions += 1
+            self.current_action = tuple(data[2:])
+            self.busy_until = loop.time() + self.durations.get(self.current_action,
+                                                               self.action_duration)
+
+    def notify(self, data):
+        """Send a notification to every subscribed client."""
+        for client in self.clients:
+            if client.notify_callback is not None and not self._lost():
+                self._schedule(client._notified, bytearray(data))
+
+    def emit(self, *sensors, bits=None):
+        """Inject a sensor frame, e.g. emit("pet_head"). Bits come from furby_events.SENSOR_BITS."""
+        if bits is None:
+            from furby_events import SENSOR_BITS
+            bits = 0
+            for sensor in sensors:
+                bits |= SENSOR_BITS[sensor]
+        self.notify(bytes([0x21, bits & 0xff, bits >> 8 & 0xff]))
+
+    def drop_link(self):
+        """Simulate the Furby walking out of range: every client is disconnected."""
+        for client in list(self.clients):
+            client._dropped()
+
+class SimCharacteristic:
+    __slots__ = ("uuid", "handle", "service_uuid", "properties")
+
+    def __init__(self, uuid, handle, properties):
+        self.uuid = uuid
+        self.handle = handle
+        self.service_uuid = FURBY_SERVICE_UUID
+        self.properties = properties
+
+class SimServices:
+    def __init__(self):
+        self.characteristics = {
+            RX_CHAR_UUID: SimCharacteristic(RX_CHAR_UUID, RX_HANDLE, ["notify"]),
+            TX_CHAR_UUID: SimCharacteristic(TX_CHAR_UUID, TX_HANDLE,
+                                            ["write", "write-without-response"]),
+        }
+
+    def get_characteristic(self, uuid):
+        return self.characteristics.get(getattr(uuid, "uuid", uuid))
+
+_furbies = {}
+
+def add_furby(furby):
+    """Make a simulated Furby visible to the scanner and connectable by address."""
+    _furbies[furby.address] = furby
+    return furby
+
+def remove_furby(address):
+    _furbies.pop(address, None)
+
+def simulated_furbies():
+    """The registered Furbies; the first call creates FURBY_SIM_COUNT of them from the env."""
+    if not _furbies:
+        for i in range(int(os.environ.get("FURBY_SIM_COUNT", "1"))):
+            add_furby(SimulatedFurby(
+                address=f"SIM:FB:00:00:00:{i + 1:02X}",
+                latency=float(os.environ.get("FURBY_SIM_LATENCY_MS", "8")) / 1000,
+                jitter=float(os.environ.get("FURBY_SIM_JITTER_MS", "2")) / 1000,
+                loss=float(os.environ.get("FURBY_SIM_LOSS", "0")),
+                seed=i,
+            ))
+    return list(_furbies.values())
+
+class SimBleakClient:
+    """Stands in for bleak.BleakClient, talking to a SimulatedFurby."""
+
+    def __init__(self, address_or_ble_device, disconnected_callback=None, services=None,
+                 **kwargs):
+        self.address = getattr(address_or_ble_device, "address", address_or_ble_device)
+        self.disconnected_callback = disconnected_callback
+        # Limiting discovery to known services (the warm path) skips most of its cost
+        self.cached_services = services is not None
+        self.notify_callback = None
+        self.services = None
+        self.furby = None
+        self.is_connected = False
+
+    async def connect(self, timeout=10.0):
+        simulated_furbies()
+        furby = _furbies.get(self.address)
+        if furby is None:
+            await asyncio.sleep(timeout)
+            raise BleakError(f"Device with address {self.address} was not found.")
+        delay = furby.connect_delay + (0.0 if self.cached_services else furby.discovery_delay)
+        await asyncio.sleep(delay + 2 * furby.one_way())
+        self.furby = furby
+        self.services = SimServices()
+        self.is_connected = True
+        furby.clients.append(self)
+        return True
+
+    async def disconnect(self):
+        if self.is_connected:
+            self._detach()
+            await asyncio.sleep(self.furby.one_way())
+            if self.disconnected_callback is not None:
+                self.disconnected_callback(self)
+        return True
+
+    def _detach(self):
+        self.is_connected = False
+        self.notify_callback = None
+        if self in self.furby.clients:
+            self.furby.clients.remove(self)
+
+    def _dropped(self):
+        self._detach()
+        if self.disconnected_callback is not None:
+            self.disconnected_callback(self)
+
+    async def start_notify(self, char, callback, **kwargs):
+        self._check()
+        self.notify_callback = callback
+        await asyncio.sleep(2 * self.furby.one_way())
+
+    async def stop_notify(self, char):
+        self._check()
+        self.notify_callback = None
+
+    def _notified(self, data):
+        if self.notify_callback is not None:
+            self.notify_callback(self.services.get_characteristic(RX_CHAR_UUID), data)
+
+    async def write_gatt_char(self, char, data, response=None):
+        self._check()
+        furby = self.furby
+        if response is False:
+            # Without response: returns straight away, and may never arrive
+            await asyncio.sleep(0)
+            if not furby._lost():
+                furby._schedule(furby.receive, bytes(data))
+            return
+        # With response: lost attempts are retried, each costing another round trip
+        while True:
+            lost = furby._lost()
+            await asyncio.sleep(2 * furby.one_way())
+            self._check()
+            if not lost:
+                break
+        furby.receive(data)
+
+    def _check(self):
+        if not self.is_connected:
+            raise BleakError("Not connected")
+
+class SimBleakScanner:
+    """Stands in for bleak.BleakScanner: each simulated Furby advertises every
+    `ADVERTISING_INTERVAL` seconds, starting at a random point in that interval."""
+
+    ADVERTISING_INTERVAL = 0.1
+
+    def __init__(self, detection_callback=None, **kwargs):
+        self.detection_callback = detection_callback
+        self._task = None
+
+    async def _advertise(self):
+        loop = asyncio.get_running_loop()
+        interval = self.ADVERTISING_INTERVAL
+        offsets = sorted((f.rng.uniform(0, interval), i, f)
+                         for i, f in enumerate(simulated_furbies()))
+        start = loop.time()
+        rounds = 0
+        while loop.time() - start < 60:
+            for offset, _, furby in offsets:
+                wait = start + rounds * interval + offset - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if self.detection_callback is not None:
+                    self.detection_callback(furby, types.SimpleNamespace(local_name=furby.name))
+            rounds += 1
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._advertise())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+
+    @classmethod
+    async def find_device_by_filter(cls, filterfunc, timeout=10.0, **kwargs):
+        found = asyncio.get_running_loop().create_future()
+
+        def detected(device, advertisement_data):
+            if not found.done() and filterfunc(device, advertisement_data):
+                found.set_result(device)
+
+        async with cls(detected):
+            try:
+                return await asyncio.wait_for(found, timeout)
+            except asyncio.TimeoutError:
+                return None
+
+def install(*furbies):
+    """Point pyFurby and furby_connect at the simulator (for code that didn't start with
+    FURBY_SIMULATOR set) and register the given Furbies."""
+    import furby_connect
+    import pyFurby
+    for furby in furbies:
+        add_furby(furby)
+    pyFurby.BleakClient = SimBleakClient
+    furby_connect.BleakScanner = SimBleakScanner
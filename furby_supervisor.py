@@ -0,0 +1,128 @@
+import asyncio
+import random
+import time
+from furby_log import get_logger
+from furby_metrics import get_metrics
+
+log = get_logger("supervisor")
+
+# What happens to commands queued while the link is down
+REPLAY = "replay"  # keep them and send once reconnected
+FAIL = "fail"      # drop them; their futures raise CommandDropped
+
+class FurbySupervisor:
+    """Keeps a pyFurby connected.
+
+    Listens for drops (the bleak disconnect callback, or too many missed keep-alives),
+    then reconnects with jittered exponential backoff. The reconnect goes back to the
+    same address through the device cache, so no scan is needed. pyFurby.connect()
+    re-subscribes to notifications and reattaches the existing command queue. Depending
+    on `policy`, commands queued during the outage are replayed or failed. Replay is
+    bounded by `replay_window`: once an outage has lasted that long, whatever is queued
+    fails with CommandDropped, as does anything submitted until the link is back.
+    """
+
+    def __init__(self, furby, policy=REPLAY, base_delay=0.2, max_delay=5.0, max_attempts=None,
+                 replay_window=30.0):
+        if policy not in (REPLAY, FAIL):
+            raise ValueError(f"policy must be '{REPLAY}' or '{FAIL}'")
+        self.furby = furby
+        self.policy = policy
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.replay_window = replay_window
+        self.reconnects = 0
+        self._task = None
+        self._active = False
+        metrics = get_metrics()
+        if metrics is not None:
+            self._links_lost = metrics.counter("furby_links_lost_total", "Unexpected disconnects")
+            self._reconnects = metrics.counter("furby_reconnects_total", "Successful reconnects")
+        else:
+            self._links_lost = self._reconnects = None
+
+    @property
+    def active(self):
+        """True while supervising, including while a reconnect is in progress."""
+        return self._active
+
+    @property
+    def reconnecting(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Connect and start watching the link. Returns False if the first connect fails."""
+        if not await self.furby.connect():
+            return False
+        if self._on_lost not in self.furby.disconnect_listeners:
+            self.furby.disconnect_listeners.append(self._on_lost)
+        self._active = True
+        return True
+
+    async def stop(self):
+        """Stop supervising and disconnect."""
+        self._active = False
+        if self._on_lost in self.furby.disconnect_listeners:
+            self.furby.disconnect_listeners.remove(self._on_lost)
+        if self.reconnecting:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.furby.disconnect()
+
+    def _on_lost(self, furby, reason):
+        if not self._active or self.reconnecting:
+            return
+        if self._links_lost is not None:
+            self._links_lost.inc()
+        if self.policy == FAIL and furby.scheduler is not None:
+            furby.scheduler.flush()
+        self._task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        furby = self.furby
+        attempt = 0
+        lost_at = time.monotonic()
+        while self._active:
+            # A keep-alive timeout can leave bleak thinking it's still connected
+            if furby.client is not None and furby.client.is_connected:
+                try:
+                    await furby.client.disconnect()
+                except Exception:
+                    pass
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+            delay *= random.uniform(0.5, 1.0)
+            attempt += 1
+            log.info("🔄 Reconnecting to Furby in %.2fs (attempt %d)...", delay, attempt)
+            await asyncio.sleep(delay)
+            expired = (self.replay_window is not None
+                       and time.monotonic() - lost_at >= self.replay_window)
+            if (self.policy == FAIL or expired) and furby.scheduler is not None:
+                # Anything submitted during the outage fails rather than going out late
+                dropped = furby.scheduler.flush()
+                if dropped and self.policy == REPLAY:
+                    log.warning("⚠️ Link down for over %.0fs, dropped %d queued command(s).",
+                                self.replay_window, dropped)
+            try:
+                connected = await furby.connect()
+            except Exception as e:
+                # A BleakError or timeout mid-attempt mustn't end the task: _on_lost won't
+                # start another while this one counts as reconnecting
+                log.warning("⚠️ Reconnect attempt %d failed: %s", attempt, e)
+                connected = False
+            if connected:
+                self.reconnects += 1
+                if self._reconnects is not None:
+                    self._reconnects.inc()
+                log.info("✅ Reconnected to Furby after %d attempt(s).", attempt)
+                return
+            if self.max_attempts is not None and attempt >= self.max_attempts:
+                log.error("❌ Giving up on reconnecting to Furby.")
+                self._active = False
+                if furby.scheduler is not None:
+                    await furby.scheduler.stop()
+                    furby.scheduler = None
+                return
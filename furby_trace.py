@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import atexit
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from furby_log import get_logger, setup_logging
+from furby_metrics import Histogram
+
+log = get_logger("trace")
+
+# Set FURBY_TRACE=<path> to append every BLE session to a binary trace: what was written to
+# the TX characteristic and what came back on RX, each with its time.monotonic_ns(). A
+# session runs from a connect to the next disconnect or drop. Several processes (BLE
+# workers) can share one file.
+#
+#   python furby_trace.py sessions furby.trace
+#   python furby_trace.py stats furby.trace --json stats.json
+#   python furby_trace.py replay furby.trace --session 1234 --speed 0
+TRACE_ENV = "FURBY_TRACE"
+
+# File layout: a HEADER_SIZE-byte header, then fixed-size records in the order written
+TRACE_MAGIC = b"FRBT"
+TRACE_VERSION = 2
+HEADER = struct.Struct("<4sHHqd")   # magic, version, record size, monotonic_ns and wall time
+HEADER_SIZE = 32                    # at creation
+# time.monotonic_ns(), session id, kind, data length, data (zero-padded, cut at MAX_DATA)
+RECORD = struct.Struct("<qQBB32s6x")
+MAX_DATA = 32
+_pack = RECORD.pack
+
+KIND_START = 1      # data: the device address
+KIND_END = 2        # data: why it ended
+KIND_TX = 3
+KIND_RX = 4
+KIND_NAMES = {KIND_START: "start", KIND_END: "end", KIND_TX: "tx", KIND_RX: "rx"}
+
+# Records are buffered and appended in one write once this much piles up, or when a record
+# comes in this long after the last write, and always when a session ends
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL_NS = 1_000_000_000
+
+# Statistics buckets: 10% apart from 0.1 ms to about 100 s, so quantiles are within ~10%
+TRACE_BUCKETS = tuple(1e-4 * 1.1 ** i for i in range(146))
+
+class TraceRecorder:
+    """Appends fixed-size records to a trace file.
+
+    Recording costs a struct pack into a buffer; the buffer goes out as one O_APPEND write
+    of whole records, so processes sharing a file never split each other's records. A new
+    file appears with its header already in it, so nobody can append ahead of the header.
+    Each recorder is meant for one thread (the BLE loop); session ids are the pid in the
+    high 32 bits and a per-process count in the low 32.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(path)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | getattr(os, "O_BINARY", 0))
+        self._buf = bytearray()
+        self._flush_at = time.monotonic_ns() + FLUSH_INTERVAL_NS
+        self._sessions = 0
+        atexit.register(self.close)
+
+    @staticmethod
+    def _create(path):
+        # Written under another name and linked into place: link() fails if another process
+        # got there first, and either way the file only ever appears complete
+        header = HEADER.pack(TRACE_MAGIC, TRACE_VERSION, RECORD.size, time.monotonic_ns(),
+                             time.time()).ljust(HEADER_SIZE, b"\0")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+            os.chmod(tmp, 0o644)
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        except OSError:
+            # No hard links here (e.g. FAT or some network shares): create it exclusively and
+            # write the header at once, leaving only a tiny window for another process
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                             | getattr(os, "O_BINARY", 0), 0o644)
+            except FileExistsError:
+                return
+            try:
+                os.write(fd, header)
+            finally:
+                os.close(fd)
+        finally:
+            os.unlink(tmp)
+
+    def session(self, address):
+        """Start a session for one connection; returns its SessionTrace."""
+        self._sessions += 1
+        session_id = (os.getpid() & 0xFFFFFFFF) << 32 | self._sessions & 0xFFFFFFFF
+        self.append(session_id, KIND_START, (address or "").encode("utf-8"), time.monotonic_ns())
+        return SessionTrace(self, session_id)
+
+    def append(self, session_id, kind, data, now_ns):
+        """Record `data` (any bytes-like object) taken at `now_ns` on the monotonic clock."""
+        buf = self._buf
+        buf += _pack(now_ns, session_id, kind, min(len(data), 255), bytes(data))
+        if len(buf) >= FLUSH_BYTES or now_ns >= self._flush_at:
+            self.flush()
+
+    def flush(self):
+        self._flush_at = time.monotonic_ns() + FLUSH_INTERVAL_NS
+        if self._buf and self._fd is not None:
+            os.write(self._fd, self._buf)
+            self._buf.clear()
+
+    def close(self):
+        if self._fd is not None:
+            self.flush()
+            os.close(self._fd)
+            self._fd = None
+
+class SessionTrace:
+    """Records one connection's traffic into a TraceRecorder."""
+
+    __slots__ = ("recorder", "session_id")
+
+    def __init__(self, recorder, session_id):
+        self.recorder = recorder
+        self.session_id = session_id
+
+    def tx(self, data, now=None):
+        """A write went out; `now` is its time.monotonic(), as the scheduler reports it."""
+        self.recorder.append(self.session_id, KIND_TX, data,
+                             int(now * 1e9) if now is not None else time.monotonic_ns())
+
+    def rx(self, data):
+        self.recorder.append(self.session_id, KIND_RX, data, time.monotonic_ns())
+
+    def end(self, reason=""):
+        self.recorder.append(self.session_id, KIND_END, reason.encode("utf-8"),
+                             time.monotonic_ns())
+        self.recorder.flush()
+
+_recorder = None
+
+def get_recorder():
+    """The shared recorder for FURBY_TRACE, or None when tracing is off."""
+    global _recorder
+    path = os.environ.get(TRACE_ENV)
+    if not path:
+        return None
+    if _recorder is None or _recorder.path != path:
+        try:
+            _recorder = TraceRecorder(path)
+        except OSError as e:
+            # Tracing is a diagnostic; it must never stop a connection
+            log.warning("⚠️ Can't record BLE sessions to %s: %s", path, e)
+            return None
+        log.info("📼 Recording BLE sessions to %s", path)
+    return _recorder
+
+def _summary(histogram, largest):
+    if not histogram.value:
+        return {"count": 0}
+    summary = {"count": histogram.value}
+    for q in (0.5, 0.95, 0.99):
+        # Interpolating inside a bucket can overshoot the largest sample
+        summary[f"p{round(q * 100)}"] = round(min(histogram.quantile(q), largest) * 1000, 3)
+    summary["max"] = round(largest * 1000, 3)
+    return summary
+
+class _SessionStats:
+    __slots__ = ("session", "address", "start", "end", "ended", "tx", "rx", "last_tx",
+                 "last_rx", "awaiting_reply", "latency", "tx_gap", "rx_gap", "max_latency",
+                 "max_tx_gap", "max_rx_gap")
+
+    def __init__(self, session, address, start):
+        self.session = session
+        self.address = address
+        self.start = self.end = start
+        self.ended = None
+        self.tx = self.rx = 0
+        self.last_tx = self.last_rx = None
+        self.awaiting_reply = False
+        self.latency = Histogram("reply_latency", "", TRACE_BUCKETS)
+        self.tx_gap = Histogram("tx_gap", "", TRACE_BUCKETS)
+        self.rx_gap = Histogram("rx_gap", "", TRACE_BUCKETS)
+        self.max_latency = self.max_tx_gap = self.max_rx_gap = 0.0
+
+class Trace:
+    """A trace file, memory-mapped read-only.
+
+    Records are decoded one at a time straight from the map, so sessions() and stats()
+    take one pass and keep only per-session counters and histograms, whatever the size of
+    the file. A torn last record (from a crash mid-write) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.created_ns, self.created_wall = \
+            HEADER.unpack_from(self._map)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION or record_size != RECORD.size:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} Furby trace")
+
+    def __len__(self):
+        return (len(self._map) - HEADER_SIZE) // RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def wall_time(self, t_ns):
+        """time.time() equivalent of a record's monotonic timestamp."""
+        return self.created_wall + (t_ns - self.created_ns) / 1e9
+
+    def records(self, session=None):
+        """Yield (time_ns, session, kind, length, data) in file order, for one session or
+        all. `data` is cut to MAX_DATA bytes; `length` is what was actually sent."""
+        end = HEADER_SIZE + len(self) * RECORD.size
+        for offset in range(HEADER_SIZE, end, RECORD.size):
+            t_ns, session_id, kind, length, data = RECORD.unpack_from(self._map, offset)
+            if session is None or session_id == session:
+                yield t_ns, session_id, kind, length, data[:length]
+
+    def _scan(self, session=None):
+        sessions = {}
+        end = HEADER_SIZE + len(self) * RECORD.size
+        with memoryview(self._map) as view, view[HEADER_SIZE:end] as body:
+            records = RECORD.iter_unpack(body)
+            for t_ns, session_id, kind, length, data in records:
+                if session is not None and session_id != session:
+                    continue
+                s = sessions.get(session_id)
+                if s is None:
+                    address = (data[:length].decode("utf-8", "replace")
+                               if kind == KIND_START else None)
+                    s = sessions[session_id] = _SessionStats(session_id, address, t_ns)
+                s.end = t_ns
+                if kind == KIND_TX:
+                    s.tx += 1
+                    if s.last_tx is not None:
+                        gap = (t_ns - s.last_tx) / 1e9
+                        s.tx_gap.observe(gap)
+                        if gap > s.max_tx_gap:
+                            s.max_tx_gap = gap
+                    s.last_tx = t_ns
+                    s.awaiting_reply = True
+                elif kind == KIND_RX:
+                    s.rx += 1
+                    if s.last_rx is not None:
+                        gap = (t_ns - s.last_rx) / 1e9
+                        s.rx_gap.observe(gap)
+                        if gap > s.max_rx_gap:
+                            s.max_rx_gap = gap
+                    s.last_rx = t_ns
+                    # Reply latency: the first notification after each write
+                    if s.awaiting_reply:
+                        latency = (t_ns - s.last_tx) / 1e9
+                        s.latency.observe(latency)
+                        if latency > s.max_latency:
+                            s.max_latency = latency
+                        s.awaiting_reply = False
+                elif kind == KIND_END:
+                    s.ended = data[:length].decode("utf-8", "replace") or "disconnected"
+            # The iterator holds the buffer; the map can't close until it's gone
+            del records
+        return sessions
+
+    def sessions(self):
+        """One entry per session: id, address, start (wall time), duration, TX/RX counts and
+        how it ended (None if the trace stops mid-session)."""
+        return [{"session": s.session, "address": s.address,
+                 "start": round(self.wall_time(s.start), 3),
+                 "duration_s": round((s.end - s.start) / 1e9, 3),
+                 "tx": s.tx, "rx": s.rx, "ended": s.ended}
+                for s in self._scan().values()]
+
+    def stats(self, session=None):
+        """Per-session reply latency (write to first notification after it) and the gaps
+        between writes and between notifications, in ms."""
+        report = []
+        for s in self._scan(session).values():
+            report.append({"session": s.session, "address": s.address,
+                           "start": round(self.wall_time(s.start), 3),
+                           "duration_s": round((s.end - s.start) / 1e9, 3),
+                           "tx": s.tx, "rx": s.rx, "ended": s.ended,
+                           "reply_latency_ms": _summary(s.latency, s.max_latency),
+                           "tx_gap_ms": _summary(s.tx_gap, s.max_tx_gap),
+                           "rx_gap_ms": _summary(s.rx_gap, s.max_rx_gap)})
+        return report
+
+async def replay(trace, session, address=None, speed=1.0):
+    """Write one session's TX frames to a Furby again, in order, `speed` times as fast as
+    recorded (0: as fast as possible). The target is the recorded address unless given;
+    with FURBY_SIMULATOR set it's a simulated Furby. Keep-alives come from the trace, so
+    pyFurby's own are suspended; with FURBY_TRACE set the replay is recorded as a new
+    session. Returns how late each write started against the recorded timing."""
+    from pyFurby import pyFurby
+    target = address
+    if target is None:
+        target = next((data.decode("utf-8") for _, _, kind, _, data in trace.records(session)
+                       if kind == KIND_START), None)
+    furby = pyFurby(target)
+    if not await furby.connect():
+        raise ConnectionError(f"Couldn't connect to {target or 'a Furby'}")
+    furby.idle.suspend()
+    loop = asyncio.get_running_loop()
+    lateness = Histogram("replay_lateness", "", TRACE_BUCKETS)
+    largest = 0.0
+    writes = skipped = 0
+    start = first = None
+    try:
+        for t_ns, _, kind, length, data in trace.records(session):
+            if kind != KIND_TX:
+                continue
+            if length > MAX_DATA:
+                skipped += 1    # only the first MAX_DATA bytes were kept
+                continue
+            if first is None:
+                first, start = t_ns, loop.time()
+            due = start + (t_ns - first) / 1e9 / speed if speed else loop.time()
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            late = max(0.0, loop.time() - due)
+            lateness.observe(late)
+            largest = max(largest, late)
+            await furby.client.write_gatt_char(furby.tx_char, data,
+                                               response=False if furby.pipeline else None)
+            if furby.trace is not None:
+                furby.trace.tx(data, time.monotonic())
+            writes += 1
+    finally:
+        await furby.disconnect()
+    return {"session": session, "address": furby.address, "speed": speed, "writes": writes,
+            "skipped": skipped,
+            "duration_s": round(loop.time() - start, 3) if start is not None else 0.0,
+            "lateness_ms": _summary(lateness, largest)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay Furby BLE traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sessions = commands.add_parser("sessions", help="list the sessions in a trace")
+    sessions.add_argument("path")
+    stats = commands.add_parser("stats", help="latency and gap statistics per session")
+    stats.add_argument("path")
+    stats.add_argument("--session", type=int)
+    stats.add_argument("--json", help="write the statistics to this file")
+    dump = commands.add_parser("dump", help="print records")
+    dump.add_argument("path")
+    dump.add_argument("--session", type=int)
+    dump.add_argument("--limit", type=int, default=100)
+    replay_cmd = commands.add_parser("replay", help="send a session's writes to a Furby again")
+    replay_cmd.add_argument("path")
+    replay_cmd.add_argument("--session", type=int, help="default: the first in the file")
+    replay_cmd.add_argument("--address", help="default: the recorded address")
+    replay_cmd.add_argument("--speed", type=float, default=1.0,
+                            help="1 for the recorded timing, 0 for as fast as possible")
+    args = parser.parse_args()
+
+    with Trace(args.path) as trace:
+        if args.command == "sessions":
+            for entry in trace.sessions():
+                print(entry)
+        elif args.command == "stats":
+            report = trace.stats(args.session)
+            for entry in report:
+                print(entry)
+            if args.json:
+                with open(args.json, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2)
+        elif args.command == "dump":
+            start = None
+            for i, (t_ns, session, kind, _, data) in enumerate(trace.records(args.session)):
+                if i >= args.limit:
+                    break
+                start = t_ns if start is None else start
+                print(f"{(t_ns - start) / 1e6:12.3f} ms  {session:>10}  {KIND_NAMES.get(kind, kind):5}  "
+                      f"{data.hex()}")
+        else:
+            session = args.session
+            if session is None:
+                session = next((s for _, s, _, _, _ in trace.records()), None)
+                if session is None:
+                    sys.exit("❌ The trace is empty.")
+            print(asyncio.run(replay(trace, session, args.address, args.speed)))
+
+if __name__ == "__main__":
+    setup_logging()
+    main()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import time
+from furby_catalog import ACTION_LIST_PATH
+from furby_codec import ACTION_PREFIX, FRAME_SIZE
+from furby_idle import KEEP_ALIVE_CMD, KEEP_ALIVE_KEY, KEEP_ALIVE_RESP_PREFIX
+from furby_log import get_logger
+from furby_scheduler import PRIORITY_URGENT
+
+log = get_logger("tracker")
+
+# Learned play time per action, next to the action list
+DURATIONS_PATH = os.environ.get(
+    "FURBY_DURATIONS", os.path.splitext(ACTION_LIST_PATH)[0] + ".durations.json")
+DURATIONS_VERSION = 1
+# Assumed play time of an action that has never been timed
+DEFAULT_DURATION = 1.5
+# A duration is the plain mean of its first samples, then a moving average over about this many
+MAX_WEIGHT = 10
+# An action cut off sooner than this was overwritten by a burst of writes rather than
+# played, so how long it ran says nothing about its length
+MIN_SAMPLE = 0.25
+# New samples between saves (disconnect always saves)
+SAVE_EVERY = 10
+
+# Furby sends nothing when an action ends, and the byte after 0x22 in the keep-alive reply
+# doesn't say whether it's busy, so an action ends when the table says it does. One
+# keep-alive, sent PROBE_LEAD before that, confirms Furby is still answering; it's skipped
+# if one was answered less than PROBE_INTERVAL ago, so short back-to-back actions don't
+# each cost a round trip.
+PROBE_LEAD = 0.15
+PROBE_INTERVAL = 1.0
+PROBE_TIMEOUT = 0.5
+
+def action_key(nums):
+    return ",".join(str(n) for n in nums)
+
+class DurationTable:
+    """How long each action plays, from the timings ActionTracker records with observe().
+
+    Keyed by the action's four numbers rather than its id, so editing actionlist.json
+    doesn't mix the timings up. Shared by every Furby (see get_duration_table()).
+    """
+
+    def __init__(self, path=DURATIONS_PATH):
+        self.path = path
+        self.durations = {}     # "Input,Index,SubIndex,specific" -> [seconds, samples]
+        self._unsaved = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == DURATIONS_VERSION:
+                self.durations = data["durations"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def __len__(self):
+        return len(self.durations)
+
+    def known(self, nums):
+        return action_key(nums) in self.durations
+
+    def get(self, nums, default=DEFAULT_DURATION):
+        entry = self.durations.get(action_key(nums))
+        return entry[0] if entry is not None else default
+
+    def observe(self, nums, seconds):
+        key = action_key(nums)
+        entry = self.durations.get(key)
+        if entry is None:
+            self.durations[key] = [round(seconds, 4), 1]
+        else:
+            samples = entry[1] + 1
+            entry[0] = round(entry[0] + (seconds - entry[0]) / min(samples, MAX_WEIGHT), 4)
+            entry[1] = samples
+        self._unsaved += 1
+        if self._unsaved >= SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        if not self._unsaved:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": DURATIONS_VERSION, "durations": self.durations}, f)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+        except OSError as e:
+            log.warning("⚠️ Could not save action durations: %s", e)
+
+_duration_tables = {}
+
+def get_duration_table(path=DURATIONS_PATH):
+    table = _duration_tables.get(path)
+    if table is None:
+        table = _duration_tables[path] = DurationTable(path)
+    return table
+
+class Performance:
+    """One action playing on one Furby, from the write that started it to its end."""
+
+    __slots__ = ("nums", "started", "expected", "ended", "observed", "interrupted", "_done")
+
+    def __init__(self, nums, started, expected):
+        self.nums = nums
+        self.started = started
+        self.expected = expected
+        self.ended = None
+        self.observed = False       # Furby answered a keep-alive around the end
+        self.interrupted = False
+        self._done = asyncio.get_running_loop().create_future()
+
+    def done(self):
+        return self._done.done()
+
+    def finish(self, ended, observed=False, interrupted=False):
+        if self._done.done():
+            return
+        self.ended = ended
+        self.observed = observed
+        self.interrupted = interrupted
+        self._done.set_result(self)
+
+    async def wait(self):
+        # Shielded, so a caller giving up doesn't end the performance for everyone else
+        return await asyncio.shield(self._done)
+
+    def as_dict(self):
+        return {"action": list(self.nums), "expected": round(self.expected, 3),
+                "duration": round(self.ended - self.started, 3) if self.ended else None,
+                "observed": self.observed, "interrupted": self.interrupted}
+
+class ActionTracker:
+    """Knows what a Furby is playing and when it finishes.
+
+    The scheduler reports every write (on_write); an action frame starts a Performance and
+    ends the previous one as interrupted. It ends after the DurationTable's duration for
+    the action (DEFAULT_DURATION if it has none), with at most one keep-alive to confirm
+    Furby is still there. Only one Performance is ever current.
+
+    The table learns from what is actually seen: how long an action played before the next
+    one cut it off, and when the end of one was confirmed by an answered keep-alive.
+    """
+
+    def __init__(self, scheduler, table=None):
+        self.scheduler = scheduler
+        self.table = table if table is not None else get_duration_table()
+        self.current = None
+        self.last_confirmed = 0.0       # time.monotonic() of the last answered probe
+        self._poller = None
+        self.turn = asyncio.Lock()      # held by pyFurby.perform() for a whole action
+
+    def on_write(self, data, now):
+        if len(data) != FRAME_SIZE or data[:2] != ACTION_PREFIX:
+            return
+        if self.current is not None and not self.current.done():
+            if now - self.current.started >= MIN_SAMPLE:
+                self.table.observe(self.current.nums, now - self.current.started)
+            self.current.finish(now, interrupted=True)
+        if self._poller is not None:
+            self._poller.cancel()
+        nums = tuple(data[2:])
+        self.current = Performance(nums, now, self.table.get(nums))
+        self._poller = asyncio.get_running_loop().create_task(self._follow(self.current))
+
+    async def idle(self):
+        """Wait until nothing is playing."""
+        while self.current is not None and not self.current.done():
+            await self.current.wait()
+
+    def stop(self):
+        """Forget the current action, e.g. when the link goes away."""
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        if self.current is not None:
+            self.current.finish(time.monotonic(), interrupted=True)
+        self.table.save()
+
+    async def _follow(self, run):
+        end = run.started + run.expected
+        observed = False
+        await asyncio.sleep(max(0.0, end - PROBE_LEAD - time.monotonic()))
+        if time.monotonic() - self.last_confirmed >= PROBE_INTERVAL:
+            try:
+                reply = await self.scheduler.send(KEEP_ALIVE_CMD, PRIORITY_URGENT,
+                                                  KEEP_ALIVE_KEY, KEEP_ALIVE_RESP_PREFIX,
+                                                  PROBE_TIMEOUT)
+            except Exception:
+                # Dropped or failed write; the link-loss path deals with a dead link
+                reply = None
+            if reply:
+                self.last_confirmed = time.monotonic()
+                observed = True
+            else:
+                log.debug("⚠️ No answer to the probe for action %s", action_key(run.nums))
+        await asyncio.sleep(max(0.0, end - time.monotonic()))
+        ended = max(end, time.monotonic())
+        if run.done():
+            return
+        if observed:
+            # Furby answered around the end, so the action really ran this long
+            self.table.observe(run.nums, ended - run.started)
+        run.finish(ended, observed=observed)
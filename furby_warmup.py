@@ -0,0 +1,53 @@
+import threading
+import time
+from furby_log import get_logger
+
+log = get_logger("warmup")
+
+class WarmUp:
+    """Runs slow one-off setup (heavy imports, cache loads, mixer init) on a background
+    thread, so a server can answer its first requests before any of it has happened.
+
+    Every step must also be safe to trigger lazily from a tool call; warming up just gets
+    it out of the way early. Steps run in order and a failing step doesn't stop the rest.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)    # (name, callable) pairs
+        self.timings_ms = {}
+        self.errors = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start warming up in the background, once. Returns immediately."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Start if needed and block until every step has run (or `timeout` passes)."""
+        self.start()._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def status(self):
+        if self._thread is None:
+            state = "cold"
+        elif self._thread.is_alive():
+            state = "warming"
+        else:
+            state = "warm"
+        return {"state": state, "steps_ms": dict(self.timings_ms), "errors": dict(self.errors)}
+
+    def _run(self):
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                log.warning("⚠️ Warm-up step %s failed: %s", name, e)
+                self.errors[name] = str(e)
+            self.timings_ms[name] = round((time.perf_counter() - start) * 1000, 3)
+        log.info("🔥 Warmed up in %.0f ms", sum(self.timings_ms.values()))
@@ -0,0 +1,622 @@
+import asyncio
+import json
+import math
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from furby_codec import encode_action, get_command_table
+from furby_events import DROP_OLDEST, EventStream, parse_frame
+from furby_log import get_logger, setup_logging
+from furby_scheduler import OVERFLOW_BLOCK, PRIORITY_NORMAL
+from furby_sequence import build_sequence
+
+log = get_logger("worker")
+
+# A Furby's BLE link can live in its own process (FURBY_BLE_WORKER=1 for the MCP server), so
+# JSON encoding, audio decoding or anything else holding the server's GIL can't delay its
+# keep-alives and command writes. The server talks to it through a FurbyProxy: commands
+# go out on one shared-memory ring and replies and notifications come back on another, as
+# fixed-size struct-packed frames. The worker's stdin and stdout only carry wake-up bytes,
+# and closing stdin (or the server dying) stops the worker.
+
+# Ring layout: the producer's head counter and the consumer's tail counter on cache lines of
+# their own, then RING_SLOTS slots of SLOT_SIZE bytes, each a u16 length and the frame
+SLOT_SIZE = 64
+RING_SLOTS = 256
+# head and tail are native 8-byte words, each on its own cache line
+COUNTER_SIZE = 8
+HEAD_OFFSET = 0
+TAIL_OFFSET = 64
+HEAD = HEAD_OFFSET // COUNTER_SIZE
+TAIL = TAIL_OFFSET // COUNTER_SIZE
+SLOTS_OFFSET = 128
+LENGTH = struct.Struct("<H")
+MAX_FRAME = SLOT_SIZE - LENGTH.size
+# How long a producer waits before retrying a full ring
+FULL_RETRY = 0.001
+
+# Every frame starts with a type byte and a request id (0 for unsolicited events)
+HEADER = struct.Struct("<BI")
+MAX_BODY = MAX_FRAME - HEADER.size
+
+# Commands, server -> worker
+OP_CONNECT = 1          # address (utf-8, empty to scan)
+OP_DISCONNECT = 2
+OP_ACTION = 3           # ACTION
+OP_NAMED = 4            # command name (utf-8)
+OP_CUSTOM = 5           # four bytes
+OP_ITEM = 6             # ITEM; collected under the request id for the next two
+OP_PERFORM = 7          # FLAG: interrupt
+OP_SEQUENCE = 8         # FLAG: replace
+OP_CANCEL_SEQUENCE = 9
+OP_CANCEL = 10          # none; stops the request with this id, which then never replies
+ACTION = struct.Struct("<HBB")      # action id, priority, replace pending
+ITEM = struct.Struct("<HHf")        # index, action id, delay
+FLAG = struct.Struct("<B")
+
+# Events, worker -> server
+EV_REPLY = 1            # REPLY, then an error message for the error statuses
+EV_CONNECTED = 2        # CONNECTED, then the address and the name (utf-8)
+EV_LOST = 3             # reason (utf-8)
+EV_NOTIFY = 4           # NOTIFY, then the notification as received
+EV_PERFORMED = 5        # PERFORMED, one per action before the reply
+EV_STEP = 6             # STEP, one per sequence step before the reply, then any error text
+REPLY = struct.Struct("<b")
+CONNECTED = struct.Struct("<fB")            # connect time, address length
+NOTIFY = struct.Struct("<d")                # time.monotonic() (system-wide on every platform)
+PERFORMED = struct.Struct("<HffBB4B")       # index, expected, duration (NaN if none),
+                                            # observed, interrupted, the action's numbers
+STEP = struct.Struct("<HfBB")               # index, sent (NaN if not), cancelled, failed
+
+REPLY_TRUE = 1
+REPLY_FALSE = 0
+REPLY_NONE = 2
+REPLY_VALUE_ERROR = -1
+REPLY_RUNTIME_ERROR = -2
+REPLY_ERROR = -3
+
+# How long disconnect() gives the worker to exit before killing it
+EXIT_TIMEOUT = 5.0
+
+def _text(text, limit):
+    """utf-8 bytes of `text`, cut to at most `limit` bytes."""
+    return str(text).encode("utf-8")[:limit].decode("utf-8", "ignore").encode("utf-8")
+
+def _open_shared_memory(name, size):
+    if name is None:
+        return shared_memory.SharedMemory(create=True, size=size)
+    shm = shared_memory.SharedMemory(name)
+    # Before Python 3.13 attaching registers the segment with this process's resource
+    # tracker, which would unlink it when the worker exits; only its creator may do that
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+class FrameRing:
+    """Single-producer, single-consumer ring of frames (up to MAX_FRAME bytes) in shared
+    memory.
+
+    Only the producer moves head and only the consumer moves tail, each after it's done
+    with the slot, so there are no locks. put() returns False when the ring is full.
+
+    The counters are stored through an aligned native 8-byte view, so each update is one
+    store and can't be seen half-written. That a slot's bytes are visible before the head
+    that publishes them relies on stores not being reordered, which holds on x86-64 (TSO)
+    but not on weakly ordered CPUs such as ARM; there the ring would need a lock.
+    """
+
+    def __init__(self, name=None, slots=RING_SLOTS):
+        self.slots = slots
+        self.owner = name is None
+        self.shm = _open_shared_memory(name, SLOTS_OFFSET + slots * SLOT_SIZE)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        # Shared memory is page-aligned, so both counters are aligned words
+        self.counters = self.buf[:SLOTS_OFFSET].cast("Q")
+
+    def __len__(self):
+        return self.counters[HEAD] - self.counters[TAIL]
+
+    def put(self, frame):
+        if len(frame) > MAX_FRAME:
+            raise ValueError(f"Frame of {len(frame)} bytes; the limit is {MAX_FRAME}")
+        head = self.counters[HEAD]
+        if head - self.counters[TAIL] >= self.slots:
+            return False
+        offset = SLOTS_OFFSET + head % self.slots * SLOT_SIZE
+        LENGTH.pack_into(self.buf, offset, len(frame))
+        self.buf[offset + LENGTH.size:offset + LENGTH.size + len(frame)] = frame
+        self.counters[HEAD] = head + 1
+        return True
+
+    def get(self):
+        tail = self.counters[TAIL]
+        if tail == self.counters[HEAD]:
+            return None
+        offset = SLOTS_OFFSET + tail % self.slots * SLOT_SIZE
+        length = LENGTH.unpack_from(self.buf, offset)[0]
+        frame = bytes(self.buf[offset + LENGTH.size:offset + LENGTH.size + length])
+        self.counters[TAIL] = tail + 1
+        return frame
+
+    def close(self):
+        self.counters.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class RingChannel:
+    """Both directions of a worker link: frames go out on one ring and come in on the other.
+
+    After each put() a byte is written to `bell_out`; a thread blocked on `bell_in` hands
+    the incoming ring to `handler` on the event loop, a batch at a time. `on_closed` runs
+    on the loop once the other side has gone away.
+    """
+
+    def __init__(self, inbox, bell_in, outbox, bell_out):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.bell_in = bell_in
+        self.bell_out = bell_out
+        self.closed = False
+        self._loop = None
+        self._handler = None
+        self._on_closed = None
+        self._draining = False
+
+    def start(self, handler, on_closed):
+        self._loop = asyncio.get_running_loop()
+        self._handler = handler
+        self._on_closed = on_closed
+        threading.Thread(target=self._watch, name="furby-ring", daemon=True).start()
+        # Anything sent before we were listening
+        self._drain()
+
+    def post(self, frame):
+        """Queue a frame without waiting; False if the ring is full."""
+        if self.closed:
+            raise ConnectionError("BLE worker link is closed")
+        if not self.outbox.put(frame):
+            return False
+        try:
+            os.write(self.bell_out, b"\x01")
+        except OSError:
+            pass    # the reader has gone; on_closed says so
+        return True
+
+    async def send(self, frame):
+        """Queue a frame, waiting for room if the ring is full."""
+        while not self.post(frame):
+            await asyncio.sleep(FULL_RETRY)
+
+    def _watch(self):
+        while True:
+            try:
+                rung = os.read(self.bell_in, 4096)
+            except OSError:
+                rung = b""
+            try:
+                if not rung:
+                    self._loop.call_soon_threadsafe(self._closed)
+                    return
+                # One drain per batch of bells; it picks up everything put so far
+                if not self._draining:
+                    self._draining = True
+                    self._loop.call_soon_threadsafe(self._drain)
+            except RuntimeError:
+                return  # the loop is closed
+
+    def _drain(self):
+        self._draining = False
+        while not self.closed:
+            frame = self.inbox.get()
+            if frame is None:
+                return
+            try:
+                self._handler(frame)
+            except Exception as e:
+                log.warning("⚠️ Bad worker frame %s: %s", frame[:1].hex(), e)
+
+    def _closed(self):
+        if self.closed:
+            return
+        self._drain()
+        self.closed = True
+        if self._on_closed is not None:
+            self._on_closed()
+
+    def close(self):
+        self.closed = True
+        self.inbox.close()
+        self.outbox.close()
+
+class _Request:
+    __slots__ = ("future", "parts", "multipart")
+
+    def __init__(self, future, multipart=False):
+        self.future = future
+        self.parts = []
+        self.multipart = multipart  # resolves with its parts, even if there are none
+
+class FurbyProxy:
+    """Stands in for a pyFurby whose connection lives in a worker process.
+
+    It has the coroutines and attributes that FurbyFleet, FurbySupervisor and the MCP server
+    use. Actions are resolved and sequences validated here, so bad input fails without a
+    round trip; the worker runs the real pyFurby and answers each call. Notifications are
+    republished on `stream`, so events() works as usual. Use it from one event loop. The
+    worker starts on the first connect() and stops on disconnect().
+    """
+
+    # Owned by the worker's pyFurby; None here so shared code skips them
+    client = None
+    scheduler = None
+    idle = None
+
+    def __init__(self, address=None, queue_size=32, overflow=OVERFLOW_BLOCK, pipeline=False,
+                 device=None):
+        self.device = device
+        self.address = device.address if device is not None else address
+        self.name = device.name if device is not None else None
+        self.furby_kwargs = {"queue_size": queue_size, "overflow": overflow, "pipeline": pipeline}
+        self.connected = False
+        self.connect_time = None
+        self.disconnect_listeners = []
+        self.stream = EventStream()
+        self.process = None
+        self.channel = None
+        # Notifications the worker couldn't pass on because the ring was full
+        self.dropped = 0
+        self._requests = {}
+        self._next_id = 0
+
+    def events(self, kinds=None, predicate=None, maxsize=64, policy=DROP_OLDEST):
+        """Subscribe to decoded notifications, as pyFurby.events()."""
+        return self.stream.subscribe(kinds, predicate, maxsize, policy)
+
+    def _spawn(self):
+        commands, events = FrameRing(), FrameRing()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), commands.name, events.name,
+             json.dumps(self.furby_kwargs)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        self.channel = RingChannel(events, self.process.stdout.fileno(),
+                                   commands, self.process.stdin.fileno())
+        self.channel.start(self._on_frame, self._on_worker_exit)
+        log.info("🧵 Started BLE worker %d for %s", self.process.pid, self.address or "Furby")
+
+    async def _request(self, op, body=b"", items=(), multipart=False):
+        """Send one command and wait for its reply: True/False/None, or with `multipart`
+        the list of (kind, body) parts the worker sent before it."""
+        if self.channel is None or self.channel.closed:
+            raise ConnectionError("BLE worker isn't running")
+        self._next_id = self._next_id % 0xFFFFFFFF + 1
+        request_id = self._next_id
+        request = self._requests[request_id] = _Request(
+            asyncio.get_running_loop().create_future(), multipart)
+        try:
+            for item in items:
+                await self.channel.send(HEADER.pack(OP_ITEM, request_id) + item)
+            await self.channel.send(HEADER.pack(op, request_id) + body)
+            return await request.future
+        except asyncio.CancelledError:
+            # e.g. perform_all() cut short: stop it in the worker too
+            if self.channel is not None and not self.channel.closed:
+                self.channel.post(HEADER.pack(OP_CANCEL, request_id))
+            raise
+        finally:
+            self._requests.pop(request_id, None)
+
+    def _on_frame(self, frame):
+        kind, request_id = HEADER.unpack_from(frame)
+        body = frame[HEADER.size:]
+        if kind == EV_NOTIFY:
+            if self.stream.active:
+                (now,) = NOTIFY.unpack_from(body)
+                self.stream.publish(parse_frame(body[NOTIFY.size:], self.address, now))
+            return
+        if kind == EV_CONNECTED:
+            connect_time, address_length = CONNECTED.unpack_from(body)
+            text = body[CONNECTED.size:].decode("utf-8")
+            self.connect_time = connect_time
+            self.address = text[:address_length]
+            self.name = text[address_length:] or self.name
+            self.connected = True
+            return
+        if kind == EV_LOST:
+            self._link_lost(body.decode("utf-8"))
+            return
+        request = self._requests.get(request_id)
+        if request is None or request.future.done():
+            return
+        if kind != EV_REPLY:
+            request.parts.append((kind, body))
+            return
+        (status,) = REPLY.unpack_from(body)
+        message = body[REPLY.size:].decode("utf-8")
+        if status == REPLY_VALUE_ERROR:
+            request.future.set_exception(ValueError(message))
+        elif status < 0:
+            request.future.set_exception(RuntimeError(message))
+        elif request.multipart:
+            request.future.set_result(request.parts)
+        else:
+            request.future.set_result({REPLY_TRUE: True, REPLY_FALSE: False}.get(status))
+
+    def _link_lost(self, reason):
+        if not self.connected:
+            return
+        self.connected = False
+        log.warning("💔 Lost connection to Furby: %s", reason)
+        for listener in self.disconnect_listeners:
+            listener(self, reason)
+
+    def _on_worker_exit(self):
+        if self.process is None:
+            return  # disconnect() stopped it
+        log.warning("⚠️ BLE worker %d exited", self.process.pid)
+        for request in self._requests.values():
+            if not request.future.done():
+                request.future.set_exception(ConnectionError("BLE worker exited"))
+        self._stop_worker().stdout.close()
+        self._link_lost("BLE worker exited")
+
+    def _stop_worker(self):
+        process, channel = self.process, self.channel
+        self.process = self.channel = None
+        if process is not None:
+            process.stdin.close()
+        if channel is not None:
+            channel.close()
+        return process
+
+    async def connect(self):
+        if self.process is None:
+            self._spawn()
+        address = _text(self.address or "", MAX_BODY)
+        return await self._request(OP_CONNECT, address)
+
+    async def disconnect(self):
+        self.connected = False
+        if self.process is not None:
+            try:
+                await self._request(OP_DISCONNECT)
+            except (ConnectionError, RuntimeError) as e:
+                log.warning("⚠️ BLE worker disconnect failed: %s", e)
+            process = self._stop_worker()
+            # Closing stdin tells the worker to exit
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, process.wait,
+                                                                 EXIT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            process.stdout.close()
+        self.stream.close()
+
+    async def send_named_command(self, name):
+        await self._request(OP_NAMED, _text(name, MAX_BODY))
+
+    async def send_custom_command(self, nums):
+        try:
+            data = encode_action(nums)
+        except ValueError:
+            log.warning("❌ Enter four numbers between 0 and 255.")
+            return
+        await self._request(OP_CUSTOM, data[-4:])
+
+    async def send_action(self, action, priority=PRIORITY_NORMAL, replace_pending=False):
+        action_id = get_command_table().resolve(action)
+        if action_id is None:
+            log.warning("❌ Unknown action: %s", action)
+            return False
+        return await self._request(OP_ACTION, ACTION.pack(action_id, priority,
+                                                           bool(replace_pending)))
+
+    async def perform(self, action, interrupt=False):
+        return (await self.perform_all([action], interrupt))[0]
+
+    async def perform_all(self, actions, interrupt=False):
+        table = get_command_table()
+        action_ids = [table.resolve(a) for a in actions]
+        for action, action_id in zip(actions, action_ids):
+            if action_id is None:
+                raise ValueError(f"Unknown action: {action}")
+        parts = await self._request(OP_PERFORM, FLAG.pack(bool(interrupt)),
+                                    [ITEM.pack(i, a, 0.0) for i, a in enumerate(action_ids)],
+                                    multipart=True)
+        results = [None] * len(action_ids)
+        for _, body in parts:
+            i, expected, duration, observed, interrupted, *nums = PERFORMED.unpack_from(body)
+            results[i] = {"action": nums, "expected": round(expected, 3),
+                          "duration": None if math.isnan(duration) else round(duration, 3),
+                          "observed": bool(observed), "interrupted": bool(interrupted)}
+        return results
+
+    async def perform_sequence(self, steps, replace=True):
+        plan = build_sequence(steps)
+        items = [ITEM.pack(i, action_id, float(step.get("delay", 0.0)))
+                 for i, (step, (action_id, _)) in enumerate(zip(steps, plan))]
+        parts = await self._request(OP_SEQUENCE, FLAG.pack(bool(replace)), items,
+                                    multipart=True)
+        results = [{"step": i, "action": action_id, "planned": round(offset, 4), "sent": None}
+                   for i, (action_id, offset) in enumerate(plan)]
+        cancelled = False
+        for _, body in parts:
+            i, sent, step_cancelled, failed = STEP.unpack_from(body)
+            cancelled = cancelled or bool(step_cancelled)
+            if not math.isnan(sent):
+                results[i]["sent"] = round(sent, 4)
+            if failed:
+                results[i]["error"] = body[STEP.size:].decode("utf-8")
+        return {"cancelled": cancelled, "steps": results}
+
+    async def speak(self, text, gap=1.5, min_score=0.2):
+        """As pyFurby.speak(); the matching happens here and only the actions go across."""
+        from furby_matcher import get_matcher
+        steps = get_matcher().suggest(text, min_score, gap)
+        if not steps:
+            log.info("🤷 No Furby phrase matches: %r", text)
+            return None
+        result = await self.perform_sequence(steps)
+        result["matched"] = steps
+        return result
+
+    async def cancel_sequence(self):
+        return await self._request(OP_CANCEL_SEQUENCE)
+
+class _Worker:
+    """The worker process's side: runs each command on a real pyFurby and replies."""
+
+    def __init__(self, channel, furby_kwargs):
+        self.channel = channel
+        self.furby_kwargs = furby_kwargs
+        self.furby = None
+        self.dropped = 0
+        self.items = {}     # request id -> [ITEM tuples]
+        self.stopped = asyncio.Event()
+        self._tasks = set()
+        self._handling = {}     # request id -> task running it
+
+    async def run(self):
+        self.channel.start(self._on_frame, self.stopped.set)
+        await self.stopped.wait()
+        if self.furby is not None and self.furby.connected:
+            await self.furby.disconnect()
+        self.channel.close()
+
+    def _new_furby(self, address):
+        from pyFurby import pyFurby
+        furby = pyFurby(address or None, **self.furby_kwargs)
+        handler = furby.notification_handler
+
+        def forward(sender, data):
+            handler(sender, data)
+            frame = HEADER.pack(EV_NOTIFY, 0) + NOTIFY.pack(time.monotonic()) + bytes(data)
+            if self.channel.closed or not self.channel.post(frame[:MAX_FRAME]):
+                self.dropped += 1
+
+        # Bound at connect time, so this catches every notification
+        furby.notification_handler = forward
+        furby.disconnect_listeners.append(self._link_lost)
+        return furby
+
+    def _start_task(self, coro):
+        # The loop only keeps weak references to tasks
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _link_lost(self, furby, reason):
+        self._start_task(self._send(EV_LOST, 0, _text(reason, MAX_BODY)))
+
+    async def _send(self, kind, request_id, body=b""):
+        if not self.channel.closed:
+            await self.channel.send(HEADER.pack(kind, request_id) + body)
+
+    def _on_frame(self, frame):
+        op, request_id = HEADER.unpack_from(frame)
+        body = frame[HEADER.size:]
+        if op == OP_ITEM:
+            self.items.setdefault(request_id, []).append(ITEM.unpack_from(body))
+            return
+        if op == OP_CANCEL:
+            task = self._handling.get(request_id)
+            if task is not None:
+                task.cancel()
+            return
+        # Tasks start in the order they're created, so commands reach the queue in order
+        task = self._handling[request_id] = self._start_task(
+            self._handle(op, request_id, body, self.items.pop(request_id, [])))
+        task.add_done_callback(lambda _: self._handling.pop(request_id, None))
+
+    async def _handle(self, op, request_id, body, items):
+        try:
+            result = await self._call(op, request_id, body, items)
+        except ValueError as e:
+            status, message = REPLY_VALUE_ERROR, str(e)
+        except RuntimeError as e:
+            status, message = REPLY_RUNTIME_ERROR, str(e)
+        except Exception as e:
+            status, message = REPLY_ERROR, f"{type(e).__name__}: {e}"
+        else:
+            status = {True: REPLY_TRUE, False: REPLY_FALSE}.get(result, REPLY_NONE)
+            message = ""
+        try:
+            await self._send(EV_REPLY, request_id,
+                             REPLY.pack(status) + _text(message, MAX_BODY - REPLY.size))
+        except ConnectionError:
+            pass
+
+    async def _call(self, op, request_id, body, items):
+        if op == OP_CONNECT:
+            if self.furby is None:
+                self.furby = self._new_furby(body.decode("utf-8"))
+            furby = self.furby
+            # A keep-alive timeout can leave bleak thinking it's still connected
+            if furby.client is not None and furby.client.is_connected and not furby.connected:
+                try:
+                    await furby.client.disconnect()
+                except Exception:
+                    pass
+            if not await furby.connect():
+                return False
+            text = _text(furby.address, 255)
+            await self._send(EV_CONNECTED, 0,
+                             CONNECTED.pack(furby.connect_time, len(text)) + text
+                             + _text(furby.name or "", MAX_BODY - CONNECTED.size - len(text)))
+            return True
+        furby = self.furby
+        if furby is None:
+            raise RuntimeError("Furby is not connected.")
+        if op == OP_DISCONNECT:
+            await furby.disconnect()
+        elif op == OP_ACTION:
+            action_id, priority, replace = ACTION.unpack_from(body)
+            return await furby.send_action(action_id, priority, bool(replace))
+        elif op == OP_NAMED:
+            await furby.send_named_command(body.decode("utf-8"))
+        elif op == OP_CUSTOM:
+            await furby.send_custom_command(list(body))
+        elif op == OP_PERFORM:
+            (interrupt,) = FLAG.unpack_from(body)
+            results = await furby.perform_all([action_id for _, action_id, _ in items],
+                                              bool(interrupt))
+            for i, result in enumerate(results):
+                duration = result["duration"]
+                await self._send(EV_PERFORMED, request_id, PERFORMED.pack(
+                    i, result["expected"], math.nan if duration is None else duration,
+                    result["observed"], result["interrupted"], *result["action"]))
+        elif op == OP_SEQUENCE:
+            (replace,) = FLAG.unpack_from(body)
+            steps = [{"action": action_id, "delay": delay} for _, action_id, delay in items]
+            result = await furby.perform_sequence(steps, bool(replace))
+            for step in result["steps"]:
+                sent = step["sent"]
+                error = _text(step.get("error", ""), MAX_BODY - STEP.size)
+                await self._send(EV_STEP, request_id, STEP.pack(
+                    step["step"], math.nan if sent is None else sent, result["cancelled"],
+                    "error" in step) + error)
+        elif op == OP_CANCEL_SEQUENCE:
+            return await furby.cancel_sequence()
+        else:
+            raise ValueError(f"Unknown worker command {op}")
+
+def worker_main(command_ring, event_ring, furby_kwargs):
+    # stdout carries the doorbell; anything printed goes to stderr with the logs
+    bell_out = os.dup(sys.stdout.fileno())
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    setup_logging()
+    channel = RingChannel(FrameRing(command_ring), sys.stdin.fileno(),
+                          FrameRing(event_ring), bell_out)
+    asyncio.run(_Worker(channel, furby_kwargs).run())
+
+if __name__ == "__main__":
+    worker_main(sys.argv[1], sys.argv[2], json.loads(sys.argv[3]))
@@ -1,76 +1,320 @@
 from fastmcp import FastMCP
-import json
+import os
 import asyncio
-from pyFurby import pyFurby
-import nest_asyncio
-
-# Apply nest_asyncio to allow running asyncio event loops inside another running loop
-nest_asyncio.apply()
+from collections import deque
+from typing import List, Optional
+from pydantic import AnyUrl
+from furby_fleet import FurbyFleet, default_factory
+from furby_codec import get_command_table
+from furby_sequence import build_sequence
+from furby_catalog import get_catalog
+from furby_log import logging_lifespan
+from furby_metrics import instrument_tools, metrics_snapshot, serve_metrics
+from furby_loop import get_ble_loop
+from furby_warmup import WarmUp
 
 # Create a new MCP server
 app = FastMCP(
     title="Furby Actions MCP",
     description="A server to list and interact with Furby actions.",
+    lifespan=logging_lifespan,
 )
 
-# Global Furby instance
-myFurby = pyFurby()
-furby_connected = False
+# Time every tool call; set FURBY_METRICS_PORT to also serve Prometheus text on localhost
+tool = instrument_tools(app)
+if os.environ.get("FURBY_METRICS_PORT"):
+    serve_metrics(int(os.environ["FURBY_METRICS_PORT"]))
+
+# All connected Furbies; each one is kept connected by its own supervisor. With
+# FURBY_BLE_WORKER=1 every BLE link runs in a worker process of its own, so nothing this
+# server does can hold up keep-alives or command timing.
+fleet = FurbyFleet(factory=default_factory())
+
+def get_text_matcher():
+    """The text matcher; numpy and the matrix load on first use rather than at startup."""
+    from furby_matcher import get_matcher
+    return get_matcher()
+
+def load_ble_backend():
+    """Import the platform's BLE backend, which bleak otherwise does on the first scan."""
+    from bleak.backends.client import get_platform_client_backend_type
+    from bleak.backends.scanner import get_platform_scanner_backend_type
+    get_platform_client_backend_type()
+    get_platform_scanner_backend_type()
+
+# Nothing above touches the adapter or loads a cache, so list_tools is answered straight
+# away. Everything slow happens on first use, or ahead of time via warm_up (or
+# FURBY_WARM_UP=1, which starts it as soon as the server module loads).
+warm_up_steps = WarmUp([
+    ("ble_loop", get_ble_loop),
+    ("ble_backend", load_ble_backend),
+    ("command_table", get_command_table),
+    ("catalog", get_catalog),
+    ("matcher", get_text_matcher),
+])
+if os.environ.get("FURBY_WARM_UP"):
+    warm_up_steps.start()
+
+# Recent events from every Furby, served as the furby://events resource
+EVENTS_URI = "furby://events"
+EVENT_HISTORY = 256
+event_log = deque(maxlen=EVENT_HISTORY)
+event_seq = 0
+# Sessions subscribed to furby://events; each gets a resources/updated notification per batch
+event_sessions = set()
+event_pump = None
+
+async def pump_events():
+    """Copy fleet events into the log and tell subscribed sessions there's something new."""
+    global event_seq
+    async with fleet.events.subscribe(maxsize=EVENT_HISTORY) as events:
+        async for event in events:
+            for e in [event] + events.drain():
+                event_seq += 1
+                entry = e.as_dict()
+                entry["seq"] = event_seq
+                event_log.append(entry)
+            for session in list(event_sessions):
+                try:
+                    await session.send_resource_updated(AnyUrl(EVENTS_URI))
+                except Exception:
+                    event_sessions.discard(session)
+
+def start_event_pump():
+    global event_pump
+    if event_pump is None or event_pump.done():
+        event_pump = asyncio.create_task(pump_events())
 
-@app.tool()
-def connect_furby() -> str:
-    """Connect to the nearest Furby via BLE."""
-    global furby_connected
-    if furby_connected:
+async def run(coro):
+    """Run a coroutine on the BLE loop thread without blocking the server's loop."""
+    return await get_ble_loop().call(coro)
+
+async def each(furbies, method, *args):
+    """Call the same pyFurby method on several Furbies at once (runs on the BLE loop)."""
+    return await asyncio.gather(*(getattr(f, method)(*args) for f in furbies))
+
+def select(device):
+    """Resolve a device selector to Furbies, or return an error string."""
+    if not len(fleet):
+        return "Furby is not connected."
+    try:
+        return fleet.select(device)
+    except KeyError as e:
+        return str(e.args[0])
+
+@tool()
+async def connect_furby(count: int = 1) -> str:
+    """Connect to the nearest Furby via BLE, or to up to `count` Furbies at once."""
+    start_event_pump()
+    if len(fleet) >= count:
         return "Furby already connected."
-    loop = asyncio.get_event_loop()
-    result = loop.run_until_complete(myFurby.connect())
-    if result:
-        furby_connected = True
-        return f"Connected to Furby at {myFurby.address}"
+    connected = await run(fleet.connect(max_devices=count - len(fleet)))
+    if connected:
+        return f"Connected to Furby at {', '.join(connected)}"
     else:
         return "Failed to connect to Furby."
 
-@app.tool()
-def disconnect_furby() -> str:
-    """Disconnect from the Furby."""
-    global furby_connected
-    if not furby_connected:
-        return "Furby is not connected."
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(myFurby.disconnect())
-    furby_connected = False
+@tool()
+async def disconnect_furby(device: Optional[str] = None) -> str:
+    """Disconnect from the Furby. `device` picks which ones (default: all)."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return furbies
+    await run(fleet.disconnect([f.address for f in furbies]))
     return "Disconnected from Furby."
 
-@app.tool()
-def send_named_command(command: str) -> str:
-    """Send a named command (e.g., 'fart', 'snore') to Furby."""
-    if not furby_connected:
-        return "Furby is not connected."
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(myFurby.send_named_command(command))
+@tool()
+def furby_status() -> list:
+    """Report, per Furby, whether it is connected or reconnecting, how often the link has
+    dropped and how many commands are queued."""
+    return fleet.health()
+
+@tool()
+async def send_named_command(command: str, device: Optional[str] = None) -> str:
+    """Send a named command (e.g., 'fart', 'snore') to Furby.
+    `device` is an index, address or name, a comma-separated list of those, or 'all' (default)."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return furbies
+    await run(each(furbies, "send_named_command", command))
     return f"Sent command: {command}"
 
-@app.tool()
-def send_custom_command(w: int, x: int, y: int, z: int) -> str:
-    """Send a custom 4-byte command to Furby (W,X,Y,Z)."""
-    if not furby_connected:
-        return "Furby is not connected."
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(myFurby.send_custom_command([w, x, y, z]))
+@tool()
+async def send_custom_command(w: int, x: int, y: int, z: int, device: Optional[str] = None) -> str:
+    """Send a custom 4-byte command to Furby (W,X,Y,Z).
+    `device` is an index, address or name, a comma-separated list of those, or 'all' (default)."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return furbies
+    await run(each(furbies, "send_custom_command", [w, x, y, z]))
     return f"Sent custom command: {[w, x, y, z]}"
 
-# Existing action list tool
+@tool()
+async def send_action(action_id: int, device: Optional[str] = None, mode: str = "sync",
+                stagger: float = 0.25) -> dict:
+    """Send a Furby action by the id returned from query_furby_actions.
+    `device` is an index, address or name, a comma-separated list of those, or 'all' (default).
+    With several Furbies, mode 'sync' starts them together and 'staggered' starts each one
+    `stagger` seconds after the previous."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return {"error": furbies}
+    if get_command_table().resolve(action_id) is None:
+        return {"error": f"Unknown action: {action_id}"}
+    try:
+        return await run(fleet.send_action(action_id, [f.address for f in furbies], mode, stagger))
+    except ValueError as e:
+        return {"error": str(e)}
+
+@tool()
+async def perform_actions(action_ids: List[int], device: Optional[str] = None,
+                          interrupt: bool = False) -> dict:
+    """Play Furby actions one after another and return once the last has finished. Each
+    one starts once the previous one's time in the duration table is up (learned from earlier
+    runs, 1.5 s if it has never been timed), so little is cut off and there's little dead air. Unless `interrupt`, waits for whatever
+    is already playing. Returns each action's measured duration per Furby.
+    `device` is an index, address or name, a comma-separated list of those, or 'all' (default)."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return {"error": furbies}
+    unknown = [a for a in action_ids if get_command_table().resolve(a) is None]
+    if unknown or not action_ids:
+        return {"error": f"Unknown actions: {unknown}" if unknown else "No actions given."}
+    results = await run(each(furbies, "perform_all", action_ids, interrupt))
+    return {f.address: r for f, r in zip(furbies, results)}
+
+@tool()
+async def perform_sequence(steps: List[dict], device: Optional[str] = None,
+                           replace: bool = True) -> dict:
+    """Play a timed sequence of Furby actions in one call.
+    Each step is {"action": <id or name from query_furby_actions>, "delay": <seconds after the
+    previous step starts>}. The whole sequence is checked before anything is sent. With replace
+    (the default) a sequence that is still playing is cancelled first. Returns, per device, the
+    planned and actual send time of every step.
+    `device` is an index, address or name, a comma-separated list of those, or 'all' (default)."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return {"error": furbies}
+    try:
+        build_sequence(steps)
+        results = await run(each(furbies, "perform_sequence", steps, replace))
+    except (ValueError, RuntimeError) as e:
+        return {"error": str(e)}
+    return {f.address: r for f, r in zip(furbies, results)}
+
+@tool()
+def match_furby_actions(text: str, k: int = 5) -> dict:
+    """Find the Furby phrases closest to a piece of text, so a reply can be said through Furby.
+    Returns the top-k actions for the whole text (id, command numbers, description, score)
+    and a suggested sequence with the best action for each sentence, ready for perform_sequence."""
+    matcher = get_text_matcher()
+    return {"matches": matcher.match([text], k)[0], "sequence": matcher.suggest(text)}
 
-def load_action_list(path="actionlist.json"):
-    """Load the Furby action list from a JSON file."""
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+@tool()
+async def speak_through_furby(text: str, device: Optional[str] = None, gap: float = 1.5) -> dict:
+    """Say a reply through Furby: every sentence is matched to its closest Furby phrase and the
+    phrases are played as one sequence, `gap` seconds apart.
+    `device` is an index, address or name, a comma-separated list of those, or 'all' (default)."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return {"error": furbies}
+    steps = get_text_matcher().suggest(text, gap=gap)
+    if not steps:
+        return {"error": "No Furby phrase matches that text."}
+    results = await run(each(furbies, "perform_sequence", steps, True))
+    return {"matched": steps, "devices": {f.address: r for f, r in zip(furbies, results)}}
 
-@app.tool()
+@tool()
+async def cancel_sequence(device: Optional[str] = None) -> str:
+    """Stop the sequence Furby is currently playing.
+    `device` is an index, address or name, a comma-separated list of those, or 'all' (default)."""
+    furbies = select(device)
+    if isinstance(furbies, str):
+        return furbies
+    cancelled = await run(each(furbies, "cancel_sequence"))
+    return "Sequence cancelled." if any(cancelled) else "No sequence was playing."
+
+@tool()
+async def warm_up(wait: bool = False) -> dict:
+    """Load everything the first Furby command would otherwise wait for (BLE loop and
+    backend, command table, catalog, text matcher) in the background.
+    With wait=True, return once it's done. Reports how long each step took."""
+    warm_up_steps.start()
+    if wait:
+        await asyncio.to_thread(warm_up_steps.wait)
+    return warm_up_steps.status()
+
+@tool()
+def get_metrics() -> dict:
+    """Performance counters and latency histograms (mean and p50/p95/p99, in seconds) for
+    this server: tool-call durations, BLE write latency, queue depth and wait,
+    keep-alive round trip and misses, notifications and reconnects."""
+    return metrics_snapshot()
+
+@tool()
 def list_furby_actions() -> list:
-    """List all available Furby actions and their descriptions/values."""
-    return load_action_list()
+    """List all available Furby actions and their descriptions/values.
+    This is the full list (~1,500 entries); prefer query_furby_actions to fetch only what you need."""
+    return get_catalog().all()
+
+@tool()
+def query_furby_actions(
+    input: Optional[int] = None,
+    index: Optional[int] = None,
+    subindex: Optional[int] = None,
+    specific: Optional[int] = None,
+    text: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 20,
+    fields: Optional[List[str]] = None,
+) -> dict:
+    """Search Furby actions by Input/Index/SubIndex/specific number and/or a text snippet.
+    Results are paged with offset/limit (at most 200 per page); fields picks which of
+    id, Input, Index, SubIndex, specific, Action to return."""
+    try:
+        return get_catalog().query(input, index, subindex, specific, text, offset, limit, fields)
+    except ValueError as e:
+        return {"error": str(e)}
+
+@tool()
+def get_furby_action(action_id: int) -> dict:
+    """Get a single Furby action by the id returned from query_furby_actions."""
+    action = get_catalog().get(action_id)
+    if action is None:
+        return {"error": f"No action with id {action_id}"}
+    return action
+
+@app.resource(EVENTS_URI, mime_type="application/json")
+def furby_events() -> dict:
+    """Recent Furby events (pets, tilts, antenna moves, keep-alive replies), oldest first.
+    Subscribe to this resource to be notified as new events arrive."""
+    return {"last": event_seq, "events": list(event_log)}
+
+@app.resource(EVENTS_URI + "/since/{seq}", mime_type="application/json")
+def furby_events_since(seq: str) -> dict:
+    """Furby events newer than `seq` (the `last` value from a previous read)."""
+    after = int(seq)
+    return {"last": event_seq, "events": [e for e in event_log if e["seq"] > after]}
+
+# The low-level server has subscribe hooks but FastMCP doesn't expose them yet
+@app._mcp_server.subscribe_resource()
+async def subscribe_events(uri):
+    if str(uri).startswith(EVENTS_URI):
+        event_sessions.add(app._mcp_server.request_context.session)
+        start_event_pump()
+
+@app._mcp_server.unsubscribe_resource()
+async def unsubscribe_events(uri):
+    if str(uri).startswith(EVENTS_URI):
+        event_sessions.discard(app._mcp_server.request_context.session)
+
+def _capabilities(*args, _get=app._mcp_server.get_capabilities):
+    capabilities = _get(*args)
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+
+app._mcp_server.get_capabilities = _capabilities
 
 if __name__ == "__main__":
     app.run()
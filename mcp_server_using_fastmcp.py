@@ -1,8 +1,18 @@
 from fastmcp import FastMCP
-import json
+from fastmcp.exceptions import ResourceError
+import asyncio
+import os
+from typing import List, Optional
 
-import threading
-import pygame
+from audio_engine import AudioEngine, POLICIES
+from audio_stream import CHUNK_SIZE, AudioLibrary, TranscodeError, audio_routes, serve_audio
+from furby_catalog import get_catalog
+from furby_log import get_logger, logging_lifespan
+from furby_metrics import instrument_tools, metrics_snapshot, serve_metrics
+from furby_reaction import ReactionPipeline
+from furby_warmup import WarmUp
+
+log = get_logger("gigglebot")
 
 SOUNDS = {
     "say_hello": "audio/say_hello.mp3",
@@ -13,67 +23,217 @@ SOUNDS = {
     "say_goodbye": "audio/say_goodbye.mp3"
 }
 
-pygame.mixer.init()
+# Each clip is decoded once, the first time it plays (or all at once by warm_up); tool
+# calls just queue playback on the engine's worker. Nothing touches the sound card until
+# then, so the server answers list_tools straight away. GIGGLEBOT_WARM_UP=1 warms up in the
+# background as soon as the server module loads.
+engine = AudioEngine(SOUNDS)
+warm_up_steps = WarmUp([
+    ("audio", engine.start),
+    ("catalog", get_catalog),
+])
+if os.environ.get("GIGGLEBOT_WARM_UP"):
+    warm_up_steps.start()
 
-def play_sound(file_path):
-    try:
-        pygame.mixer.music.load(file_path)
-        pygame.mixer.music.play()
-        # Detach playback — don't block thread. Let it finish on its own.
-    except Exception as e:
-        print(f"[ERROR] Failed to play sound: {e}")
+# Furbies that react along with GiggleBot. The fleet and its BLE loop are created on the
+# first connect_furby, so a server without Furbies never loads bleak.
+_fleet = None
+_pipeline = None
+
+def get_fleet():
+    global _fleet
+    if _fleet is None:
+        from furby_fleet import FurbyFleet, default_factory
+        _fleet = FurbyFleet(factory=default_factory())
+    return _fleet
+
+def get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        from furby_loop import get_ble_loop
+        _pipeline = ReactionPipeline(engine, get_ble_loop().call)
+    return _pipeline
 
 # Create a new MCP server
 app = FastMCP(
     title="GiggleBot Toy MCP",
     description="A joke evaluator toy that speaks based on structured commands.",
+    lifespan=logging_lifespan,
 )
 
-@app.tool()
+# Time every tool call; set GIGGLEBOT_METRICS_PORT to also serve Prometheus text on localhost
+tool = instrument_tools(app)
+if os.environ.get("GIGGLEBOT_METRICS_PORT"):
+    serve_metrics(int(os.environ["GIGGLEBOT_METRICS_PORT"]))
+
+# The clips for clients on other machines: GET /audio/<clip>[?format=wav|opus] next to /mcp
+# when running over HTTP (with Range support), or on GIGGLEBOT_AUDIO_PORT for stdio, and the
+# audio://clips resources. Files are memory-mapped once and streamed in CHUNK_SIZE slices.
+library = AudioLibrary(engine.paths)
+for route in audio_routes(library):
+    app.custom_route(route.path, methods=["GET", "HEAD"], name=route.name)(route.endpoint)
+if os.environ.get("GIGGLEBOT_AUDIO_PORT"):
+    serve_audio(library, int(os.environ["GIGGLEBOT_AUDIO_PORT"]))
+
+def _say(clip):
+    try:
+        engine.play(clip)
+    except RuntimeError as e:
+        # No mixer: the reply still goes out, just without the clip
+        log.warning("⚠️ %s", e)
+
+@tool()
 def say_hello() -> str:
     """Say a friendly greeting"""
-    threading.Thread(target=play_sound, args=(SOUNDS["say_hello"],)).start()
+    _say("say_hello")
     return "Hi there, I'm GiggleBot! Tell me a joke!"
 
-@app.tool()
+@tool()
 def say_rating_10() -> str:
     """Say a very positive joke rating (10/10)"""
-    threading.Thread(target=play_sound, args=(SOUNDS["say_rating_10"],)).start()
+    _say("say_rating_10")
     return "That joke was hilarious! A perfect 10!"
 
-@app.tool()
+@tool()
 def say_rating_7() -> str:
     """Say a decent joke rating (7/10)"""
-    threading.Thread(target=play_sound, args=(SOUNDS["say_rating_7"],)).start()
+    _say("say_rating_7")
     return "Nice one! I give that a 7 out of 10!"
 
-@app.tool()
+@tool()
 def say_rating_3() -> str:
     """Say a weak joke rating (3/10)"""
-    threading.Thread(target=play_sound, args=(SOUNDS["say_rating_3"],)).start()
+    _say("say_rating_3")
     return "Hmm... I’ve heard better. That's a 3 out of 10."
 
-@app.tool()
+@tool()
 def say_rating_1() -> str:
     """Say a bad joke rating (1/10)"""
-    threading.Thread(target=play_sound, args=(SOUNDS["say_rating_1"],)).start()
+    _say("say_rating_1")
     return "Yikes! That joke gets a 1."
 
-@app.tool()
+@tool()
+async def react_to_joke(score: float) -> dict:
+    """React to a joke scored 0-10 in one call: the matching rating clip and Furby actions
+    start together, and the text reply comes back as soon as both have started.
+    Connect Furbies first with connect_furby, or GiggleBot reacts on its own."""
+    if not 0 <= score <= 10:
+        return {"error": "Score must be between 0 and 10."}
+    furbies = get_fleet().select() if _fleet is not None and len(_fleet) else ()
+    reaction = await get_pipeline().react(score, furbies)
+    reaction["audio_url"] = f"/audio/{reaction['clip']}"
+    return reaction
+
+@tool()
+async def connect_furby(count: int = 1) -> str:
+    """Connect to the nearest Furby via BLE, or to up to `count` Furbies, so they act out
+    react_to_joke along with GiggleBot."""
+    from furby_loop import get_ble_loop
+    fleet = get_fleet()
+    if len(fleet) >= count:
+        return "Furby already connected."
+    # Decode the clips meanwhile, so the first reaction doesn't wait on one
+    connected, _ = await asyncio.gather(
+        get_ble_loop().call(fleet.connect(max_devices=count - len(fleet))),
+        asyncio.to_thread(engine.start))
+    if connected:
+        return f"Connected to Furby at {', '.join(connected)}"
+    return "Failed to connect to Furby."
+
+@tool()
 def say_goodbye() -> str:
     """Say goodbye"""
-    threading.Thread(target=play_sound, args=(SOUNDS["say_goodbye"],)).start()
+    _say("say_goodbye")
     return "Bye-bye! Come back with more jokes soon."
 
-def load_action_list(path="actionlist.json"):
-    """Load the Furby action list from a JSON file."""
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+@tool()
+def play_clip(name: str, policy: str = "queue") -> str:
+    """Play any clip from the audio library by name (e.g. 'say_rating_7').
+    policy: 'queue' waits for the current clip, 'overlap' plays alongside it,
+    'interrupt' cuts everything off."""
+    if policy not in POLICIES:
+        return f"Unknown policy: {policy}. Use one of {', '.join(POLICIES)}."
+    try:
+        engine.play(name, policy)
+    except KeyError:
+        return f"Unknown clip: {name}. Available: {', '.join(sorted(engine.paths))}"
+    except RuntimeError as e:
+        return str(e)
+    return f"Playing {name}."
+
+@tool()
+async def warm_up(wait: bool = False) -> dict:
+    """Open the mixer, decode every clip and load the action catalog in the background, so
+    the first say_* call plays straight away. With wait=True, return once it's done."""
+    warm_up_steps.start()
+    if wait:
+        await asyncio.to_thread(warm_up_steps.wait)
+    return warm_up_steps.status()
+
+@tool()
+def get_metrics() -> dict:
+    """Performance counters and latency histograms (mean and p50/p95/p99, in seconds) for
+    this server: tool-call durations and audio time-to-play."""
+    return metrics_snapshot()
 
-@app.tool()
+@tool()
 def list_furby_actions() -> list:
-    """List all available Furby actions and their descriptions/values."""
-    return load_action_list()
+    """List all available Furby actions and their descriptions/values.
+    This is the full list (~1,500 entries); prefer query_furby_actions to fetch only what you need."""
+    return get_catalog().all()
+
+@tool()
+def query_furby_actions(
+    input: Optional[int] = None,
+    index: Optional[int] = None,
+    subindex: Optional[int] = None,
+    specific: Optional[int] = None,
+    text: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 20,
+    fields: Optional[List[str]] = None,
+) -> dict:
+    """Search Furby actions by Input/Index/SubIndex/specific number and/or a text snippet.
+    Results are paged with offset/limit (at most 200 per page); fields picks which of
+    id, Input, Index, SubIndex, specific, Action to return."""
+    try:
+        return get_catalog().query(input, index, subindex, specific, text, offset, limit, fields)
+    except ValueError as e:
+        return {"error": str(e)}
+
+@tool()
+def get_furby_action(action_id: int) -> dict:
+    """Get a single Furby action by the id returned from query_furby_actions."""
+    action = get_catalog().get(action_id)
+    if action is None:
+        return {"error": f"No action with id {action_id}"}
+    return action
+
+@app.resource("audio://clips", mime_type="application/json")
+def audio_clips() -> dict:
+    """Every clip with, per format, its content type, size and number of chunks for reading
+    through audio://clips/{name}/{format}/{chunk}. Size and chunks are null for a transcode
+    that hasn't been made yet; read chunks until a short one."""
+    clips = []
+    for name in sorted(library.paths):
+        info = library.info(name)
+        for entry in info["formats"].values():
+            size = entry["size"]
+            entry["chunks"] = -(-size // CHUNK_SIZE) if size is not None else None
+        clips.append(dict(info, url=f"/audio/{name}"))
+    return {"chunk_size": CHUNK_SIZE, "formats": library.formats(), "clips": clips}
+
+@app.resource("audio://clips/{name}/{format}/{chunk}", mime_type="application/octet-stream")
+async def audio_chunk(name: str, format: str, chunk: int) -> bytes:
+    """Bytes [chunk * chunk_size, (chunk + 1) * chunk_size) of a clip; format is 'source' or
+    a transcode such as 'wav'. A chunk shorter than chunk_size is the last one."""
+    try:
+        clip = await asyncio.to_thread(library.open, name, format)
+    except KeyError:
+        raise ResourceError(f"Unknown clip: {name}")
+    except (ValueError, TranscodeError) as e:
+        raise ResourceError(str(e))
+    return bytes(clip.view[chunk * CHUNK_SIZE:(chunk + 1) * CHUNK_SIZE])
 
 if __name__ == "__main__":
     app.run()
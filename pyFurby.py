@@ -1,6 +1,26 @@
 import asyncio
+import os
 import time
-from bleak import BleakScanner, BleakClient
+from bleak import BleakClient
+from bleak.exc import BleakError
+from furby_connect import find_furby, get_device_cache
+from furby_codec import encode_action, get_command_table
+from furby_dispatch import ResponseDispatcher
+from furby_events import DROP_OLDEST, EventStream, parse_frame
+from furby_idle import IdleManager, KEEP_ALIVE_CMD, KEEP_ALIVE_RESP_PREFIX
+from furby_log import get_logger, hexdump, setup_logging
+from furby_metrics import get_metrics
+from furby_sequence import build_sequence, plan_results, run_sequence
+from furby_scheduler import CommandScheduler, OVERFLOW_BLOCK, PRIORITY_NORMAL
+from furby_tracker import ActionTracker
+from furby_trace import get_recorder
+
+if os.environ.get("FURBY_SIMULATOR"):
+    # No adapter needed: talk to the simulated Furbies in furby_sim.py
+    from furby_sim import SimBleakClient as BleakClient
+
+log = get_logger("ble")
+notify_log = get_logger("notify")
 
 # UUIDs for the Furby BLE service and characteristics
 # There are more UUIDs for other services, but these are the ones used for action commands
@@ -15,114 +35,304 @@ FURBY_COMMANDS = {
     "laugh":  bytes([0x13, 0x00, 0x02, 0x00, 0x00, 0x00]),
 }
 
-last_command_time = 0.0
-
-# Command to keep Furby focused and not constantly reacting like a caffeinated child
-KEEP_ALIVE_CMD = bytes([0x20, 0x06])
-KEEP_ALIVE_RESP_PREFIX = b'\x22'
+# Key for queued actions when a newer action should replace a stale one
+ACTION_KEY = "action"
 
-# List of (future, prefix) pairs for response matching
-pending_responses = []
-
-def notification_handler(sender, data):
-    print(f"📩 Notification from {sender}: {data.hex()}")
-    # Check all pending futures for a matching prefix
-    for fut, prefix in pending_responses[:]:
-        if prefix is None or data.startswith(prefix):
-            if not fut.done():
-                fut.set_result(data)
-            pending_responses.remove((fut, prefix))
-
-async def send_command(client, tx_uuid, data, response_prefix=None, timeout=2.0):
-    fut = asyncio.get_event_loop().create_future()
+async def send_command(client, tx_uuid, data, response_prefix=None, timeout=2.0, dispatcher=None):
+    # Only register a waiter when we're actually going to wait for the reply
+    fut = None
     if response_prefix is not None:
-        pending_responses.append((fut, response_prefix))
+        fut = dispatcher.expect(response_prefix)
     await client.write_gatt_char(tx_uuid, data)
-    global last_command_time
-    last_command_time = time.time()
-    if response_prefix is not None:
+    if fut is not None:
         try:
             resp = await asyncio.wait_for(fut, timeout)
             return resp
         except asyncio.TimeoutError:
-            pending_responses.remove((fut, response_prefix))
-            print("⚠️ Command response timed out.")
+            # wait_for cancelled the future; the dispatcher skips it when it reaches the front
+            log.warning("⚠️ Command response timed out.")
             return None
 
-async def keep_alive_task(client, tx_uuid):
-    try:
-        while True:
-            global last_command_time
-            if (time.time() - last_command_time) > 3.0:
-                print("👁️ Sending keep-alive...")
-                resp = await send_command(client, tx_uuid, KEEP_ALIVE_CMD, KEEP_ALIVE_RESP_PREFIX)
-                if resp:
-                    print("✅ Keep-alive response received!")
-                else:
-                    print("⚠️ No keep-alive response!")
-                await asyncio.sleep(1.0)
-            else:
-                await asyncio.sleep(0.5)
-    except asyncio.CancelledError:
-        pass
-
 class pyFurby:
-    def __init__(self, address=None):
-        self.address = address
+    def __init__(self, address=None, queue_size=32, overflow=OVERFLOW_BLOCK, pipeline=False,
+                 device=None):
+        # A BLEDevice from an earlier scan saves bleak from scanning again to find the address
+        self.device = device
+        self.address = device.address if device is not None else address
+        self.name = device.name if device is not None else None
         self.client = None
-        self.keep_alive = None
+        self.idle = None
+        self.tracker = None
+        self.scheduler = None
+        self.sequence = None
+        # Command queue settings, see furby_scheduler.CommandScheduler
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.pipeline = pipeline
         self.connected = False
-        self.loop = asyncio.get_event_loop()
+        self.connect_time = None
+        self.tx_char = None
+        self.rx_char = None
+        self.device_cache = get_device_cache()
+        # Called with (furby, reason) when the link drops without disconnect() being called
+        self.disconnect_listeners = []
+        # Each connection matches its own replies, so two Furbies can't steal each other's
+        self.dispatcher = ResponseDispatcher()
+        # Decoded notifications for events() subscribers
+        self.stream = EventStream()
+        # With FURBY_TRACE set, every connection's traffic is recorded (see furby_trace)
+        self.recorder = get_recorder()
+        self.trace = None
+        metrics = get_metrics()
+        self._notifications = (metrics.counter("furby_notifications_total", "Notifications received")
+                               if metrics is not None else None)
+
+    def notification_handler(self, sender, data):
+        if self.trace is not None:
+            self.trace.rx(data)
+        if self._notifications is not None:
+            self._notifications.inc()
+        notify_log.debug("📩 Notification from %s: %s", sender, hexdump(data))
+        self.dispatcher.dispatch(data)
+        # Only decode when someone is listening
+        if self.stream.active:
+            self.stream.publish(parse_frame(data, self.address))
+
+    def events(self, kinds=None, predicate=None, maxsize=64, policy=DROP_OLDEST):
+        """Subscribe to decoded notifications: `async for event in furby.events(kinds={"sensor"})`.
+        `predicate` filters further; `policy` decides what a full queue drops (see furby_events).
+        The subscription survives reconnects and ends on disconnect() or close()."""
+        return self.stream.subscribe(kinds, predicate, maxsize, policy)
 
     async def connect(self):
-        if not self.address:
-            print("🔍 Scanning for BLE devices...")
-            devices = await BleakScanner.discover(timeout=5.0)
-            furby = next((d for d in devices if d.name and "Furby" in d.name), None)
-            if not furby:
-                print("❌ No device named 'Furby' found.")
+        start = time.perf_counter()
+        requested = self.address
+        # Warm path: go straight to a Furby we've connected to before
+        entry = self.device_cache.get(requested) if requested else self.device_cache.latest()
+        warm = entry is not None
+        if warm:
+            self.address, name = entry["address"], entry["name"]
+            if not await self._open(self.address, entry):
+                log.info("♻️ Cached Furby didn't connect, forgetting it and scanning again...")
+                self.device_cache.forget(entry["address"])
+                self.address = requested
+                warm = False
+        if not warm:
+            target = self.device or self.address
+            if not target:
+                log.info("🔍 Scanning for BLE devices...")
+                target = await find_furby(timeout=5.0)
+                if not target:
+                    log.error("❌ No device named 'Furby' found.")
+                    return False
+                self.address = target.address
+            name = getattr(target, "name", None)
+            if not await self._open(target, None):
+                log.error("❌ Failed to connect.")
                 return False
-            self.address = furby.address
-        self.client = BleakClient(self.address)
-        await self.client.connect(timeout=10.0)
+        self.name = name or self.name
+        self.device_cache.remember(self.address, self.name, self.tx_char, self.rx_char)
+        self.connect_time = time.perf_counter() - start
+        log.info("🔌 Connected to Furby @ %s in %.0f ms (%s)!", self.address,
+                 self.connect_time * 1000, "warm" if warm else "cold")
+        if self.recorder is not None:
+            self.trace = self.recorder.session(self.address)
+        await self.client.start_notify(self.rx_char, self.notification_handler)
+        if self.scheduler is None:
+            self.scheduler = CommandScheduler(self.client, self.tx_char, self.dispatcher,
+                                              self.queue_size, self.overflow, self.pipeline)
+        else:
+            # Reconnecting: keep whatever was queued while the link was down
+            self.scheduler.attach(self.client, self.tx_char)
+        self.scheduler.start()
+        if self.idle is None or self.idle.scheduler is not self.scheduler:
+            self.idle = IdleManager(self.scheduler, self._link_lost)
+        self.idle.resume()
+        if self.tracker is None or self.tracker.scheduler is not self.scheduler:
+            self.tracker = ActionTracker(self.scheduler)
+            self.scheduler.on_write = self._on_write
+        self.connected = True
+        return True
+
+    def _on_write(self, data, now):
+        self.tracker.on_write(data, now)
+        if self.trace is not None:
+            self.trace.tx(data, now)
+
+    def _end_trace(self, reason):
+        if self.trace is not None:
+            self.trace.end(reason)
+            self.trace = None
+
+    def _on_bleak_disconnect(self, client):
+        if client is self.client:
+            self._link_lost("BLE disconnected")
+
+    def _link_lost(self, reason):
+        """The link went away on its own: pause the queue and tell the listeners."""
+        if not self.connected:
+            return
+        self.connected = False
+        if self.scheduler is not None:
+            self.scheduler.pause()
+        if self.idle is not None:
+            self.idle.suspend()
+        if self.tracker is not None:
+            self.tracker.stop()
+        self.dispatcher.cancel_all()
+        self._end_trace(reason)
+        log.warning("💔 Lost connection to Furby: %s", reason)
+        for listener in self.disconnect_listeners:
+            listener(self, reason)
+
+    async def _open(self, target, entry):
+        """Connect to `target` (address or BLEDevice) and resolve the TX/RX characteristics.
+        With a cache entry, service discovery is limited to the cached service."""
+        if entry:
+            self.client = BleakClient(target, self._on_bleak_disconnect, services=[entry["service"]],
+                                      winrt={"use_cached_services": True})
+        else:
+            self.client = BleakClient(target, self._on_bleak_disconnect)
+        try:
+            await self.client.connect(timeout=10.0)
+        except (BleakError, asyncio.TimeoutError) as e:
+            log.warning("⚠️ Connect failed: %s", e)
+            return False
         if not self.client.is_connected:
-            print("❌ Failed to connect.")
             return False
-        print(f"🔌 Connected to Furby @ {self.address}!")
-        await self.client.start_notify(RX_CHAR_UUID, notification_handler)
-        self.keep_alive = asyncio.create_task(keep_alive_task(self.client, TX_CHAR_UUID))
-        self.connected = True
+        self.tx_char = self.client.services.get_characteristic(TX_CHAR_UUID)
+        self.rx_char = self.client.services.get_characteristic(RX_CHAR_UUID)
+        if self.tx_char is None or self.rx_char is None:
+            log.warning("⚠️ Furby characteristics not found.")
+            await self.client.disconnect()
+            return False
         return True
 
     async def disconnect(self):
-        if self.keep_alive:
-            self.keep_alive.cancel()
-            await self.keep_alive
+        # Mark as disconnected first so the bleak callback doesn't treat this as a drop
+        self.connected = False
+        if self.idle is not None:
+            await self.idle.stop()
+            self.idle = None
+        if self.tracker is not None:
+            self.tracker.stop()
+            self.tracker = None
+        if self.scheduler is not None:
+            await self.scheduler.stop()
+            self.scheduler = None
         if self.client and self.client.is_connected:
-            await self.client.stop_notify(RX_CHAR_UUID)
+            await self.client.stop_notify(self.rx_char)
             await self.client.disconnect()
-            print("✅ Disconnected from Furby.")
+            log.info("✅ Disconnected from Furby.")
+        self._end_trace("disconnected")
+        self.dispatcher.cancel_all()
+        self.stream.close()
         self.connected = False
 
     async def send_named_command(self, name):
         if name in FURBY_COMMANDS:
-            print(f"➡️ Sending command: {name}")
-            await send_command(self.client, TX_CHAR_UUID, FURBY_COMMANDS[name], None)
-            print(f"✅ Sent command: {name}")
+            log.debug("➡️ Sending command: %s", name)
+            await self.scheduler.send(FURBY_COMMANDS[name])
+            log.debug("✅ Sent command: %s", name)
         else:
-            print(f"❌ Unknown command: {name}")
+            log.warning("❌ Unknown command: %s", name)
 
     async def send_custom_command(self, nums):
-        if len(nums) == 4 and all(0 <= n <= 255 for n in nums):
-            data = bytes([0x13, 0x00] + nums)
-            print(f"➡️ Sending custom command: {data.hex()}")
-            await send_command(self.client, TX_CHAR_UUID, data, None)
-            print("✅ Sent custom command.")
-        else:
-            print("❌ Enter four numbers between 0 and 255.")
+        # Known actions already have a compiled frame; only encode the unknown ones
+        data = get_command_table().frame(nums) if len(nums) == 4 else None
+        if data is None:
+            try:
+                data = encode_action(nums)
+            except ValueError:
+                log.warning("❌ Enter four numbers between 0 and 255.")
+                return
+        log.debug("➡️ Sending custom command: %s", hexdump(data))
+        await self.scheduler.send(data)
+        log.debug("✅ Sent custom command.")
+
+    async def send_action(self, action, priority=PRIORITY_NORMAL, replace_pending=False):
+        """Send a catalog action by id, slug name or (Input, Index, SubIndex, specific) tuple.
+        The frame comes precompiled from the command table, so nothing is encoded per call.
+        With replace_pending, a queued action that hasn't gone out yet is replaced by this one."""
+        data = get_command_table().frame(action)
+        if data is None:
+            log.warning("❌ Unknown action: %s", action)
+            return False
+        await self.scheduler.send(data, priority, ACTION_KEY if replace_pending else None)
+        return True
+
+    async def perform(self, action, interrupt=False):
+        """Play an action and wait until Furby has finished it. Unless `interrupt`, it waits
+        for whatever is playing first, so back-to-back calls play in order without cutting
+        each other off or piling up. Returns the action's start-to-end timing (see
+        furby_tracker.Performance); raises ValueError for an unknown action."""
+        data = get_command_table().frame(action)
+        if data is None:
+            raise ValueError(f"Unknown action: {action}")
+        if interrupt:
+            await self.scheduler.send(data, PRIORITY_NORMAL, ACTION_KEY)
+            return (await self.tracker.current.wait()).as_dict()
+        async with self.tracker.turn:
+            await self.tracker.idle()
+            await self.scheduler.send(data, PRIORITY_NORMAL, ACTION_KEY)
+            return (await self.tracker.current.wait()).as_dict()
+
+    async def perform_all(self, actions, interrupt=False):
+        """Play actions one after another, each starting as soon as the last one ends.
+        `interrupt` applies to the first one only."""
+        return [await self.perform(action, interrupt and i == 0)
+                for i, action in enumerate(actions)]
+
+    async def perform_sequence(self, steps, replace=True):
+        """Play a timed list of actions, e.g. [{"action": 12}, {"action": "purr", "delay": 1.5}].
+        The whole list is validated before anything is sent (ValueError if not). With replace,
+        a sequence that is still running is cancelled; otherwise RuntimeError is raised.
+        Returns per-step planned/sent times."""
+        plan = build_sequence(steps)
+        if self.sequence is not None and not self.sequence.done():
+            if not replace:
+                raise RuntimeError("A sequence is already running.")
+            self.sequence.cancel()
+        results = plan_results(plan)
+        sequence = self.sequence = asyncio.create_task(
+            run_sequence(self.scheduler, plan, results))
+        try:
+            await asyncio.wait([sequence])
+        except asyncio.CancelledError:
+            # Our caller went away, so the sequence goes too
+            sequence.cancel()
+            raise
+        if sequence.cancelled():
+            # Replaced by a newer sequence or cancel_sequence()
+            return {"cancelled": True, "steps": results}
+        return sequence.result()
+
+    async def speak(self, text, gap=1.5, min_score=0.2):
+        """Act out a reply: each clause is matched to its closest catalog phrase and the
+        matches are played as one sequence, `gap` seconds apart. Returns the sequence result
+        with the matched steps, or None if nothing in the text matched well enough."""
+        # numpy and the matcher load on first use, not when pyFurby is imported
+        from furby_matcher import get_matcher
+        steps = get_matcher().suggest(text, min_score, gap)
+        if not steps:
+            log.info("🤷 No Furby phrase matches: %r", text)
+            return None
+        result = await self.perform_sequence(steps)
+        result["matched"] = steps
+        return result
+
+    async def cancel_sequence(self):
+        """Stop the running sequence, if any. Returns True if one was running."""
+        if self.sequence is None or self.sequence.done():
+            return False
+        self.sequence.cancel()
+        await asyncio.wait([self.sequence])
+        return True
 
 # Only run as script if called directly
 if __name__ == "__main__":
+    setup_logging()
+
     async def main():
         myFurby = pyFurby()
         connected = await myFurby.connect()
@@ -131,8 +341,8 @@ if __name__ == "__main__":
             return
         try:
             while True:
-                cmd = await asyncio.get_event_loop().run_in_executor(
-                    None, input, "\n🧠 Enter a command (fart, snore, toot, laugh), 'quit', or 'W,X,Y,Z': "
+                cmd = await asyncio.get_running_loop().run_in_executor(
+                    None, input, "\n🧠 Enter a command (fart, snore, toot, laugh), an action name, 'quit', or 'W,X,Y,Z': "
                 )
                 cmd = cmd.strip().lower()
                 if cmd == "quit":
@@ -140,6 +350,8 @@ if __name__ == "__main__":
                     break
                 elif cmd in FURBY_COMMANDS:
                     await myFurby.send_named_command(cmd)
+                elif get_command_table().by_name(cmd) is not None:
+                    await myFurby.send_action(cmd)
                 else:
                     try:
                         nums = [int(x) for x in cmd.split(",")]